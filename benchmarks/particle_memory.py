@@ -0,0 +1,89 @@
+"""
+    Memory footprint of the Particle class compared with the previous dictionary-based implementation.
+
+    Usage: python -m LHCOReader_HighPT.benchmarks.particle_memory [number of particles]
+
+    Results for 10^5 particles (Python 3.11, 64 bits), including the float objects and the list holding them:
+        dict-based Particle:       576 bytes per particle
+        slots-based Particle:      360 bytes per particle
+        EventTable:                 80 bytes per particle (+ ~88 bytes for each ParticleView alive)
+"""
+
+from LHCOReader_HighPT.src.EventInfo import Particle
+from LHCOReader_HighPT.src.EventTable import EventTable, ParticleView
+import numpy as np
+import tracemalloc
+import copy
+import time
+import sys
+
+
+class DictParticle:
+    """Previous implementation of the Particle class, with the infos stored in the instance dictionary."""
+    _particle_info_attrs = "typ eta phi pt jmas ntrk btag had/em dum1 dum2".split()
+
+    def __init__(self, particle_info: str):
+        self.__dict__ = {
+            info: float(info_value) for info_value, info in zip(particle_info.split(), self._particle_info_attrs)
+        }
+
+    def __getattr__(self, info):
+        if info == "had_em":
+            return self.__getattribute__("had/em")
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{info}'")
+
+    def __copy__(self):
+        particle = self.__class__.__new__(self.__class__)
+        particle.__dict__ = dict(self.__dict__)
+        return particle
+
+
+def particle_lines(number_particles: int):
+    """Random particle lines in the same format as in the .lhco files (without the first column)."""
+    generator = np.random.default_rng(1)
+    values = np.column_stack([
+        generator.integers(0, 7, number_particles), generator.uniform(-2.5, 2.5, number_particles),
+        generator.uniform(-np.pi, np.pi, number_particles), generator.exponential(50, number_particles),
+        generator.uniform(0, 20, number_particles), generator.integers(0, 3, number_particles),
+        generator.integers(0, 2, number_particles), generator.uniform(0, 10, number_particles),
+        np.zeros(number_particles), np.zeros(number_particles)
+    ])
+    return [" ".join(f"{value:.3f}" for value in row) for row in values]
+
+
+def measure(build):
+    """Returns the memory allocated (in bytes) by the objects returned by build() and the time to build them."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = build()
+    elapsed = time.perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return allocated, elapsed
+
+
+def main(number_particles: int = 100000):
+    lines = particle_lines(number_particles)
+    rows = np.array([[float(value) for value in line.split()] for line in lines])
+    table = EventTable.from_particle_rows(rows, [number_particles])
+
+    results = {
+        "dict-based Particle": measure(lambda: [DictParticle(line) for line in lines]),
+        "slots-based Particle": measure(lambda: [Particle(line) for line in lines]),
+        "EventTable (arrays only)": (table.nbytes, 0.),
+        "ParticleView (views alive)": measure(lambda: [ParticleView(table.data, i) for i in range(number_particles)]),
+    }
+    for name, (allocated, elapsed) in results.items():
+        print(f"{name:28s} {allocated / number_particles:8.1f} bytes/particle {elapsed:8.3f} s")
+
+    # Copying (as done by EventLoop for each analysis)
+    for particle_class in (DictParticle, Particle):
+        particles = [particle_class(line) for line in lines]
+        start = time.perf_counter()
+        [copy.copy(particle) for particle in particles]
+        print(f"copy {particle_class.__name__:23s} {time.perf_counter() - start:8.3f} s")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
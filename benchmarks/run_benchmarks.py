@@ -0,0 +1,230 @@
+"""
+    Benchmarks of the main steps of an analysis: parsing, copying the events, the ATLAS ditau analysis and
+    the histogram filling. Each benchmark reports the number of events per second (best of several repetitions)
+    and two memory measurements:
+        - peak allocated: the peak memory allocated during a separate run (measured with tracemalloc). For the
+          benchmarks that process the events one at a time (e.g. read_LHCO or the event_loop), it's the memory
+          of a few events, which must remain small;
+        - RSS high-water: the maximum resident memory of the process up to the end of the benchmark, which also
+          includes the events prepared for the other benchmarks and the memory of the previous ones.
+
+    The events are generated with synthetic_lhco, and the results are stored in a .json file together with the
+    git commit and the versions of python and numpy, so that they can be compared across commits.
+
+    Usage:
+        python -m LHCOReader_HighPT.benchmarks.run_benchmarks [--events N] [--repeat R] [--output results.json]
+                                                             [--compare baseline.json] [--threshold 0.1]
+                                                             [--only name ...]
+
+    With --compare, the results are compared with a previous .json file and the exit status is 1 if any benchmark
+    is slower (or uses more memory) than the baseline by more than the threshold (10% by default). Increases of
+    the peak allocated memory below MEMORY_TOLERANCE are not reported.
+"""
+
+from LHCOReader_HighPT.benchmarks.synthetic_lhco import write_synthetic_lhco
+from LHCOReader_HighPT.src.LHCOReader import read_LHCO, read_LHCO_columnar
+from LHCOReader_HighPT.src.Analysis import EventLoop
+from LHCOReader_HighPT.src.Histogram import ObservableHistogram
+from LHCOReader_HighPT.src.Instrumentation import peak_rss
+from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV.atlas_ditau_13TEV_analyses import (atlas_ditauhad_bveto,
+                                                                                        transverse_mass)
+from typing import Callable, Dict, Optional
+import numpy as np
+import contextlib
+import subprocess
+import tracemalloc
+import platform
+import argparse
+import datetime
+import tempfile
+import json
+import copy
+import time
+import sys
+import io
+import os
+
+# Bin edges of the mTtot distribution of the ditau analysis
+_BIN_EDGES = [150, 200, 250, 300, 350, 400, 450, 500, 600, 700, 800, 900, 1000, 1150, 15000]
+
+# Increase of the peak allocated memory (in bytes) that is never reported as a regression, since the small peaks
+# of the benchmarks that process one event at a time vary slightly between runs
+MEMORY_TOLERANCE = 1 << 16
+
+
+def _event_loop(lhco_file: str, engine: str) -> int:
+    """Runs the ditau analysis (with the mTtot histogram) on the file with the EventLoop."""
+    event_loop = EventLoop(histogram=ObservableHistogram(bin_edges=_BIN_EDGES, observable=transverse_mass),
+                           engine=engine)
+    # The report of the EventLoop is not shown
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, number_evts = event_loop.analyse_events(lhco_file, {"atlas-ditauhad-bveto": atlas_ditauhad_bveto()})
+    return number_evts
+
+
+def _analysis(events) -> int:
+    """Runs the ditau analysis on a copy of each event, as done by the EventLoop."""
+    event_analysis = atlas_ditauhad_bveto()
+    for event in events:
+        event_analysis.launch_analysis(copy.deepcopy(event))
+    return len(events)
+
+
+def _histogram_fill(events) -> int:
+    """Fills the mTtot histogram with all the events."""
+    histogram = ObservableHistogram(bin_edges=_BIN_EDGES, observable=transverse_mass)
+    for event in events:
+        histogram.update_hist(event)
+    return len(events)
+
+
+def _histogram_fill_batch(table) -> int:
+    """Fills the mTtot histogram with all the events of the EventTable at once."""
+    histogram = ObservableHistogram(bin_edges=_BIN_EDGES, observable=transverse_mass)
+    histogram.update_hist_batch(table, np.ones(table.n_particles, dtype=bool), np.ones(len(table), dtype=bool))
+    return len(table)
+
+
+def benchmarks(lhco_file: str) -> Dict[str, Callable[[], int]]:
+    """
+    Returns the benchmarks on the given file. Each benchmark is a function that runs the step being measured and
+    returns the number of processed events. The inputs of the steps that don't read the file are prepared here.
+    """
+    events = list(read_LHCO(lhco_file))
+    table = read_LHCO_columnar(lhco_file)
+    return {
+        "read_LHCO": lambda: sum(1 for _ in read_LHCO(lhco_file)),
+        "read_LHCO_columnar": lambda: len(read_LHCO_columnar(lhco_file)),
+        "deepcopy": lambda: len([copy.deepcopy(event) for event in events]),
+        "event_view": lambda: len([event.view() for event in events]),
+        "ditau_analysis": lambda: _analysis(events),
+        "histogram_fill": lambda: _histogram_fill(events),
+        "histogram_fill_batch": lambda: _histogram_fill_batch(table),
+        "event_loop": lambda: _event_loop(lhco_file, "event"),
+        "event_loop_batch": lambda: _event_loop(lhco_file, "batch"),
+    }
+
+
+def measure(benchmark: Callable[[], int], repeat: int) -> Dict[str, Optional[float]]:
+    """
+    Returns the number of events, the best time over 'repeat' runs, the number of events per second,
+    the peak memory (in bytes) allocated during an additional run and the maximum resident memory of the process
+    (in bytes) at the end of the benchmark.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        number_events = benchmark()
+        times.append(time.perf_counter() - start)
+
+    # Memory is measured separately, since tracemalloc slows down the allocations
+    tracemalloc.start()
+    benchmark()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best_time = min(times)
+    return {
+        "events": number_events,
+        "seconds": best_time,
+        "events_per_second": number_events / best_time if best_time > 0 else float("inf"),
+        "peak_memory_bytes": peak_memory,
+        "rss_high_water_bytes": peak_rss(),
+    }
+
+
+def _megabytes(number_bytes: Optional[int], decimals: int = 1) -> str:
+    """Memory in MB (or "-" if it wasn't measured)."""
+    return "-" if number_bytes is None else f"{number_bytes / 2 ** 20:.{decimals}f}"
+
+
+def metadata(number_events: int, seed: int) -> Dict:
+    """Information about the run: git commit, versions and input file."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "events": number_events,
+        "seed": seed,
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> bool:
+    """
+    Prints the ratio of the events per second and peak allocated memory with respect to the baseline.
+    Returns True if any benchmark is a regression (slower or using more memory by more than the threshold, and by
+    more than MEMORY_TOLERANCE). The memory is only compared when it was measured in both runs.
+    """
+    regression = False
+    print(f"\nComparison with commit {baseline['metadata'].get('commit')}:")
+    print(f"{'benchmark':24s} {'speed ratio':>12s} {'memory ratio':>13s}")
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        reference = baseline["results"][name]
+        speed_ratio = result["events_per_second"] / reference["events_per_second"]
+        memory_ratio = memory_increase = None
+        if result.get("peak_memory_bytes") is not None and reference.get("peak_memory_bytes") is not None:
+            memory_ratio = result["peak_memory_bytes"] / max(reference["peak_memory_bytes"], 1)
+            memory_increase = result["peak_memory_bytes"] - reference["peak_memory_bytes"]
+        flags = []
+        if speed_ratio < 1 - threshold:
+            flags.append("SLOWER")
+        if memory_ratio is not None and memory_ratio > 1 + threshold and memory_increase > MEMORY_TOLERANCE:
+            flags.append("MORE MEMORY")
+        regression = regression or bool(flags)
+        memory_column = "-" if memory_ratio is None else f"{memory_ratio:.3f}"
+        print(f"{name:24s} {speed_ratio:12.3f} {memory_column:>13s} {' '.join(flags)}")
+    return regression
+
+
+def main(arguments=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of LHCOReader_HighPT on synthetic .lhco files.")
+    parser.add_argument("--events", type=int, default=20000, help="number of events in the synthetic file")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the synthetic events")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs of each benchmark")
+    parser.add_argument("--output", help=".json file where the results are stored")
+    parser.add_argument("--compare", help=".json file with the results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported as a regression")
+    parser.add_argument("--only", nargs="+", help="names of the benchmarks to run (all by default)")
+    arguments = parser.parse_args(arguments)
+
+    with tempfile.TemporaryDirectory() as folder:
+        lhco_file = write_synthetic_lhco(os.path.join(folder, "synthetic.lhco"), arguments.events,
+                                         seed=arguments.seed)
+        results = {"metadata": metadata(arguments.events, arguments.seed), "results": {}}
+        print(f"{'benchmark':24s} {'events/s':>12s} {'time [s]':>10s} {'peak allocated [MB]':>20s} "
+              f"{'RSS high-water [MB]':>20s}")
+        for name, benchmark in benchmarks(lhco_file).items():
+            if arguments.only and name not in arguments.only:
+                continue
+            result = results["results"][name] = measure(benchmark, arguments.repeat)
+            peak_memory, rss = _megabytes(result["peak_memory_bytes"], 3), _megabytes(result["rss_high_water_bytes"])
+            print(f"{name:24s} {result['events_per_second']:12.0f} {result['seconds']:10.3f} {peak_memory:>20s} "
+                  f"{rss:>20s}")
+        print("\npeak allocated: memory allocated by the benchmark at its peak (tracemalloc). The benchmarks that\n"
+              "    process one event at a time (e.g. read_LHCO and event_loop) only hold a few events.\n"
+              "RSS high-water: maximum resident memory of the process up to the end of the benchmark, including\n"
+              "    the events prepared for the other benchmarks.")
+
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            json.dump(results, output_file, indent=4)
+
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare(results, baseline, arguments.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
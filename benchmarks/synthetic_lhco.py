@@ -0,0 +1,105 @@
+"""
+    Generator of synthetic .lhco files for the benchmarks.
+
+    The events mimic the Delphes output of the ditau samples: a few hadronic taus and jets per event (some of them
+    b-tagged), occasional photons and leptons, the missing energy, and a small fraction of events without particles.
+    The particles of each event are written ordered by type, as in the Delphes files.
+
+    Usage: python -m LHCOReader_HighPT.benchmarks.synthetic_lhco filename [number of events] [seed]
+"""
+
+from LHCOReader_HighPT.src.EventInfo import Event
+from typing import Dict
+import numpy as np
+import sys
+
+# Mean number of particles of each type per event (the missing energy is always present)
+DITAU_MULTIPLICITIES = {"photons": 0.3, "electrons": 0.3, "muons": 0.3, "tauhads": 2.2, "jets": 3.5}
+
+# Scale of the (exponential) transverse momentum distribution of each type, in GeV
+_PT_SCALES = {"photons": 40., "electrons": 60., "muons": 60., "tauhads": 120., "jets": 90., "met": 50.}
+
+# Maximum number of particles of each type in an event
+_MAX_MULTIPLICITY = 12
+
+_HEADER = "#</MGPGSCard>\n  #  typ      eta      phi      pt    jmas   ntrk   btag  had/em   dummy   dummy\n"
+_PARTICLE_LINE = "{:4d} {:4d} {:8.3f} {:8.3f} {:7.2f} {:7.2f} {:6.1f} {:6.1f} {:7.2f} {:6.1f} {:6.1f}\n"
+
+
+def generate_particles(number_events: int, multiplicities: Dict[str, float] = None, seed: int = 1,
+                       empty_fraction: float = 0.02, btag_fraction: float = 0.1):
+    """
+    Returns the particles information of the synthetic events, as an array with shape
+    (number of particles, len(EventTable.columns)), and the number of particles in each event.
+
+    :param number_events: number of events (including the events without particles).
+    :param multiplicities: mean number of particles of each type per event (DITAU_MULTIPLICITIES by default).
+                           The numbers of particles follow Poisson distributions.
+    :param seed: seed of the random numbers, so that the same file is generated for the same arguments.
+    :param empty_fraction: fraction of events without particles.
+    :param btag_fraction: fraction of b-tagged jets.
+    """
+    multiplicities = DITAU_MULTIPLICITIES if multiplicities is None else multiplicities
+    generator = np.random.default_rng(seed)
+    type_names = [name for name in Event.particles_type if name in multiplicities] + ["met"]
+    type_codes = np.array([Event.particles_type[name] for name in type_names])
+
+    # Number of particles of each type in each event
+    counts = np.column_stack(
+        [np.minimum(generator.poisson(multiplicities[name], number_events), _MAX_MULTIPLICITY)
+         for name in type_names[:-1]] + [np.ones(number_events, dtype=np.int64)]
+    )
+    counts[generator.random(number_events) < empty_fraction] = 0
+    typ = np.repeat(np.tile(type_codes, number_events), counts.ravel())
+    pt_scale = np.repeat(np.tile([_PT_SCALES[name] for name in type_names], number_events), counts.ravel())
+    number_particles = len(typ)
+
+    is_met = typ == Event.particles_type["met"]
+    is_tau = typ == Event.particles_type["tauhads"]
+    is_jet = typ == Event.particles_type["jets"]
+    is_lepton = (typ == Event.particles_type["electrons"]) | (typ == Event.particles_type["muons"])
+
+    eta = np.where(is_met, 0., generator.uniform(-3., 3., number_particles))
+    phi = generator.uniform(-np.pi, np.pi, number_particles)
+    pt = generator.exponential(pt_scale) + np.where(is_met, 0., 10.)
+    jmas = np.where(is_tau | is_jet, generator.uniform(0., 20., number_particles), 0.)
+    ntrk = np.select(
+        [is_tau, is_lepton, is_jet],
+        [generator.choice([1., -1., 3., -3., 2.], number_particles),
+         generator.choice([1., -1.], number_particles),
+         generator.integers(0, 21, number_particles).astype(np.float64)],
+        0.
+    )
+    btag = np.where(is_jet & (generator.random(number_particles) < btag_fraction), 1., 0.)
+    had_em = np.where(is_met, 0., generator.uniform(0., 5., number_particles))
+    dummy = np.zeros(number_particles)
+
+    # Values rounded as in the text file, so that the parsed values are the same
+    values = np.column_stack([typ, eta.round(3), phi.round(3), pt.round(2), jmas.round(2), ntrk, btag,
+                              had_em.round(2), dummy, dummy])
+    return values, counts.sum(axis=1)
+
+
+def write_synthetic_lhco(filename: str, number_events: int, **options) -> str:
+    """
+    Writes a synthetic .lhco file with number_events events and returns its name.
+    The options are passed to generate_particles.
+    """
+    values, event_sizes = generate_particles(number_events, **options)
+    rows = values.tolist()
+    with open(filename, "w") as lhco_file:
+        lhco_file.write(_HEADER)
+        particle_index = 0
+        for event_number, event_size in enumerate(event_sizes.tolist(), start=1):
+            lines = [f"  0 {event_number:13d}      0\n"]
+            for position in range(1, event_size + 1):
+                row = rows[particle_index]
+                lines.append(_PARTICLE_LINE.format(position, int(row[0]), *row[1:]))
+                particle_index += 1
+            lhco_file.write("".join(lines))
+    return filename
+
+
+if __name__ == "__main__":
+    write_synthetic_lhco(sys.argv[1], *[int(arg) for arg in sys.argv[2:3]],
+                         **({"seed": int(sys.argv[3])} if len(sys.argv) > 3 else {}))
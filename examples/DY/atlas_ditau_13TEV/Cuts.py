@@ -7,14 +7,44 @@
 """
 
 from LHCOReader_HighPT.src.EventInfo import Event
-import math
+from LHCOReader_HighPT.src.EventTable import EventTable
+from LHCOReader_HighPT.src.Analysis import batch_implementation
+from LHCOReader_HighPT.src.Cutflow import uses_particles
+from LHCOReader_HighPT.src.Kinematics import delta_phi
+import numpy as np
 
 
+def leptons_veto_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of leptons_veto."""
+    leptons = mask & (table.type_mask("electrons") | table.type_mask("muons"))
+    return ~table.any(leptons)
+
+
+@uses_particles("electrons", "muons")
+@batch_implementation(leptons_veto_batch)
 def leptons_veto(event: Event) -> bool:
     """Veto events with leptons."""
     return len(event.electrons + event.muons) == 0
 
 
+def ditauhad_event_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of ditauhad_event."""
+    taus = mask & table.type_mask("tauhads")
+    # Leading and subleading taus information (NaN if the event has less than two taus)
+    lead_pt, sublead_pt = table.nth(taus, 0, "pt"), table.nth(taus, 1, "pt")
+    lead_ntrk, sublead_ntrk = table.nth(taus, 0, "ntrk"), table.nth(taus, 1, "ntrk")
+    dphi = delta_phi(table.nth(taus, 0, "phi"), table.nth(taus, 1, "phi"))
+
+    return (
+        (table.count(taus) >= 2) &
+        ~((lead_pt < 165) | (sublead_pt < 65)) &
+        ~(lead_ntrk * sublead_ntrk > 0) &
+        (np.abs(dphi) > 2.7)
+    )
+
+
+@uses_particles("tauhads")
+@batch_implementation(ditauhad_event_batch)
 def ditauhad_event(event: Event) -> bool:
     """
     - Event is required to have at least two hadronic taus;
@@ -35,13 +65,18 @@ def ditauhad_event(event: Event) -> bool:
         return False
 
     # Back to back in the transverse plane
-    dphi = event.tauhads[0].phi - event.tauhads[1].phi
-    if abs(dphi) > math.pi:
-        dphi = dphi - 2 * math.pi if dphi > 0 else dphi + 2 * math.pi
-
+    dphi = delta_phi(event.tauhads[0].phi, event.tauhads[1].phi)
     return abs(dphi) > 2.7
 
 
+def btag_veto_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of btag_veto."""
+    btagged_jets = mask & table.type_mask("jets") & (table.btag != 0)
+    return ~table.any(btagged_jets)
+
+
+@uses_particles("jets")
+@batch_implementation(btag_veto_batch)
 def btag_veto(event: Event) -> bool:
     """Veto events with b-tagged jets"""
     return not any([jet.btag for jet in event.jets])
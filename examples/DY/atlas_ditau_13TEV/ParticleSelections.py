@@ -5,8 +5,22 @@
 """
 
 from LHCOReader_HighPT.src.EventInfo import Event
+from LHCOReader_HighPT.src.EventTable import EventTable
+from LHCOReader_HighPT.src.Analysis import batch_implementation
+from LHCOReader_HighPT.src.Cutflow import uses_particles
+import numpy as np
 
 
+def electron_candidates_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of electron_candidates."""
+    abs_eta = np.abs(table.eta)
+    selected = (abs_eta < 1.37) | ((1.52 < abs_eta) & (abs_eta < 2.47))
+    # Particles of other types are not affected by the selection
+    return mask & (selected | ~table.type_mask("electrons"))
+
+
+@uses_particles("electrons")
+@batch_implementation(electron_candidates_batch)
 def electron_candidates(event: Event) -> Event:
     """Electrons are required to have |eta| < 2.47 and not with in 1.37 < |eta| < 1.52."""
     # Select the electrons
@@ -23,6 +37,14 @@ def electron_candidates(event: Event) -> Event:
     return event
 
 
+def muon_candidates_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of muon_candidates."""
+    selected = np.abs(table.eta) < 2.5
+    return mask & (selected | ~table.type_mask("muons"))
+
+
+@uses_particles("muons")
+@batch_implementation(muon_candidates_batch)
 def muon_candidates(event: Event) -> Event:
     """Muons are required to have |eta| < 2.5."""
     # Muons that satisfy the requirement
@@ -37,6 +59,14 @@ def muon_candidates(event: Event) -> Event:
     return event
 
 
+def jet_candidates_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of jet_candidates."""
+    selected = (table.pt > 20) & (np.abs(table.eta) < 2.5)
+    return mask & (selected | ~table.type_mask("jets"))
+
+
+@uses_particles("jets")
+@batch_implementation(jet_candidates_batch)
 def jet_candidates(event: Event) -> Event:
     """Jets are required to have pT > 20 GeV and |eta| < 2.5"""
     selected_jets = [jet for jet in event.jets if jet.pt > 20 and abs(jet.eta) < 2.5]
@@ -50,6 +80,17 @@ def jet_candidates(event: Event) -> Event:
     return event
 
 
+def hadtau_candidates_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of hadtau_candidates."""
+    abs_eta, abs_ntrk = np.abs(table.eta), np.abs(table.ntrk)
+    # Same rejections as in the event by event version
+    rejected = (abs_eta >= 2.5) | ((1.37 < abs_eta) & (abs_eta < 1.52)) | (table.pt < 65)
+    selected = ~rejected & ((abs_ntrk == 1) | (abs_ntrk == 3))
+    return mask & (selected | ~table.type_mask("tauhads"))
+
+
+@uses_particles("tauhads")
+@batch_implementation(hadtau_candidates_batch)
 def hadtau_candidates(event: Event) -> Event:
     """
     Hadronic tau candidates must satisfy:
@@ -7,7 +7,8 @@
 """
 from LHCOReader_HighPT.src.Utilities import read_xsection
 from LHCOReader_HighPT.src.Analysis import EventLoop
-from LHCOReader_HighPT.src.Histogram import ObservableHistogram
+from LHCOReader_HighPT.src.ResultStore import ResultStore
+from LHCOReader_HighPT.src.Histogram import WeightedHistogram
 from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV import atlas_ditau_13TEV_analyses
 import json
 import copy
@@ -20,8 +21,8 @@ if __name__ == "__main__":
     # Bin edges for the mTtot distribution (and the ones that defined the parton level mtt bins)
     bin_edges = [150, 200, 250, 300, 350, 400, 450, 500, 600, 700, 800, 900, 1000, 1150, 15000]
 
-    # Histogram for the observable value mTtot
-    transverse_mass_hist = ObservableHistogram(
+    # Histogram for the observable value mTtot (with the statistical errors of the weighted events)
+    transverse_mass_hist = WeightedHistogram(
         bin_edges=bin_edges, observable=atlas_ditau_13TEV_analyses.transverse_mass
     )
 
@@ -31,8 +32,9 @@ if __name__ == "__main__":
     }
 
     # Responsible to iterate over the events in one .lhco file and construct the histogram using
-    # the transverse_mass_hist as a template
-    event_loop = EventLoop(histogram=transverse_mass_hist)
+    # the transverse_mass_hist as a template (the results of the files already analysed are read from the store)
+    event_loop = EventLoop(histogram=transverse_mass_hist, engine="batch",
+                           result_store=ResultStore(f"{folder_path}/SMEFT/results"))
 
     # Form-factors we need to analyse
     form_factors = [
@@ -58,21 +60,25 @@ if __name__ == "__main__":
         # Creates the histogram to store the predictions for the current form-factor
         form_factor_hist = copy.copy(transverse_mass_hist)
 
+        # Run the analysis over all the events of all the simulation bins in parallel
+        lhco_filenames = [
+            f"{folder_path}/lhco_files/{form_factor}-bin-{bin_index}.lhco" for bin_index in range(1, len(bin_edges))
+        ]
+        results = event_loop.analyse_files(lhco_files=lhco_filenames, event_analyses=event_analyses)
+
         # For each different simulation bin
-        for bin_index in range(1, len(bin_edges)):
-            lhco_filename = f"{folder_path}/lhco_files/{form_factor}-bin-{bin_index}.lhco"
+        for bin_index, lhco_filename in enumerate(lhco_filenames, start=1):
             lhe_filename = f"{folder_path}/lhe_files/{form_factor}-bin-{bin_index}.lhe"
-
-            # Run the analysis over all the events
-            _, nevents = event_loop.analyse_events(lhco_file=lhco_filename, event_analyses=event_analyses)
+            nevents = results[lhco_filename].number_evts
 
             # Computes the prediction
             cross_section = read_xsection(lhe_filename)
-            current_hist = event_loop.retrive_histogram("atlas-ditauhad-bveto")
-            print(current_hist)
+            current_hist = results[lhco_filename].retrive_histogram("atlas-ditauhad-bveto")
+            print(current_hist.sumw)
             # Updates the prediction
             weight = 2 * cross_section / nevents   # 2 because I'm simulating only b b~ > ta+ ta-
-            form_factor_hist += current_hist * weight * 139 * 1000
+            current_hist.scale(weight * 139 * 1000)
+            form_factor_hist.merge(current_hist)
 
         form_factor_predictions[form_factor] = form_factor_hist
 
@@ -80,9 +86,9 @@ if __name__ == "__main__":
     for smeft_term in smeft_map:
         smeft_predictions[smeft_term] = copy.copy(transverse_mass_hist)
         for (form_factor, coef) in smeft_map[smeft_term]:
-            smeft_predictions[smeft_term] += coef * form_factor_predictions[form_factor]
+            smeft_predictions[smeft_term].sumw += coef * form_factor_predictions[form_factor].sumw
         # .json files only accept python lists
-        smeft_predictions[smeft_term] = smeft_predictions[smeft_term].tolist()
+        smeft_predictions[smeft_term] = smeft_predictions[smeft_term].sumw.tolist()
 
     # Saves the .json file
     with open(f"{folder_path}/SMEFT/atlas-ditau-13TEV.json", "w") as file_:
@@ -3,26 +3,26 @@
 from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV.ParticleSelections import (electron_candidates, muon_candidates,
                                                                                 jet_candidates, hadtau_candidates)
 from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV.Cuts import leptons_veto, ditauhad_event, btag_veto
-from LHCOReader_HighPT.src.Analysis import EventAnalysis
+from LHCOReader_HighPT.src.Analysis import EventAnalysis, batch_implementation
 from LHCOReader_HighPT.src.EventInfo import Event
+from LHCOReader_HighPT.src.EventTable import EventTable
+from LHCOReader_HighPT.src.Kinematics import total_transverse_mass, total_transverse_mass_batch
 import numpy as np
 
 
-def transverse_mass(event: Event) -> float:
-    """Calculates the transverse mass observable for the event."""
-    # Taus (leading and subleading only)
-    taus = event.tauhads[:2]
-    # Missing energy
-    met = event.met
-    # Total transverse pT
-    pt_total = np.sum([particle.pt for particle in taus + met])
+def transverse_mass_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of transverse_mass."""
+    taus = mask & table.type_mask("tauhads")
+    # Leading and subleading taus and the missing energy
+    objects = (taus & (table.rank(taus) < 2)) | (mask & table.type_mask("met"))
+    return total_transverse_mass_batch(table, objects)
 
-    # Momentum in the x and y-directions
-    px_total = np.sum([particle.pt * np.cos(particle.phi) for particle in taus + met])
-    py_total = np.sum([particle.pt * np.sin(particle.phi) for particle in taus + met])
 
-    # Total transverse momentum
-    return np.sqrt(np.power(pt_total, 2) - np.power(px_total, 2) - np.power(py_total, 2))
+@batch_implementation(transverse_mass_batch)
+def transverse_mass(event: Event) -> float:
+    """Calculates the transverse mass observable for the event."""
+    # Taus (leading and subleading only) and missing energy
+    return total_transverse_mass(event.tauhads[:2] + event.met)
 
 
 def atlas_ditauhad_bveto():
@@ -41,4 +41,6 @@ def atlas_ditauhad_bveto():
         btag_veto  # Veto events with b-tagged jets
     ]
     # Builds the EventAnalysis object
-    return EventAnalysis(particle_selections=particle_selections, cuts=selection_cuts)
+    # (each selection only runs when a cut needs its particles, and the cheapest rejections are tried first)
+    return EventAnalysis(particle_selections=particle_selections, cuts=selection_cuts, lazy_selections=True,
+                         reorder_cuts=True)
@@ -7,6 +7,7 @@
 """
 
 from LHCOReader_HighPT.src.Analysis import EventLoop
+from LHCOReader_HighPT.src.ResultStore import ResultStore
 from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV import atlas_ditau_13TEV_analyses
 import json
 
@@ -28,15 +29,20 @@ if __name__ == "__main__":
     efficiencies = {}
 
     # Responsible to iterate over the events in the file
-    event_loop = EventLoop()
-
-    # Launches the event loop in each .lhco file
-    for heavy_scalar_mass in heavy_scalar_masses:
-        lhco_file = f"{folder_path}/atlas-ditau-13TEV-m{heavy_scalar_mass}.lhco"
-        # Computes the efficiencies
-        efficiencies[heavy_scalar_mass], _ = event_loop.analyse_events(
-            lhco_file=lhco_file, event_analyses=event_analyses
-        )
+    # (the particle selections and cuts shared by the analyses are computed only once, and the results of each
+    # file are stored as soon as it's done, so only new or modified files are analysed in the next runs)
+    event_loop = EventLoop(engine="batch", share_steps=True, result_store=ResultStore(f"{folder_path}/results"))
+
+    # Launches the event loop in all the .lhco files in parallel
+    lhco_files = {
+        heavy_scalar_mass: f"{folder_path}/atlas-ditau-13TEV-m{heavy_scalar_mass}.lhco"
+        for heavy_scalar_mass in heavy_scalar_masses
+    }
+    results = event_loop.analyse_files(lhco_files=list(lhco_files.values()), event_analyses=event_analyses)
+
+    # Computes the efficiencies
+    for heavy_scalar_mass, lhco_file in lhco_files.items():
+        efficiencies[heavy_scalar_mass] = results[lhco_file].efficiencies
 
     # Saves the json file
     with open(f"{folder_path}/eff_LHCOReader_HighPT.json", "w") as file_:
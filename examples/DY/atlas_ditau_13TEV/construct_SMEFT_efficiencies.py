@@ -2,10 +2,8 @@
 
 from LHCOReader_HighPT.src.Analysis import EventLoop
 from LHCOReader_HighPT.src.Histogram import ObservableHistogram
-from LHCOReader_HighPT.src.Utilities import read_xsection
-from LHCOReader_HighPT.src.EfficiencyMatrixBuilder import EfficiencyFileBuilder
+from LHCOReader_HighPT.src.EfficiencyMatrixBuilder import EfficiencyFileBuilder, EfficiencyMatrixJob
 from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV import atlas_ditau_13TEV_analyses
-import numpy as np
 
 if __name__ == "__main__":
     # Folder where the .lhco files are store
@@ -17,15 +15,18 @@ if __name__ == "__main__":
         "FVLL_00_bb_tata_Z_Reg",
         "FVLL_00_bb_tata_Reg_Reg"
     ]
-    form_factors_xy = {
-        "FVLL_00_bb_tata_A_Reg": "LL LR RL RR",
-        "FVLL_00_bb_tata_Z_Reg": "LL RR",
-        "FVLL_00_bb_tata_Reg_Reg": "LL RR"
-    }
-    form_factors_term_type = {
-        "FVLL_00_bb_tata_A_Reg": "A*Reg",
-        "FVLL_00_bb_tata_Z_Reg": "Z*Reg",
-        "FVLL_00_bb_tata_Reg_Reg": "Reg*Reg"
+    form_factors_info = {
+        form_factor: {
+            "XY": xy,
+            "type": term_type,
+            # Initial quarks of the file
+            "qqbar": f"{form_factor.split('_')[2]}~"
+        }
+        for form_factor, xy, term_type in [
+            ("FVLL_00_bb_tata_A_Reg", "LL LR RL RR", "A*Reg"),
+            ("FVLL_00_bb_tata_Z_Reg", "LL RR", "Z*Reg"),
+            ("FVLL_00_bb_tata_Reg_Reg", "LL RR", "Reg*Reg")
+        ]
     }
 
     # Bin edges for the mTtot distribution (and the ones that defined the parton level mtt bins)
@@ -42,8 +43,8 @@ if __name__ == "__main__":
     }
 
     # Responsible to iterate over the events in one .lhco file and construct the histogram using
-    # the transverse_mass_hist as a template
-    event_loop = EventLoop(histogram=transverse_mass_hist)
+    # the transverse_mass_hist as a template (with bootstrap replicas for the statistical errors)
+    event_loop = EventLoop(histogram=transverse_mass_hist, engine="batch", bootstrap_replicas=100)
 
     # Constructs the efficiency file
     eff_file_builder = EfficiencyFileBuilder()
@@ -56,38 +57,19 @@ if __name__ == "__main__":
     eff_file_builder.FF = "vector"
     eff_file_builder.coef = "0 0"
 
-    # Iterates over the form-factor
-    for form_factor in form_factors:
-
-        # Stores the cross-sections for each bin
-        cross_sections = np.empty(shape=len(bin_edges) - 1)
-        # Stores the efficiency matrix
-        efficiency_matrix = np.empty(shape=(len(bin_edges) - 1, len(bin_edges) - 1))
-
-        # Initial quarks of the file
-        _, _, initial_quarks, *_ = form_factor.split("_")
-        eff_file_builder.qqbar = f"{initial_quarks}~"
-        # Other infos to add to the file
-        eff_file_builder.XY = form_factors_xy[form_factor]
-        eff_file_builder.type = form_factors_term_type[form_factor]
-
-        # For each different simulation bin
-        for bin_index in range(1, len(bin_edges)):
-            lhco_filename = f"{folder_path}/lhco_files/{form_factor}-bin-{bin_index}.lhco"
-            lhe_filename = f"{folder_path}/lhe_files/{form_factor}-bin-{bin_index}.lhe"
-
-            # Run the analysis over all the events
-            _, nevents = event_loop.analyse_events(lhco_file=lhco_filename, event_analyses=event_analyses)
-
-            # Updates the efficiency matrix and the cross-section arrays
-            iarr = bin_index - 1
-            efficiency_matrix[iarr] = event_loop.retrive_histogram("atlas-ditauhad-bveto").view(np.ndarray) / nevents
-            cross_sections[iarr] = read_xsection(lhe_filename)
+    # The .lhco and .lhe files of each simulation bin of each form-factor
+    manifest = EfficiencyMatrixJob.manifest_from_patterns(
+        form_factors, number_bins=len(bin_edges) - 1,
+        lhco_pattern=f"{folder_path}/lhco_files/{{form_factor}}-bin-{{bin_index}}.lhco",
+        lhe_pattern=f"{folder_path}/lhe_files/{{form_factor}}-bin-{{bin_index}}.lhe"
+    )
 
-        # Sets the efficiency matrix and the cross-sections
-        eff_file_builder.kernel = efficiency_matrix
-        eff_file_builder.xsections = 2 * cross_sections * 1000
+    # Runs the analysis over all the files in parallel (only the files that changed since the last run)
+    job = EfficiencyMatrixJob(event_loop, event_analyses, analysis_name="atlas-ditauhad-bveto",
+                              state_file=f"{folder_path}/SMEFT/efficiencies-state.json")
+    matrices = job.run(manifest)
 
-        # Saves the file
-        with open(f"{folder_path}/SMEFT/{form_factor}.dat", "w") as file:
-            file.write(eff_file_builder.build_file())
+    # Saves the files and the errors of the kernels
+    # (2 because only b b~ > ta+ ta- is simulated, and the cross-sections in fb)
+    job.write_files(matrices, eff_file_builder, output_folder=f"{folder_path}/SMEFT",
+                    form_factors_info=form_factors_info, xsection_factor=2 * 1000, kernel_errors=job.kernel_errors)
@@ -1,10 +1,50 @@
 """Classes responsible for performing iteration over the events and event analysis"""
 
-from LHCOReader_HighPT.src.LHCOReader import read_LHCO
+from LHCOReader_HighPT.src.LHCOReader import read_LHCO, read_LHCO_columnar, split_LHCO, iter_LHCO_chunks
 from LHCOReader_HighPT.src.EventInfo import Event
+from LHCOReader_HighPT.src.EventTable import EventTable
+from LHCOReader_HighPT.src.LHCOCache import LHCOCache
+from LHCOReader_HighPT.src.Compression import is_compressed
 from LHCOReader_HighPT.src.Histogram import Histogram, HistogramManager
+from LHCOReader_HighPT.src.Cutflow import Cutflow, required_selections
+from LHCOReader_HighPT.src.Utilities import prefetch, chunked
+from LHCOReader_HighPT.src.Instrumentation import Instrumentation, NullProbe
+from LHCOReader_HighPT.src.EventWeights import EventWeights
+from LHCOReader_HighPT.src.LHCOIndex import LHCOIndex
+from LHCOReader_HighPT.src.Statistics import (poisson_replica_weights, binomial_error, wilson_interval,
+                                              bootstrap_error, ONE_SIGMA)
+from LHCOReader_HighPT.src.ResultStore import ResultStore, fingerprint
+from LHCOReader_HighPT.src.Checkpoint import Checkpoint
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import numpy as np
+import itertools
+import time
 import copy
-from typing import Tuple, Dict, List, Callable
+from typing import Tuple, Dict, List, Callable, Iterable, Optional, Union
+
+# Number of events whose bootstrap weights are computed at once in the event engine
+_REPLICA_BLOCK = 4096
+
+
+def batch_implementation(batch_function: Callable):
+    """
+    Decorator that attaches a columnar implementation to a particle selection or to a cut,
+    so the analysis can also run in the batch engine (see EventAnalysis.launch_batch_analysis).
+
+    - For particle selections, batch_function(table, mask) must return the updated particle mask;
+    - For cuts, batch_function(table, mask) must return a boolean array with one entry per event
+      (True if the event passes the cut);
+    - For observables (see ObservableHistogram), batch_function(table, mask) must return the value of the
+      observable for each event.
+
+    'table' is the EventTable holding all the events and 'mask' is the particle mask with the particles
+    that survived the previous particle selections.
+    """
+    def decorator(function: Callable):
+        function.batch = batch_function
+        return function
+    return decorator
 
 
 class EventAnalysis:
@@ -13,7 +53,8 @@ class EventAnalysis:
     Holds information about particle selections and event selection cuts.
     """
 
-    def __init__(self, particle_selections: List[Callable], cuts: List[Callable]):
+    def __init__(self, particle_selections: List[Callable], cuts: List[Callable], lazy_selections: bool = False,
+                 reorder_cuts: bool = False):
         """
         :param particle_selections:
             A list of functions or callables that define the particle requirements for the analysis.
@@ -22,87 +63,1013 @@ class EventAnalysis:
         :param cuts:
             List of functions that represent the selection cuts.
             Each function must return True if the event passes the cut and False otherwise.
+        :param lazy_selections:
+            If True, each particle selection is only applied when a cut needs the particle types it uses
+            (see Cutflow.uses_particles), so events rejected by the first cuts skip the other selections.
+            The selections that were not needed by the cuts are applied on the events that passed all of them.
+        :param reorder_cuts:
+            If True, the cutflow reorders the cuts to evaluate first the ones with the lowest cost per rejected
+            event (see Cutflow). The cuts must only depend on the event, so that their order doesn't matter.
         """
         self._particle_selections = particle_selections
         self._cuts = cuts
+        self._lazy_selections = lazy_selections
+        self._reorder_cuts = reorder_cuts
+
+    @property
+    def particle_selections(self) -> List[Callable]:
+        """Particle selections of the analysis, in the order they are applied."""
+        return self._particle_selections
+
+    @property
+    def cuts(self) -> List[Callable]:
+        """Selection cuts of the analysis, in the order they were declared."""
+        return self._cuts
 
-    def launch_analysis(self, event: Event) -> Tuple[bool, Event]:
+    def new_cutflow(self, timed: bool = False) -> Cutflow:
+        """Returns an empty cutflow for the analysis (measuring the time of each step if timed is True)."""
+        return Cutflow.for_functions(self._cuts, self._particle_selections, reorder=self._reorder_cuts, timed=timed)
+
+    def launch_analysis(self, event: Event, cutflow: Cutflow = None) -> Tuple[bool, Event]:
         """
         Launches the analysis on the event.
         Returns a tuple, where the first item is a boolean indicating whether the event should be selected,
         and the second is the modified event after all the particle selections.
         This is done in case the modified event is needed by the EventLoop object for histogram booking.
+        If a Cutflow is given, the counts (and, if the cutflow is timed, the time) of each cut and selection are
+        recorded in it.
+        """
+        if cutflow is None and not self._lazy_selections:
+            # Selects the particles for the analysis
+            for selection in self._particle_selections:
+                # Updates the event with the particle selection
+                event = selection(event)
+            # Applies the event selection cuts
+            passed_cuts = all(cut(event) for cut in self._cuts)
+            # Returns the boolean and the modified event
+            return passed_cuts, event
+
+        # Holds the selections that were not applied yet
+        pending = list(range(len(self._particle_selections)))
+        clock = _clock(cutflow)
+        if not self._lazy_selections:
+            event = self._apply_selections(event, list(pending), pending, cutflow, clock)
+
+        passed_cuts = True
+        for cut_index in (cutflow.order if cutflow is not None else range(len(self._cuts))):
+            cut = self._cuts[cut_index]
+            if pending:
+                required = required_selections(getattr(cut, "particle_types", None), self._particle_selections,
+                                               pending)
+                event = self._apply_selections(event, required, pending, cutflow, clock)
+            start = clock()
+            passed_cuts = cut(event)
+            if cutflow is not None:
+                cutflow.record_cut(cut_index, int(passed_cuts), clock() - start)
+            if not passed_cuts:
+                break
+
+        # The event must hold all the selected particles (e.g. for the histograms)
+        if passed_cuts and pending:
+            event = self._apply_selections(event, list(pending), pending, cutflow, clock)
+        if cutflow is not None:
+            cutflow.end_event(int(passed_cuts))
+        return passed_cuts, event
+
+    def _apply_selections(self, event: Event, selection_indices: List[int], pending: List[int],
+                          cutflow: Optional[Cutflow], clock: Callable[[], float]) -> Event:
+        """Applies the selections (in order) and removes them from the pending selections."""
+        for selection_index in selection_indices:
+            start = clock()
+            event = self._particle_selections[selection_index](event)
+            if cutflow is not None:
+                cutflow.record_selection(selection_index, clock() - start)
+            pending.remove(selection_index)
+        return event
+
+    def launch_batch_analysis(self, table: EventTable, cutflow: Cutflow = None) -> Tuple[np.ndarray, np.ndarray]:
         """
+        Launches the analysis on all the events of the table at once.
+        Returns a tuple, where the first item is a boolean array indicating which events should be selected,
+        and the second is the particle mask with the particles that survived the particle selections.
+
+        Selections and cuts with a columnar implementation (see batch_implementation) are evaluated
+        with numpy over the whole table. The others are applied event by event on views of the table.
+        If a Cutflow is given, the counts (and, if the cutflow is timed, the time) of each cut and selection are
+        recorded in it.
+        """
+        clock = _clock(cutflow)
         # Selects the particles for the analysis
-        for selection in self._particle_selections:
-            # Updates the event with the particle selection
-            event = selection(event)
+        mask = np.ones(table.n_particles, dtype=bool)
+        for selection_index, selection in enumerate(self._particle_selections):
+            start = clock()
+            mask = self._batch_selection(selection, table, mask)
+            if cutflow is not None:
+                cutflow.record_selection(selection_index, clock() - start)
         # Applies the event selection cuts
-        passed_cuts = all(cut(event) for cut in self._cuts)
-        # Returns the boolean and the modified event
-        return passed_cuts, event
+        passed_cuts = np.ones(len(table), dtype=bool)
+        for cut_index in (cutflow.order if cutflow is not None else range(len(self._cuts))):
+            start = clock()
+            evaluated = int(np.count_nonzero(passed_cuts))
+            passed_cuts &= self._batch_cut(self._cuts[cut_index], table, mask, passed_cuts)
+            if cutflow is not None:
+                cutflow.record_cut(cut_index, int(np.count_nonzero(passed_cuts)), clock() - start, evaluated)
+        if cutflow is not None:
+            cutflow.end_event(int(np.count_nonzero(passed_cuts)), number_evts=len(table))
+        return passed_cuts, mask
+
+    @staticmethod
+    def _batch_selection(selection: Callable, table: EventTable, mask: np.ndarray) -> np.ndarray:
+        """Returns the particle mask after the particle selection."""
+        if hasattr(selection, "batch"):
+            return selection.batch(table, mask)
+        # The selection is applied on each event and the surviving views are mapped back to the table
+        selected_mask = np.zeros_like(mask)
+        for event_index in range(len(table)):
+            event = selection(table.event(event_index, mask))
+            for particle in event:
+                if not hasattr(particle, "index"):
+                    raise TypeError("Particle selections can only keep particles from the EventTable in batch mode.")
+                selected_mask[particle.index - table.offsets[0]] = True
+        return selected_mask
+
+    @staticmethod
+    def _batch_cut(cut: Callable, table: EventTable, mask: np.ndarray, passed_cuts: np.ndarray) -> np.ndarray:
+        """Returns a boolean array indicating the events that pass the cut."""
+        if hasattr(cut, "batch"):
+            return cut.batch(table, mask)
+        # Only events that survived the previous cuts are evaluated
+        passed = np.zeros(len(table), dtype=bool)
+        for event_index in np.flatnonzero(passed_cuts):
+            passed[event_index] = cut(table.event(event_index, mask))
+        return passed
+
+
+def _clock(*cutflows: Optional[Cutflow]) -> Callable[[], float]:
+    """Clock of the steps: time.perf_counter if any of the cutflows is timed, otherwise a clock that returns 0."""
+    if any(cutflow is not None and cutflow.timed for cutflow in cutflows):
+        return time.perf_counter
+    return _no_clock
+
+
+def _no_clock() -> float:
+    """Clock used when the cutflows are not timed, so the steps are not measured."""
+    return 0.
+
+
+class _AnalysisStep:
+    """Node of the AnalysisGraph: a particle selection or a cut shared by one or more analyses."""
+    __slots__ = ("function", "is_cut", "children", "users", "finished_analyses", "analyses")
+
+    def __init__(self, function: Optional[Callable], is_cut: bool):
+        self.function = function
+        self.is_cut = is_cut
+        # Steps that follow this one, keyed by (id of the function, is_cut)
+        self.children = {}
+        # Analyses that use the step, with the position of the step in the selections (or cuts) of each analysis
+        self.users = []
+        # Analyses that end at this step
+        self.finished_analyses = []
+        # All the analyses that go through this step
+        self.analyses = []
+
+
+class AnalysisGraph:
+    """
+    Compiles several analyses into a tree of steps, where the leading particle selections and cuts that are
+    shared by several analyses (the same function objects in the same order) are computed only once per event.
+
+    Each analysis is the sequence of its particle selections followed by its cuts. The event is copied only
+    where the analyses diverge into different particle selections, and cuts are evaluated once for all the
+    analyses that share them. The analyses are evaluated in the order they were declared, so the lazy_selections
+    and reorder_cuts options of EventAnalysis are not used.
+    """
+
+    def __init__(self, event_analyses: Dict[str, EventAnalysis], copy_events: bool = True):
+        """
+        :param event_analyses: dictionary with all the analysis that must be performed.
+        :param copy_events: if True, the branches of the tree receive deep copies of the event,
+                            otherwise they receive EventViews (see EventLoop).
+        """
+        self._copy_events = copy_events
+        self._root = _AnalysisStep(None, is_cut=False)
+        self.number_steps = 0
+        for analysis_name, event_analysis in event_analyses.items():
+            self._add_analysis(analysis_name, event_analysis)
+
+    def _add_analysis(self, analysis_name: str, event_analysis: EventAnalysis):
+        """Adds the steps of the analysis to the tree, reusing the ones shared with the previous analyses."""
+        steps = [(selection, False, index) for index, selection in enumerate(event_analysis.particle_selections)]
+        steps += [(cut, True, index) for index, cut in enumerate(event_analysis.cuts)]
+
+        node = self._root
+        node.analyses.append(analysis_name)
+        for function, is_cut, index in steps:
+            key = (id(function), is_cut)
+            if key not in node.children:
+                node.children[key] = _AnalysisStep(function, is_cut)
+                self.number_steps += 1
+            node = node.children[key]
+            node.users.append((analysis_name, index))
+            node.analyses.append(analysis_name)
+        node.finished_analyses.append(analysis_name)
+
+    def launch_analysis(self, event: Event, cutflows: Dict[str, Cutflow] = None) -> Dict[str, Tuple[bool, Event]]:
+        """
+        Launches all the analyses on the event.
+        Returns a dictionary with the outcome of each analysis, as in EventAnalysis.launch_analysis.
+        The event may be modified by the particle selections.
+        """
+        outcomes = {}
+        self._visit(self._root, event, outcomes, cutflows, _clock(*(cutflows or {}).values()))
+        if cutflows is not None:
+            for analysis_name, (passed_cuts, _) in outcomes.items():
+                cutflows[analysis_name].end_event(int(passed_cuts))
+        return outcomes
+
+    def _visit(self, node: _AnalysisStep, event: Event, outcomes: Dict, cutflows: Optional[Dict[str, Cutflow]],
+               clock: Callable[[], float]):
+        """Runs the steps that follow the node on the event (which can be modified)."""
+        for analysis_name in node.finished_analyses:
+            outcomes[analysis_name] = (True, event)
+
+        children = list(node.children.values())
+        # Cuts don't modify the event, hence they are evaluated before the selections of the other branches
+        for child in children:
+            if not child.is_cut:
+                continue
+            start = clock()
+            passed_cut = child.function(event)
+            self._record(child, cutflows, clock() - start, int(passed_cut))
+            if passed_cut:
+                self._visit(child, event, outcomes, cutflows, clock)
+            else:
+                for analysis_name in child.analyses:
+                    outcomes[analysis_name] = (False, event)
+
+        selections = [child for child in children if not child.is_cut]
+        # The last branch can modify the event if no analysis keeps it, the other ones receive copies
+        reuse_event = len(selections) == len(children) and not node.finished_analyses
+        for index, child in enumerate(selections):
+            branch_event = event if reuse_event and index == len(selections) - 1 else self._copy(event)
+            start = clock()
+            branch_event = child.function(branch_event)
+            self._record(child, cutflows, clock() - start)
+            self._visit(child, branch_event, outcomes, cutflows, clock)
+
+    def _copy(self, event: Event) -> Event:
+        """Copies the event for a new branch of the tree."""
+        return copy.deepcopy(event) if self._copy_events else event.view()
+
+    @staticmethod
+    def _record(node: _AnalysisStep, cutflows: Optional[Dict[str, Cutflow]], elapsed: float, passed: int = None,
+                evaluated: int = 1):
+        """Records the step in the cutflows of all the analyses that use it."""
+        if cutflows is None:
+            return
+        for analysis_name, index in node.users:
+            if passed is None:
+                cutflows[analysis_name].record_selection(index, elapsed)
+            else:
+                cutflows[analysis_name].record_cut(index, passed, elapsed, evaluated)
+
+    def launch_batch_analysis(self, table: EventTable, cutflows: Dict[str, Cutflow] = None
+                              ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Launches all the analyses on all the events of the table at once.
+        Returns a dictionary with the outcome of each analysis, as in EventAnalysis.launch_batch_analysis.
+        """
+        outcomes = {}
+        self._visit_batch(self._root, table, np.ones(table.n_particles, dtype=bool), np.ones(len(table), dtype=bool),
+                          outcomes, cutflows, _clock(*(cutflows or {}).values()))
+        if cutflows is not None:
+            for analysis_name, (passed_cuts, _) in outcomes.items():
+                cutflows[analysis_name].end_event(int(np.count_nonzero(passed_cuts)), number_evts=len(table))
+        return outcomes
+
+    def _visit_batch(self, node: _AnalysisStep, table: EventTable, mask: np.ndarray, passed_cuts: np.ndarray,
+                     outcomes: Dict, cutflows: Optional[Dict[str, Cutflow]], clock: Callable[[], float]):
+        """Runs the steps that follow the node on the table (the arrays are never modified in place)."""
+        for analysis_name in node.finished_analyses:
+            outcomes[analysis_name] = (passed_cuts, mask)
+
+        for child in node.children.values():
+            start = clock()
+            if child.is_cut:
+                child_passed = passed_cuts & EventAnalysis._batch_cut(child.function, table, mask, passed_cuts)
+                self._record(child, cutflows, clock() - start, int(np.count_nonzero(child_passed)),
+                             int(np.count_nonzero(passed_cuts)))
+                self._visit_batch(child, table, mask, child_passed, outcomes, cutflows, clock)
+            else:
+                child_mask = EventAnalysis._batch_selection(child.function, table, mask)
+                self._record(child, cutflows, clock() - start)
+                self._visit_batch(child, table, child_mask, passed_cuts, outcomes, cutflows, clock)
+
+
+class AnalysisResult:
+    """
+    Outcome of running the analyses over a set of events: the number of events that passed each analysis,
+    the total number of events and the histograms booked for each analysis.
+    With weight points (see EventWeights), it also holds the sum of the weights of all the events and of the
+    events that passed each analysis, for each weight point.
+    With bootstrap replicas (see Statistics), the same counters are also held for each replica.
+    Results obtained from different sets of events (e.g. chunks of the same file) can be merged.
+    """
+
+    def __init__(self, analysis_names: List[str], histogram_manager: HistogramManager = None,
+                 cutflows: Dict[str, Cutflow] = None, records: List[Dict] = None, weight_names: List[str] = None,
+                 bootstrap_replicas: int = 0):
+        # Holds the number of event that passed all the cuts in each analysis
+        self.passed = {analysis_name: 0 for analysis_name in analysis_names}
+        # Counts the total number of events
+        self.number_evts = 0
+        # Names of the weight points (if any)
+        self.weight_names = list(weight_names) if weight_names is not None else None
+        # Sum of the weights of all the events and of the events that passed each analysis, for each weight point
+        number_points = len(self.weight_names) if self.weight_names is not None else 0
+        self.sum_weights = np.zeros(number_points)
+        self.passed_weights = {analysis_name: np.zeros(number_points) for analysis_name in analysis_names}
+        # Number of events (total and passing each analysis) in each bootstrap replica
+        self.bootstrap_replicas = bootstrap_replicas
+        self.total_replicas = np.zeros(bootstrap_replicas)
+        self.passed_replicas = {analysis_name: np.zeros(bootstrap_replicas) for analysis_name in analysis_names}
+        # Sums of the weights in each bootstrap replica, with shape (replicas, weight points)
+        self.sum_weight_replicas = np.zeros((bootstrap_replicas, number_points))
+        self.passed_weight_replicas = {
+            analysis_name: np.zeros((bootstrap_replicas, number_points)) for analysis_name in analysis_names
+        }
+        # Histograms for each analysis (if any)
+        self.histogram_manager = histogram_manager
+        # Cutflow of each analysis (if any)
+        self.cutflows = cutflows if cutflows is not None else {}
+        # Records of the instrumentation (if any)
+        self.records = records if records is not None else []
+
+    @property
+    def efficiencies(self) -> Dict[str, float]:
+        """Fraction of events that passed all the cuts of each analysis."""
+        return {analysis_name: passed / self.number_evts for analysis_name, passed in self.passed.items()}
+
+    @property
+    def weighted_efficiencies(self) -> Dict[str, Dict[str, float]]:
+        """
+        Sum of the weights of the events that passed all the cuts of each analysis over the sum of the weights of
+        all the events, for each weight point: {analysis name: {weight name: efficiency}}.
+        """
+        if self.weight_names is None:
+            raise ValueError("The events were analysed without weight points.")
+        return {
+            analysis_name: dict(zip(self.weight_names, (passed_weights / self.sum_weights).tolist()))
+            for analysis_name, passed_weights in self.passed_weights.items()
+        }
+
+    @property
+    def efficiency_errors(self) -> Dict[str, float]:
+        """
+        Statistical error of the efficiency of each analysis: the standard deviation over the bootstrap replicas,
+        or the binomial error if there are no replicas.
+        """
+        if self.bootstrap_replicas > 0:
+            return {analysis_name: float(bootstrap_error(passed_replicas / self.total_replicas))
+                    for analysis_name, passed_replicas in self.passed_replicas.items()}
+        return {analysis_name: float(binomial_error(passed, self.number_evts))
+                for analysis_name, passed in self.passed.items()}
+
+    def efficiency_intervals(self, confidence: float = ONE_SIGMA) -> Dict[str, Tuple[float, float]]:
+        """Wilson score interval of the efficiency of each analysis (see Statistics.wilson_interval)."""
+        return {analysis_name: tuple(float(limit) for limit in wilson_interval(passed, self.number_evts, confidence))
+                for analysis_name, passed in self.passed.items()}
+
+    @property
+    def weighted_efficiency_errors(self) -> Dict[str, Dict[str, float]]:
+        """
+        Standard deviation over the bootstrap replicas of the efficiency of each analysis for each weight point:
+        {analysis name: {weight name: error}}.
+        """
+        if self.weight_names is None or self.bootstrap_replicas == 0:
+            raise ValueError("The events were analysed without weight points or without bootstrap replicas.")
+        return {
+            analysis_name: dict(zip(self.weight_names,
+                                    bootstrap_error(passed_replicas / self.sum_weight_replicas).tolist()))
+            for analysis_name, passed_replicas in self.passed_weight_replicas.items()
+        }
+
+    def merge(self, other: "AnalysisResult"):
+        """Adds the counters and histograms of another result obtained for the same analyses."""
+        if self.weight_names != other.weight_names or self.bootstrap_replicas != other.bootstrap_replicas:
+            raise ValueError("Only results obtained with the same weight points and replicas can be merged.")
+        for analysis_name, passed in other.passed.items():
+            self.passed[analysis_name] += passed
+            self.passed_weights[analysis_name] += other.passed_weights[analysis_name]
+            self.passed_replicas[analysis_name] += other.passed_replicas[analysis_name]
+            self.passed_weight_replicas[analysis_name] += other.passed_weight_replicas[analysis_name]
+        self.number_evts += other.number_evts
+        self.sum_weights += other.sum_weights
+        self.total_replicas += other.total_replicas
+        self.sum_weight_replicas += other.sum_weight_replicas
+        if self.histogram_manager is not None:
+            self.histogram_manager.merge(other.histogram_manager)
+        for analysis_name, cutflow in other.cutflows.items():
+            if analysis_name in self.cutflows:
+                self.cutflows[analysis_name].merge(cutflow)
+            else:
+                self.cutflows[analysis_name] = cutflow
+        self.records.extend(other.records)
+
+    def subset(self, analysis_names: List[str]) -> "AnalysisResult":
+        """
+        Returns the result of the given analyses only (in the given order), sharing the counters, histograms and
+        records with the current result.
+        """
+        result = copy.copy(self)
+        result.passed = {analysis_name: self.passed[analysis_name] for analysis_name in analysis_names}
+        result.passed_weights = {analysis_name: self.passed_weights[analysis_name] for analysis_name in analysis_names}
+        result.passed_replicas = {analysis_name: self.passed_replicas[analysis_name]
+                                  for analysis_name in analysis_names}
+        result.passed_weight_replicas = {analysis_name: self.passed_weight_replicas[analysis_name]
+                                         for analysis_name in analysis_names}
+        result.cutflows = {analysis_name: self.cutflows[analysis_name]
+                           for analysis_name in analysis_names if analysis_name in self.cutflows}
+        if self.histogram_manager is not None:
+            result.histogram_manager = self.histogram_manager.subset(analysis_names)
+        return result
+
+    def join(self, other: "AnalysisResult"):
+        """Adds the results of other analyses obtained on the same events (e.g. stored in a ResultStore)."""
+        if (self.number_evts != other.number_evts or self.weight_names != other.weight_names or
+                self.bootstrap_replicas != other.bootstrap_replicas):
+            raise ValueError("Only results obtained on the same events, with the same weight points and replicas, "
+                             "can be joined.")
+        self.passed.update(other.passed)
+        self.passed_weights.update(other.passed_weights)
+        self.passed_replicas.update(other.passed_replicas)
+        self.passed_weight_replicas.update(other.passed_weight_replicas)
+        self.cutflows.update(other.cutflows)
+        if self.histogram_manager is not None:
+            self.histogram_manager.join(other.histogram_manager)
+        self.records.extend(other.records)
+
+    def retrive_histogram(self, analysis_name: str, histogram_name: str = None, weight_name: str = None):
+        """Returns the histogram for a given analysis (see HistogramManager.retrive_hist)"""
+        if self.histogram_manager is not None:
+            return self.histogram_manager.retrive_hist(analysis_name, histogram_name, weight_name)
+
+    def retrive_histogram_replicas(self, analysis_name: str, histogram_name: str = None, weight_name: str = None):
+        """Returns the bootstrap replicas of the histogram (see HistogramManager.retrive_replicas)"""
+        if self.histogram_manager is not None:
+            return self.histogram_manager.retrive_replicas(analysis_name, histogram_name, weight_name)
 
 
 class EventLoop:
     """
     Iterates over all the events in a .lhco file, calculates the acceptance x efficiencies,
     and manages the histogram booking with the selected events.
+    The .lhco files may be compressed with gzip, bzip2 or xz (see Compression).
     """
 
-    def __init__(self, lhco_reader: Callable = None, histogram: Histogram = None):
+    def __init__(self, lhco_reader: Callable = None, histogram: Union[Histogram, Dict[str, Histogram]] = None,
+                 engine: str = "event", copy_events: bool = True, cache: LHCOCache = None,
+                 event_weight: Callable = None, share_steps: bool = False, prefetch_chunks: int = 0,
+                 chunk_size: int = 10000, instrumentation: Instrumentation = None,
+                 event_weights: Callable[[str], EventWeights] = None, bootstrap_replicas: int = 0,
+                 bootstrap_seed: int = 0, result_store: ResultStore = None, checkpoint_dir: str = None,
+                 checkpoint_interval: int = 10000, resume: bool = True):
+        """
+        :param lhco_reader: function that yields the events from a .lhco file (read_LHCO by default).
+                            To split files into chunks it must also accept the byte_range argument.
+                            It's only used by the event engine.
+        :param histogram: template of the histogram that must be booked for each analysis, or a dictionary with
+                          the templates of several named histograms (see HistogramManager), which are all filled
+                          in the same pass over the events.
+        :param engine: "event" to run the analyses event by event on the events yielded by the lhco_reader,
+                       or "batch" to read the whole file with read_LHCO_columnar and run the analyses
+                       over all the events at once (see EventAnalysis.launch_batch_analysis).
+        :param copy_events: if True, each analysis receives a deep copy of the event. If False, each analysis
+                            receives an EventView of the event, which shares the particles with the original
+                            event. The latter is only safe when the particle selections remove or add
+                            particles to the event but do not modify the particles themselves.
+        :param cache: LHCOCache with the parsed .lhco files. When given, whole files are read from the cache
+                      (the lhco_reader must accept the cache argument).
+        :param event_weight: (optional) function that returns the weight of an event, which is used to fill the
+                             histograms (e.g. with a WeightedHistogram). It receives the event before the particle
+                             selections. In the batch engine, a batch implementation event_weight.batch(table)
+                             returning the weights of all the events is used when available.
+        :param share_steps: if True, the particle selections and cuts shared by several analyses (at the beginning
+                            of the analyses) are computed only once per event (see AnalysisGraph).
+        :param prefetch_chunks: if larger than zero, the events are read and parsed in a background thread, in
+                                chunks of chunk_size events, while the analyses run on the previous chunks. At most
+                                prefetch_chunks chunks are held in memory waiting for the analyses. In the batch
+                                engine, the analyses then run on each chunk (see iter_LHCO_chunks) instead of on
+                                the whole file.
+        :param chunk_size: number of events in each chunk read in the background thread.
+        :param instrumentation: (optional) Instrumentation that measures the time spent in each stage of the
+                                analysis, the throughput and the memory usage, and emits them as records.
+                                The cutflows only measure the time of each cut and selection when it's given.
+        :param event_weights: (optional) function that returns the EventWeights of a .lhco file, e.g.
+                              EventWeights.for_lhco (it must be picklable to analyse files in parallel). The weights
+                              are matched to the events by their order in the file, counting the events without
+                              particles (see LHCOIndex.ordinals). The histograms are then booked
+                              for each weight point, and the results hold the sums of the weights of each weight
+                              point (see AnalysisResult.weighted_efficiencies). It can't be used with event_weight.
+        :param bootstrap_replicas: number of Poisson bootstrap replicas accumulated in the same pass over the
+                                   events (see Statistics). The results then hold the counters and histograms of each
+                                   replica, which give the statistical errors (see AnalysisResult.efficiency_errors).
+        :param bootstrap_seed: seed of the bootstrap replicas.
+        :param result_store: (optional) ResultStore where the result of each analysis on each file is stored as soon
+                             as the file is done. The analyses whose results are already in the store (for the same
+                             file content, analysis, histograms and settings) are not run again.
+        :param checkpoint_dir: (optional) folder where the state of the analysis of each file (or chunk of a file)
+                               is written every checkpoint_interval events (see Checkpoint): the counters,
+                               histograms, cutflows and bootstrap replicas, with the number of analysed events.
+                               The checkpoint is removed when the file (or chunk) is done.
+        :param checkpoint_interval: number of events between checkpoints. In the batch engine, the checkpoints are
+                                    written between chunks of chunk_size events.
+        :param resume: if True, the analysis of a file (or chunk) with a checkpoint for the same file and settings
+                       continues after the last analysed event (the lhco_reader must accept the byte_range
+                       argument). Compressed files are still decompressed from the beginning.
+        """
+        if engine not in ("event", "batch"):
+            raise ValueError(f"Unknown engine '{engine}', it must be 'event' or 'batch'.")
+        if event_weight is not None and event_weights is not None:
+            raise ValueError("Only one of event_weight and event_weights can be given.")
+        if engine == "batch" and lhco_reader not in (None, read_LHCO):
+            raise ValueError("The batch engine reads the files with read_LHCO_columnar, so it can't be used with "
+                             "a custom lhco_reader.")
         # Function responsible to read the events
         self._lhco_reader = lhco_reader if lhco_reader is not None else read_LHCO
-        self._histogram_manager = HistogramManager(hist_template=histogram) if histogram is not None else None
+        self._histogram = histogram
+        self._engine = engine
+        self._copy_events = copy_events
+        self._cache = cache
+        self._event_weight = event_weight
+        self._share_steps = share_steps
+        self._prefetch_chunks = prefetch_chunks
+        self._chunk_size = chunk_size
+        self._instrumentation = instrumentation
+        self._event_weights = event_weights
+        self._bootstrap_replicas = bootstrap_replicas
+        self._bootstrap_seed = bootstrap_seed
+        self._result_store = result_store
+        self._checkpoint_dir = checkpoint_dir
+        self._checkpoint_interval = checkpoint_interval
+        self._resume = resume
+        # Histograms, cutflows and result of the last analysed file
+        self._histogram_manager = None
+        self._cutflows = {}
+        self._result = None
 
-    def analyse_events(self, lhco_file: str, event_analyses: Dict[str, EventAnalysis]):
+    def analyse_events(self, lhco_file: str, event_analyses: Dict[str, EventAnalysis], n_workers: int = 1):
         """
         Runs the analysis on the events from the .lhco and returns a dictionary
         holding the efficiency value for each analysis.
 
         :param lhco_file: path to the .lhco file.
         :param event_analyses: dictionary with all the analysis that must be performed.
+        :param n_workers: number of processes. If larger than one, the file is split into n_workers chunks
+                          (see split_LHCO) that are analysed in parallel (see analyse_files).
         """
-        # Holds the number of event that passed all the cuts in each analysis
-        efficiencies = {analysis_name: 0 for analysis_name in event_analyses}
-        # Counts the total number of events
-        number_evts = 0
-
         print(f"Reading events from file: {lhco_file}")
 
-        # Initializes the histograms in case it's needed
-        if self._histogram_manager is not None:
-            self._histogram_manager.book_histograms(list(event_analyses.keys()))
+        if n_workers > 1:
+            result = self.analyse_files([lhco_file], event_analyses, n_workers=n_workers,
+                                        chunks_per_file=n_workers)[lhco_file]
+        else:
+            fingerprints, stored = self._stored_results(lhco_file, event_analyses)
+            pending = {name: analysis for name, analysis in event_analyses.items() if name not in stored}
+            result = self._analyse_chunk(lhco_file, None, pending) if pending else None
+            result = self._complete(lhco_file, event_analyses, fingerprints, stored, result)
+            self._report(result)
+
+        return result.efficiencies, result.number_evts
+
+    def analyse_files(self, lhco_files: List[str], event_analyses: Dict[str, EventAnalysis], n_workers: int = None,
+                      chunks_per_file: int = 1) -> Dict[str, AnalysisResult]:
+        """
+        Runs the analyses on several .lhco files with a pool of processes and returns the AnalysisResult
+        of each file.
+
+        Each file is split into chunks_per_file chunks at event boundaries (see split_LHCO), and all the chunks
+        are distributed over the processes. Compressed files are analysed as a single chunk. The results of the
+        chunks of a file are merged in the order of the events, so the efficiencies and histograms are identical to
+        the ones obtained with analyse_events.
+        The analyses, the lhco_reader and the histogram (with its observable) are sent to the processes,
+        hence they must be picklable (e.g. functions defined at module level).
+        With a result store, the results of each file are stored as soon as all its chunks are done, and the
+        analyses already in the store are not run. If a chunk fails, the other files are still completed (and
+        stored) before the error is raised. With a cache, the files split into several chunks are parsed into the
+        cache by this process before their chunks are distributed.
+
+        :param lhco_files: paths to the .lhco files.
+        :param event_analyses: dictionary with all the analysis that must be performed.
+        :param n_workers: number of processes (number of CPUs by default).
+        :param chunks_per_file: number of chunks each file is split into.
+        """
+        # Analyses of each file that are not in the result store
+        fingerprints, stored, pending = {}, {}, {}
+        for lhco_file in lhco_files:
+            fingerprints[lhco_file], stored[lhco_file] = self._stored_results(lhco_file, event_analyses)
+            pending[lhco_file] = {name: analysis for name, analysis in event_analyses.items()
+                                  if name not in stored[lhco_file]}
+
+        # Each task is the analysis of one chunk of a file
+        tasks = [
+            (lhco_file, byte_range)
+            for lhco_file in lhco_files if pending[lhco_file]
+            for byte_range in self._split_file(lhco_file, chunks_per_file)
+        ]
+        # Tasks of each file, in the order of the events
+        file_tasks = {lhco_file: [] for lhco_file, _ in tasks}
+        for task_index, (lhco_file, _) in enumerate(tasks):
+            file_tasks[lhco_file].append(task_index)
+        results = {lhco_file: self._complete(lhco_file, event_analyses, fingerprints[lhco_file],
+                                             stored[lhco_file], None)
+                   for lhco_file in lhco_files if not pending[lhco_file]}
+
+        # Files split into several chunks are parsed once into the cache before their chunks are distributed,
+        # so the processes don't parse (and store) the same file at the same time
+        if self._cache is not None:
+            for lhco_file, task_indices in file_tasks.items():
+                if len(task_indices) > 1:
+                    self._cache.load(lhco_file)
+
+        error = None
+        if tasks:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = {
+                    executor.submit(self._analyse_chunk, lhco_file, byte_range, pending[lhco_file]): task_index
+                    for task_index, (lhco_file, byte_range) in enumerate(tasks)
+                }
+                # Each file is completed as soon as all its chunks are done (merged in the order of the events)
+                done = {}
+                for future in as_completed(futures):
+                    lhco_file = tasks[futures[future]][0]
+                    try:
+                        done[futures[future]] = future.result()
+                    except Exception as chunk_error:
+                        error = error or chunk_error
+                        continue
+                    if all(task_index in done for task_index in file_tasks[lhco_file]):
+                        result = done[file_tasks[lhco_file][0]]
+                        for task_index in file_tasks[lhco_file][1:]:
+                            result.merge(done[task_index])
+                        results[lhco_file] = self._complete(lhco_file, event_analyses, fingerprints[lhco_file],
+                                                            stored[lhco_file], result)
+        if error is not None:
+            raise error
+
+        # The results are reported in the order of the files
+        results = {lhco_file: results[lhco_file] for lhco_file in lhco_files}
+        for lhco_file, result in results.items():
+            print(f"Results for file: {lhco_file}")
+            self._report(result)
+
+        return results
+
+    def _stored_results(self, lhco_file: str, event_analyses: Dict[str, EventAnalysis]
+                        ) -> Tuple[Dict[str, str], Dict[str, AnalysisResult]]:
+        """Fingerprint of each analysis and results of the analyses on the file found in the result store."""
+        if self._result_store is None:
+            return {}, {}
+        fingerprints = self._result_fingerprints(lhco_file, event_analyses)
+        stored = {}
+        for analysis_name in event_analyses:
+            result = self._result_store.load(lhco_file, fingerprints[analysis_name])
+            if result is not None:
+                stored[analysis_name] = result
+        if stored:
+            print(f"INFO: Results of {', '.join(stored)} for {lhco_file} loaded from the result store")
+        return fingerprints, stored
+
+    def _complete(self, lhco_file: str, event_analyses: Dict[str, EventAnalysis], fingerprints: Dict[str, str],
+                  stored: Dict[str, AnalysisResult], result: Optional[AnalysisResult]) -> AnalysisResult:
+        """
+        Stores the new result of each analysis on the file in the result store, and joins them with the stored
+        results (in the order of event_analyses).
+        """
+        if self._result_store is None:
+            return result
+        if result is not None:
+            for analysis_name in result.passed:
+                analysis_result = result.subset([analysis_name])
+                analysis_result.records = []
+                self._result_store.store(lhco_file, fingerprints[analysis_name], analysis_result)
+        for analysis_result in stored.values():
+            if result is None:
+                result = analysis_result
+            else:
+                result.join(analysis_result)
+        return result.subset(list(event_analyses))
+
+    def analysis_fingerprint(self, analysis_name: str, event_analysis: EventAnalysis) -> str:
+        """
+        Fingerprint (see ResultStore.fingerprint) of the analysis (name, particle selections and cuts), the
+        histogram templates (type, bin edges and observable) and the settings of the EventLoop that change the
+        results (reader, weights and bootstrap replicas), e.g. to detect when stored results are outdated.
+        """
+        return fingerprint(analysis_name, event_analysis.particle_selections, event_analysis.cuts, self._settings())
+
+    def _result_fingerprints(self, lhco_file: str, event_analyses: Dict[str, EventAnalysis]) -> Dict[str, str]:
+        """
+        Fingerprint of each analysis in the result store: the analysis (name, particle selections and cuts), the
+        histogram templates and the settings of the EventLoop that change the results (including the weights of
+        the events of the file, if any).
+        """
+        settings = self._settings()
+        if self._event_weights is not None:
+            weights = self._event_weights(lhco_file)
+            settings.append([weights.names, hashlib.blake2b(weights.weights.tobytes()).hexdigest()])
+        return {
+            analysis_name: fingerprint(analysis_name, event_analysis.particle_selections, event_analysis.cuts,
+                                       settings)
+            for analysis_name, event_analysis in event_analyses.items()
+        }
+
+    def _settings(self) -> List:
+        """Histogram templates and settings that change the results of the analyses (see analysis_fingerprint)."""
+        histograms = self._histogram if isinstance(self._histogram, dict) else {None: self._histogram}
+        return [
+            {name: None if template is None else [type(template), getattr(template, "bin_edges", None),
+                                                  getattr(template, "observable", None)]
+             for name, template in histograms.items()},
+            self._lhco_reader, self._event_weight, self._event_weights, self._bootstrap_replicas,
+            self._bootstrap_seed,
+        ]
+
+    @staticmethod
+    def _split_file(lhco_file: str, chunks_per_file: int) -> List[Optional[Tuple[int, int]]]:
+        """Byte ranges of the chunks of the file (None for the whole file, e.g. for compressed files)."""
+        if chunks_per_file == 1 or is_compressed(lhco_file):
+            return [None]
+        return split_LHCO(lhco_file, chunks_per_file)
+
+    def _analyse_chunk(self, lhco_file: str, byte_range: Optional[Tuple[int, int]],
+                       event_analyses: Dict[str, EventAnalysis]) -> AnalysisResult:
+        """Runs the analyses on the events of the file within byte_range (or on all of them if it's None)."""
+        # Index of the first event of the chunk in the file, used to match the weights and bootstrap replicas
+        first_event = 0
+        if byte_range is not None and (self._event_weights is not None or self._bootstrap_replicas > 0 or
+                                       self._checkpoint_dir is not None):
+            first_event = int(np.searchsorted(LHCOIndex.for_file(lhco_file).positions, byte_range[0]))
+        weights = weight_names = None
+        if self._event_weights is not None:
+            # The weights are given for all the events of the file, including the ones without particles
+            index = LHCOIndex.for_file(lhco_file)
+            weights = self._event_weights(lhco_file)
+            if len(weights) != index.number_all_events:
+                raise ValueError(f"{lhco_file} has {index.number_all_events} events, but there are weights for "
+                                 f"{len(weights)} events.")
+            weights, weight_names = weights.take(index.ordinals), weights.names
+
+        checkpoint = result = None
+        if self._checkpoint_dir is not None:
+            checkpoint = Checkpoint(self._checkpoint_dir, lhco_file, byte_range,
+                                    fingerprint(self._result_fingerprints(lhco_file, event_analyses)),
+                                    self._checkpoint_interval)
+            result = checkpoint.load() if self._resume else None
+
+        if result is None:
+            # Initializes the histograms in case it's needed
+            histogram_manager = None
+            if self._histogram is not None:
+                histogram_manager = HistogramManager(hist_template=self._histogram, weight_names=weight_names,
+                                                     bootstrap_replicas=self._bootstrap_replicas)
+                histogram_manager.book_histograms(list(event_analyses.keys()))
+
+            # Initializes the cutflows
+            # The time of each step is only measured when the analysis is instrumented
+            cutflows = {analysis_name: analysis.new_cutflow(timed=self._instrumentation is not None)
+                        for analysis_name, analysis in event_analyses.items()}
+            result = AnalysisResult(list(event_analyses.keys()), histogram_manager, cutflows,
+                                    weight_names=weight_names, bootstrap_replicas=self._bootstrap_replicas)
+        probe = NullProbe() if self._instrumentation is None else self._instrumentation.probe(lhco_file, byte_range)
+
+        # Only the options in use are passed, so custom readers don't need to support all of them
+        reader_options = {}
+        if result.number_evts > 0:
+            # The reading continues after the events in the checkpoint
+            print(f"INFO: Resuming {lhco_file} after {result.number_evts} events")
+            reader_options["byte_range"] = self._resume_range(lhco_file, byte_range, first_event + result.number_evts)
+        elif byte_range is not None:
+            reader_options["byte_range"] = byte_range
+        if self._cache is not None:
+            reader_options["cache"] = self._cache
+
+        # Analyses sharing their first steps are compiled into a tree
+        graph = AnalysisGraph(event_analyses, copy_events=self._copy_events) if self._share_steps else None
+
+        if self._engine == "batch":
+            if self._prefetch_chunks > 0:
+                # The chunks are read in a background thread while the previous ones are analysed
+                tables = prefetch(iter_LHCO_chunks(lhco_file, self._chunk_size, **reader_options),
+                                  self._prefetch_chunks)
+            elif checkpoint is not None:
+                # The file is analysed in chunks, so the checkpoints can be written between them
+                tables = iter_LHCO_chunks(lhco_file, self._chunk_size, **reader_options)
+            else:
+                # The whole file is analysed at once
+                start = probe.start()
+                tables = [read_LHCO_columnar(lhco_file, **reader_options)]
+                probe.lap("read", start)
+            for table in probe.timed(tables, "read"):
+                self._analyse_batch(table, event_analyses, result, graph, probe, weights, first_event, checkpoint)
+        else:
+            events = self._lhco_reader(lhco_file, **reader_options)
+            if self._prefetch_chunks > 0:
+                # The events are read in chunks in a background thread while the previous ones are analysed
+                events = itertools.chain.from_iterable(
+                    prefetch(chunked(events, self._chunk_size), self._prefetch_chunks)
+                )
+            self._analyse_event_by_event(probe.timed(events, "read"), event_analyses, result, graph, probe,
+                                         weights, first_event, checkpoint)
+
+        result.records = probe.finish(result.number_evts, result.passed, result.cutflows)
+        if checkpoint is not None:
+            checkpoint.remove()
+        return result
+
+    @staticmethod
+    def _resume_range(lhco_file: str, byte_range: Optional[Tuple[int, int]], event_index: int) -> Tuple[int, int]:
+        """Byte range of the events of the file (or of the chunk within byte_range) from event_index onwards."""
+        index = LHCOIndex.for_file(lhco_file)
+        end = index.file_size if byte_range is None else byte_range[1]
+        start = int(index.positions[event_index]) if event_index < len(index) else end
+        return min(start, end), end
+
+    def _analyse_event_by_event(self, events: Iterable[Event], event_analyses: Dict[str, EventAnalysis],
+                                result: AnalysisResult, graph: AnalysisGraph = None, probe=NullProbe(),
+                                weights: EventWeights = None, first_event: int = 0, checkpoint: Checkpoint = None):
+        """
+        Runs the analyses on each event and updates the result (using the AnalysisGraph, if given).
+        The time spent in each stage is measured by the probe (see Instrumentation).
+        The first event is the one with index first_event + result.number_evts in the file (for the weights and
+        bootstrap replicas). The state is written to the checkpoint, if given, every checkpoint interval.
+        """
+        # Bootstrap weights of a block of events (computed for several events at once)
+        replica_block, block_start = np.zeros((0, self._bootstrap_replicas)), 0
+        replica_weights = None
 
         # Iterates over all the events
-        for event in self._lhco_reader(lhco_file):
-            if number_evts > 0 and number_evts % 10000 == 0:
-                print(f"INFO: Reached {number_evts} events")
+        for event in events:
+            if result.number_evts > 0 and result.number_evts % 10000 == 0:
+                print(f"INFO: Reached {result.number_evts} events")
 
-            # Launch the analyses
-            for analysis_name, event_analysis in event_analyses.items():
-                # Copy the event (original event must remain the same for all analysis)
-                current_event = copy.deepcopy(event)
+            start = probe.start()
+            event_index = first_event + result.number_evts
+            if weights is not None:
+                weight = weights.rows(event_index, event_index + 1)[0]
+                result.sum_weights += weight
+            else:
+                weight = 1.0 if self._event_weight is None else self._event_weight(event)
+            if self._bootstrap_replicas > 0:
+                if event_index - block_start >= len(replica_block):
+                    block_start = event_index
+                    replica_block = poisson_replica_weights(np.arange(block_start, block_start + _REPLICA_BLOCK),
+                                                            self._bootstrap_replicas, self._bootstrap_seed)
+                replica_weights = replica_block[event_index - block_start]
+                result.total_replicas += replica_weights
+                if weights is not None:
+                    result.sum_weight_replicas += np.outer(replica_weights, weight)
+            start = probe.lap("weight", start)
 
-                # Checks if the event survived all the cuts and updates the counter
-                passed_cuts, analysis_event = event_analysis.launch_analysis(event=current_event)
+            # Launch the analyses
+            if graph is not None:
+                outcomes = graph.launch_analysis(event, result.cutflows)
+                start = probe.lap("analysis", start)
+            else:
+                outcomes = {}
+                for analysis_name, event_analysis in event_analyses.items():
+                    # Copy the event (original event must remain the same for all analysis)
+                    current_event = copy.deepcopy(event) if self._copy_events else event.view()
+                    start = probe.lap("copy", start)
+                    # Checks if the event survived all the cuts
+                    outcomes[analysis_name] = event_analysis.launch_analysis(
+                        event=current_event, cutflow=result.cutflows[analysis_name]
+                    )
+                    start = probe.lap("analysis", start)
 
+            for analysis_name, (passed_cuts, analysis_event) in outcomes.items():
                 # Updates the counter and updates the histogram
                 if passed_cuts:
-                    efficiencies[analysis_name] += 1
-                    if self._histogram_manager is not None:
-                        self._histogram_manager.update_analysis_hist(analysis_name=analysis_name, event=analysis_event)
+                    result.passed[analysis_name] += 1
+                    if weights is not None:
+                        result.passed_weights[analysis_name] += weight
+                    if replica_weights is not None:
+                        result.passed_replicas[analysis_name] += replica_weights
+                        if weights is not None:
+                            result.passed_weight_replicas[analysis_name] += np.outer(replica_weights, weight)
+                    if result.histogram_manager is not None:
+                        result.histogram_manager.update_analysis_hist(analysis_name=analysis_name,
+                                                                      event=analysis_event, weight=weight,
+                                                                      replica_weights=replica_weights)
+            probe.lap("histogram", start)
+            probe.partitions_used(event, outcomes)
 
-            number_evts += 1
+            result.number_evts += 1
+            probe.events_done(result.number_evts)
+            if checkpoint is not None:
+                checkpoint.events_done(result)
 
-        for analysis_name, survived_evts in efficiencies.items():
-            print(f"{analysis_name}: {survived_evts}/{number_evts} events passed")
+    def _analyse_batch(self, table: EventTable, event_analyses: Dict[str, EventAnalysis], result: AnalysisResult,
+                       graph: AnalysisGraph = None, probe=NullProbe(), event_weights: EventWeights = None,
+                       first_event: int = 0, checkpoint: Checkpoint = None):
+        """
+        Runs the analyses over all the events of the table at once and updates the result
+        (using the AnalysisGraph, if given). The time spent in each stage is measured by the probe.
+        The first event of the table is the one with index first_event + result.number_evts in the file (for the
+        event_weights and bootstrap replicas). The state is written to the checkpoint, if given, after the table.
+        """
+        start = probe.start()
+        table_start = first_event + result.number_evts
+        weights = replica_weights = None
+        if self._bootstrap_replicas > 0:
+            replica_weights = poisson_replica_weights(np.arange(table_start, table_start + len(table)),
+                                                      self._bootstrap_replicas, self._bootstrap_seed)
+            result.total_replicas += replica_weights.sum(axis=0)
+        if event_weights is not None:
+            weights = event_weights.rows(table_start, table_start + len(table))
+            result.sum_weights += weights.sum(axis=0)
+            if replica_weights is not None:
+                result.sum_weight_replicas += replica_weights.T @ weights
+        elif self._event_weight is not None and result.histogram_manager is not None:
+            if hasattr(self._event_weight, "batch"):
+                weights = np.asarray(self._event_weight.batch(table), dtype=np.float64)
+            else:
+                weights = np.array([self._event_weight(event) for event in table], dtype=np.float64)
+        start = probe.lap("weight", start)
 
-        # Divide by the total number of events to obtain the efficiencies
-        efficiencies = {analysis_name: efficiencies[analysis_name] / number_evts for analysis_name in efficiencies}
+        if graph is not None:
+            outcomes = graph.launch_batch_analysis(table, result.cutflows)
+        else:
+            outcomes = {
+                analysis_name: event_analysis.launch_batch_analysis(table, cutflow=result.cutflows[analysis_name])
+                for analysis_name, event_analysis in event_analyses.items()
+            }
+        start = probe.lap("analysis", start)
 
-        return efficiencies, number_evts
+        for analysis_name, (passed_cuts, mask) in outcomes.items():
+            result.passed[analysis_name] += int(np.count_nonzero(passed_cuts))
+            if event_weights is not None:
+                result.passed_weights[analysis_name] += weights[passed_cuts].sum(axis=0)
+            if replica_weights is not None:
+                result.passed_replicas[analysis_name] += replica_weights[passed_cuts].sum(axis=0)
+                if event_weights is not None:
+                    passed_weights = weights[passed_cuts]
+                    result.passed_weight_replicas[analysis_name] += replica_weights[passed_cuts].T @ passed_weights
 
-    def retrive_histogram(self, analysis_name: str):
-        """Returns the histogram for a given analysis"""
+            # Histograms are updated with the selected particles of the events that passed the cuts
+            if result.histogram_manager is not None:
+                result.histogram_manager.update_analysis_hist_batch(
+                    analysis_name=analysis_name, table=table, mask=mask, passed_cuts=passed_cuts, weights=weights,
+                    replica_weights=replica_weights
+                )
+        probe.lap("histogram", start)
+
+        result.number_evts += len(table)
+        probe.events_done(result.number_evts)
+        if checkpoint is not None:
+            checkpoint.events_done(result)
+
+    def _report(self, result: AnalysisResult):
+        """
+        Prints the number of events that passed each analysis, keeps the histograms of the result and emits the
+        records of the instrumentation.
+        """
+        for analysis_name, survived_evts in result.passed.items():
+            print(f"{analysis_name}: {survived_evts}/{result.number_evts} events passed")
+        self._histogram_manager = result.histogram_manager
+        self._cutflows = result.cutflows
+        self._result = result
+        if self._instrumentation is not None:
+            for record in result.records:
+                self._instrumentation.emit(record)
+
+    @property
+    def histogram(self) -> Union[Histogram, Dict[str, Histogram], None]:
+        """Template (or dictionary of named templates) of the histograms booked for each analysis."""
+        return self._histogram
+
+    @property
+    def bootstrap_replicas(self) -> int:
+        """Number of bootstrap replicas accumulated in the pass over the events."""
+        return self._bootstrap_replicas
+
+    @property
+    def bootstrap_seed(self) -> int:
+        """Seed of the bootstrap replicas."""
+        return self._bootstrap_seed
+
+    def retrive_histogram(self, analysis_name: str, histogram_name: str = None, weight_name: str = None):
+        """Returns the histogram for a given analysis (from the last analysed file)"""
         if self._histogram_manager is not None:
-            return self._histogram_manager.retrive_hist(analysis_name)
+            return self._histogram_manager.retrive_hist(analysis_name, histogram_name, weight_name)
+
+    def retrive_weighted_efficiencies(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the efficiencies of each analysis for each weight point (from the last analysed file),
+        see AnalysisResult.weighted_efficiencies.
+        """
+        return self._result.weighted_efficiencies
+
+    def retrive_cutflow(self, analysis_name: str) -> Cutflow:
+        """Returns the cutflow for a given analysis (from the last analysed file)"""
+        return self._cutflows.get(analysis_name)
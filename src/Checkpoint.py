@@ -0,0 +1,79 @@
+"""Checkpoints of the analysis of a .lhco file (or of a chunk of it), used to resume interrupted runs."""
+
+from typing import Optional, Tuple
+import hashlib
+import pickle
+import os
+
+
+class Checkpoint:
+    """
+    Holds the state of the analysis of one file (or chunk of a file within byte_range): the AnalysisResult with the
+    counters, histograms and cutflows after the first result.number_evts events. The position where the reading
+    resumes is found from the number of analysed events with the index of the file (see LHCOIndex).
+
+    The checkpoint is written (atomically) every 'interval' events and removed when the analysis is done. It's only
+    loaded if the .lhco file (size and modification time) and the configuration of the analyses didn't change.
+    """
+    # Must be increased whenever the layout of the checkpoint changes
+    version = 2
+    extension = ".ckpt"
+
+    def __init__(self, checkpoint_dir: str, lhco_file: str, byte_range: Optional[Tuple[int, int]],
+                 configuration: str, interval: int = 10000):
+        """
+        :param checkpoint_dir: folder where the checkpoints are written.
+        :param lhco_file: path to the .lhco file.
+        :param byte_range: part of the file being analysed (None for the whole file).
+        :param configuration: fingerprint of the analyses and settings (see ResultStore.fingerprint).
+        :param interval: number of events between checkpoints.
+        """
+        if interval < 1:
+            raise ValueError("The checkpoint interval must be positive.")
+        key = hashlib.blake2b(f"{os.path.abspath(lhco_file)}:{byte_range}".encode(), digest_size=12).hexdigest()
+        self.filename = os.path.join(checkpoint_dir, f"{os.path.basename(lhco_file)}.{key}{self.extension}")
+        self.lhco_file = lhco_file
+        self.configuration = configuration
+        self.interval = interval
+        # Number of events after which the next checkpoint is written
+        self._next_checkpoint = interval
+
+    def load(self):
+        """Returns the AnalysisResult stored in the checkpoint (None if there is no valid checkpoint)."""
+        try:
+            with open(self.filename, "rb") as checkpoint_file:
+                state = pickle.load(checkpoint_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if (state.get("version") != self.version or state.get("signature") != self._signature() or
+                state.get("configuration") != self.configuration):
+            return None
+        result = state["result"]
+        self._next_checkpoint = (result.number_evts // self.interval + 1) * self.interval
+        return result
+
+    def events_done(self, result):
+        """Called after each event (or table), writes the checkpoint every 'interval' events."""
+        if result.number_evts >= self._next_checkpoint:
+            self.store(result)
+            self._next_checkpoint = (result.number_evts // self.interval + 1) * self.interval
+
+    def store(self, result):
+        """Writes the result into the checkpoint (atomically)."""
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        temporary_file = f"{self.filename}.{os.getpid()}.tmp"
+        with open(temporary_file, "wb") as checkpoint_file:
+            pickle.dump({"version": self.version, "signature": self._signature(),
+                         "configuration": self.configuration, "result": result},
+                        checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_file, self.filename)
+
+    def remove(self):
+        """Removes the checkpoint (when the analysis is done)."""
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def _signature(self):
+        """Size and modification time of the .lhco file."""
+        file_stat = os.stat(self.lhco_file)
+        return [file_stat.st_size, file_stat.st_mtime_ns]
@@ -0,0 +1,71 @@
+"""
+    Reading of compressed .lhco files (gzip, bzip2 and xz).
+
+    The format is detected from the first bytes of the file, so the files don't need a particular extension.
+    The files are decompressed while they are read, without writing the decompressed copy to disk.
+"""
+
+from LHCOReader_HighPT.src.Utilities import prefetch
+from typing import Iterator, Optional
+import bz2
+import gzip
+import lzma
+
+# First bytes of the files in each of the supported formats and the functions that open them
+_MAGIC_NUMBERS = {
+    "gzip": (b"\x1f\x8b", gzip.open),
+    "bzip2": (b"BZh", bz2.open),
+    "xz": (b"\xfd7zXZ\x00", lzma.open),
+}
+
+
+def compression_format(filename: str) -> Optional[str]:
+    """Returns the compression format of the file ("gzip", "bzip2" or "xz"), or None if it's not compressed."""
+    with open(filename, "rb") as file_:
+        first_bytes = file_.read(6)
+    for compression, (magic_number, _) in _MAGIC_NUMBERS.items():
+        if first_bytes.startswith(magic_number):
+            return compression
+    return None
+
+
+def is_compressed(filename: str) -> bool:
+    """Returns True if the file is compressed with one of the supported formats."""
+    return compression_format(filename) is not None
+
+
+def open_decompressed(filename: str):
+    """Opens the file in binary mode, decompressing its content on the fly if it's compressed."""
+    compression = compression_format(filename)
+    if compression is None:
+        return open(filename, "rb")
+    return _MAGIC_NUMBERS[compression][1](filename, "rb")
+
+
+def _read_blocks(filename: str, block_size: int) -> Iterator[bytes]:
+    """Yields the decompressed content of the file in blocks of block_size bytes."""
+    with open_decompressed(filename) as file_:
+        for block in iter(lambda: file_.read(block_size), b""):
+            yield block
+
+
+def iter_decompressed_blocks(filename: str, block_size: int = 1 << 18, prefetch_blocks: int = 4) -> Iterator[bytes]:
+    """
+    Yields the decompressed content of the file in blocks of block_size bytes.
+    The blocks are decompressed in a background thread, up to prefetch_blocks blocks ahead of the consumer,
+    so that the decompression overlaps with the parsing of the previous blocks (the zlib, bz2 and lzma modules
+    release the GIL while decompressing).
+    """
+    return prefetch(_read_blocks(filename, block_size), prefetch_blocks)
+
+
+def iter_decompressed_lines(filename: str, block_size: int = 1 << 18, prefetch_blocks: int = 4) -> Iterator[bytes]:
+    """Yields the lines (with the line break) of the decompressed content of the file (see iter_decompressed_blocks)."""
+    remainder = b""
+    for block in iter_decompressed_blocks(filename, block_size, prefetch_blocks):
+        lines = (remainder + block).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if remainder:
+        yield remainder
@@ -0,0 +1,153 @@
+"""
+    Cutflow of an analysis: number of events that reach and pass each cut, and the time spent in each cut and
+    particle selection. The cutflow can also reorder the cuts, so that cheap cuts with a large rejection are
+    evaluated first (see EventAnalysis.launch_analysis).
+"""
+
+from typing import Callable, Iterable, List, Optional, Set
+
+
+def uses_particles(*particle_types: str):
+    """
+    Decorator that declares the particle types (as in Event.particles_type) read or modified by a particle
+    selection or a cut, e.g. @uses_particles("electrons", "muons").
+
+    With lazy selections (see EventAnalysis), a cut only triggers the particle selections for the types it uses,
+    so the remaining selections are skipped for the events that fail the cut. Selections and cuts without this
+    information are assumed to use all the particle types.
+    """
+    def decorator(function: Callable):
+        function.particle_types = frozenset(particle_types)
+        return function
+    return decorator
+
+
+def required_selections(particle_types: Optional[Set[str]], selections: List[Callable],
+                        pending: List[int]) -> List[int]:
+    """
+    Returns the pending selections (indices in the list of selections) that must be applied before using the
+    particle types: the selections that use any of the types and, recursively, the previous selections that use
+    any of the types of those selections. particle_types None means that all the particle types are used.
+    """
+    required = []
+    for selection_index in reversed(pending):
+        selection_types = getattr(selections[selection_index], "particle_types", None)
+        if particle_types is None or selection_types is None or selection_types & particle_types:
+            required.append(selection_index)
+            particle_types = None if particle_types is None or selection_types is None else \
+                particle_types | selection_types
+    return required[::-1]
+
+
+class Cutflow:
+    """
+    Records, for each cut, the number of events where it was evaluated and the number of events that passed it,
+    and, if timed is True, the cumulative time spent in each cut and particle selection.
+
+    The cuts are evaluated in the order given by 'order'. If reorder is True, the order is updated every
+    'reorder_interval' events, sorting the cuts by the expected time to reject an event (time per evaluation
+    divided by the fraction of rejected events). The final decision of the analysis doesn't depend on the order,
+    but the counts of each cut do, since a cut is only evaluated on the events that passed the previous ones.
+    """
+
+    def __init__(self, cut_names: List[str], selection_names: List[str], reorder: bool = False,
+                 reorder_interval: int = 1000, timed: bool = False):
+        """
+        :param cut_names: names of the cuts, in the order they were declared.
+        :param selection_names: names of the particle selections.
+        :param reorder: if True, the cuts are reordered according to their cost and rejection.
+        :param reorder_interval: number of events between updates of the order.
+        :param timed: if True, the time spent in each cut and selection is measured. The reordering needs the
+                      times, so the cutflows that reorder the cuts are always timed.
+        """
+        self.cut_names = list(cut_names)
+        self.selection_names = list(selection_names)
+        self.reorder = reorder
+        self.timed = timed or reorder
+        self.reorder_interval = reorder_interval
+        # Order in which the cuts are evaluated
+        self.order = list(range(len(self.cut_names)))
+        # Holds the number of events analysed and the number of events that passed all the cuts
+        self.number_evts = 0
+        self.total_passed = 0
+        # Holds the number of events where each cut was evaluated and the number of events that passed it
+        self.evaluated = [0] * len(self.cut_names)
+        self.passed = [0] * len(self.cut_names)
+        # Cumulative time (in seconds) spent in each cut and selection
+        self.cut_time = [0.] * len(self.cut_names)
+        self.selection_time = [0.] * len(self.selection_names)
+        # Number of times each selection was applied
+        self.selection_calls = [0] * len(self.selection_names)
+
+    @classmethod
+    def for_functions(cls, cuts: Iterable[Callable], selections: Iterable[Callable], **options):
+        """Creates the cutflow using the names of the cut and selection functions."""
+        return cls([_name(cut) for cut in cuts], [_name(selection) for selection in selections], **options)
+
+    def record_cut(self, cut_index: int, passed: int, elapsed: float, evaluated: int = 1):
+        """Records the evaluation of the cut on 'evaluated' events, where 'passed' of them passed it."""
+        self.evaluated[cut_index] += evaluated
+        self.passed[cut_index] += passed
+        self.cut_time[cut_index] += elapsed
+
+    def record_selection(self, selection_index: int, elapsed: float, calls: int = 1):
+        """Records the time spent in the particle selection."""
+        self.selection_time[selection_index] += elapsed
+        self.selection_calls[selection_index] += calls
+
+    def end_event(self, passed: int, number_evts: int = 1):
+        """Counts the analysed events (and the ones that passed all the cuts) and updates the order if needed."""
+        previous = self.number_evts
+        self.number_evts += number_evts
+        self.total_passed += passed
+        if self.reorder and self.number_evts // self.reorder_interval > previous // self.reorder_interval:
+            self.update_order()
+
+    def update_order(self):
+        """Sorts the cuts by the expected time to reject an event."""
+        def rejection_cost(cut_index: int) -> float:
+            # (time per evaluation) / (fraction of rejected events) = total time / number of rejected events
+            rejected = self.evaluated[cut_index] - self.passed[cut_index]
+            return self.cut_time[cut_index] / rejected if rejected > 0 else float("inf")
+        # sorted is stable: cuts with the same cost keep their current order
+        self.order = sorted(self.order, key=rejection_cost)
+
+    def merge(self, other: "Cutflow"):
+        """Adds the counters and times of another cutflow of the same analysis."""
+        if self.cut_names != other.cut_names or self.selection_names != other.selection_names:
+            raise ValueError("Only cutflows of the same analysis can be merged.")
+        self.number_evts += other.number_evts
+        self.total_passed += other.total_passed
+        for cut_index in range(len(self.cut_names)):
+            self.evaluated[cut_index] += other.evaluated[cut_index]
+            self.passed[cut_index] += other.passed[cut_index]
+            self.cut_time[cut_index] += other.cut_time[cut_index]
+        for selection_index in range(len(self.selection_names)):
+            self.selection_time[selection_index] += other.selection_time[selection_index]
+            self.selection_calls[selection_index] += other.selection_calls[selection_index]
+
+    def table(self) -> str:
+        """Returns the cutflow table as a string (cuts in the current order of evaluation)."""
+        lines = [f"{'cut':30s} {'evaluated':>10s} {'passed':>10s} {'eff.':>8s} {'cumul.':>8s} {'time [s]':>10s}"]
+        for cut_index in self.order:
+            evaluated, passed = self.evaluated[cut_index], self.passed[cut_index]
+            efficiency = passed / evaluated if evaluated else 0.
+            cumulative = passed / self.number_evts if self.number_evts else 0.
+            lines.append(f"{self.cut_names[cut_index]:30s} {evaluated:10d} {passed:10d} {efficiency:8.4f} "
+                         f"{cumulative:8.4f} {self.cut_time[cut_index]:10.4f}")
+        total_efficiency = self.total_passed / self.number_evts if self.number_evts else 0.
+        lines.append(f"{'all cuts':30s} {self.number_evts:10d} {self.total_passed:10d} {total_efficiency:8.4f} "
+                     f"{total_efficiency:8.4f} {sum(self.cut_time):10.4f}")
+        for selection_index, selection_name in enumerate(self.selection_names):
+            lines.append(f"{'[selection] ' + selection_name:30s} {self.selection_calls[selection_index]:10d} "
+                         f"{'':10s} {'':8s} {'':8s} {self.selection_time[selection_index]:10.4f}")
+        return "\n".join(lines)
+
+    def __str__(self):
+        """For nice printing"""
+        return self.table()
+
+
+def _name(function: Callable) -> str:
+    """Name of a function or callable object."""
+    return getattr(function, "__name__", type(function).__name__)
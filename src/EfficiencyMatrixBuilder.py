@@ -1,6 +1,13 @@
-"""Helper class to construct the efficiency matrix."""
+"""Helper classes to construct the efficiency matrix."""
 
+from LHCOReader_HighPT.src.Analysis import EventLoop, EventAnalysis
+from LHCOReader_HighPT.src.Utilities import read_xsection
+from LHCOReader_HighPT.src.Statistics import binomial_error, bootstrap_error
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Union
 import numpy as np
+import copy
+import json
+import os
 
 
 class EfficiencyFileBuilder:
@@ -12,6 +19,8 @@ class EfficiencyFileBuilder:
         # All banner info are initialized with None value
         self.__dict__ = {info: None for info in self.banner_info.split()}
         self.kernel = np.array([])
+        # Statistical error of each entry of the kernel (optional)
+        self.kernel_errors = np.array([])
         self.xsections = np.array([])
         self.bin_edges = np.array([])
 
@@ -48,11 +57,247 @@ class EfficiencyFileBuilder:
         banner_info += "# " + " ".join([f"{bin_edge:.0f}" for bin_edge in self.bin_edges]) + "\n"
         return banner_info
 
-    def construct_content(self):
-        """Builds the efficiency matrices for the file"""
+    def build_errors_file(self):
+        """Constructs the file with the statistical errors of the kernel, with the same layout as build_file"""
+        return self.construct_header() + self.construct_content(self.kernel_errors)
+
+    def construct_content(self, kernel: np.ndarray = None):
+        """Builds the efficiency matrices for the file (or the given matrix with the same layout, e.g. the errors)"""
+        kernel = self.kernel if kernel is None else kernel
         low_bin_values, high_bin_values = self.bin_edges[:-1], self.bin_edges[1:]
         additional_info = np.array([self.xsections, low_bin_values, high_bin_values])
         # information with the same columns as in High-Pt
-        all_info = np.concatenate((additional_info.transpose(), self.kernel), axis=1)
+        all_info = np.concatenate((additional_info.transpose(), kernel), axis=1)
         # Transforms to string
         return "\n".join([" ".join([f"{val:.4e}" for val in line]) for line in all_info])
+
+
+class ManifestEntry(NamedTuple):
+    """Simulation of one parton-level bin of a form factor."""
+    form_factor: str
+    bin_index: int          # index of the bin, starting at 1
+    lhco_file: str
+    lhe_file: str
+
+
+def _file_signature(filename: str) -> List[int]:
+    """Size and modification time of the file, used to detect changes."""
+    file_stat = os.stat(filename)
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+
+class EfficiencyMatrixJob:
+    """
+    Computes the efficiency matrices (kernels) and the cross-sections of several form factors.
+
+    The job receives a manifest with the .lhco and .lhe files of each bin of each form factor. All the .lhco files
+    are analysed concurrently (see EventLoop.analyse_files), and each row of the kernel is the histogram of the
+    selected events of a bin divided by the number of events of the bin.
+
+    The statistical error of each entry of the kernels is estimated from the bootstrap replicas of the histogram,
+    if the EventLoop has them, or from the binomial distribution (see Statistics).
+
+    If a state file is given, the efficiencies and cross-sections of each bin are stored in it, and the next runs
+    only analyse the .lhco files (and read the .lhe files) whose size or modification time changed. Changing the
+    analysis (name, code or parameters of its particle selections and cuts), the histogram template or the settings
+    of the EventLoop that change the results (see EventLoop.analysis_fingerprint) invalidates all the stored results.
+    """
+
+    def __init__(self, event_loop: EventLoop, event_analyses: Dict[str, EventAnalysis], analysis_name: str,
+                 histogram_name: str = None, state_file: str = None):
+        """
+        :param event_loop: EventLoop with the histogram of the observable (see EventLoop).
+        :param event_analyses: dictionary with the analyses that must be performed.
+        :param analysis_name: name of the analysis whose histogram gives the efficiencies.
+        :param histogram_name: name of the histogram, if the EventLoop books several histograms.
+        :param state_file: (optional) .json file where the results of each bin are stored for incremental runs.
+        """
+        self.event_loop = event_loop
+        self.event_analyses = event_analyses
+        self.analysis_name = analysis_name
+        self.histogram_name = histogram_name
+        self.state_file = state_file
+        # Holds the stored results of each bin (keyed by the .lhco file)
+        self.state = self._load_state()
+        # Holds the statistical errors of the kernels of the last run
+        self.kernel_errors = {}
+
+    @staticmethod
+    def manifest_from_patterns(form_factors: Iterable[str], number_bins: int, lhco_pattern: str,
+                               lhe_pattern: str) -> List[ManifestEntry]:
+        """
+        Builds the manifest from the patterns of the file names, which are formatted with form_factor and
+        bin_index, e.g. "{form_factor}-bin-{bin_index}.lhco".
+        """
+        return [
+            ManifestEntry(form_factor, bin_index, lhco_pattern.format(form_factor=form_factor, bin_index=bin_index),
+                          lhe_pattern.format(form_factor=form_factor, bin_index=bin_index))
+            for form_factor in form_factors for bin_index in range(1, number_bins + 1)
+        ]
+
+    def run(self, manifest: Iterable[Union[ManifestEntry, Tuple, Dict]], n_workers: int = None,
+            chunks_per_file: int = 1) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Analyses the files that changed since the last run and returns, for each form factor,
+        the cross-sections of the bins and the kernel (one row per bin). The statistical errors of the kernels
+        are kept in kernel_errors.
+
+        :param manifest: entries (form_factor, bin_index, lhco_file, lhe_file), as tuples or dictionaries.
+        :param n_workers: number of processes (see EventLoop.analyse_files).
+        :param chunks_per_file: number of chunks each file is split into (see EventLoop.analyse_files).
+        """
+        manifest = [ManifestEntry(**entry) if isinstance(entry, dict) else ManifestEntry(*entry)
+                    for entry in manifest]
+        _check_bins(manifest)
+        configuration = self._configuration()
+        if self.state.get("configuration") != configuration:
+            self.state = {"configuration": configuration, "bins": {}}
+        stored_bins = self.state["bins"]
+
+        # Only the .lhco files that changed are analysed
+        signatures = {entry.lhco_file: _file_signature(entry.lhco_file) for entry in manifest}
+        outdated = sorted({
+            lhco_file for lhco_file, signature in signatures.items()
+            if stored_bins.get(lhco_file, {}).get("lhco_signature") != signature
+        })
+        if outdated:
+            results = self.event_loop.analyse_files(lhco_files=outdated, event_analyses=self.event_analyses,
+                                                    n_workers=n_workers, chunks_per_file=chunks_per_file)
+            for lhco_file, result in results.items():
+                histogram = result.retrive_histogram(self.analysis_name, self.histogram_name)
+                replicas = result.retrive_histogram_replicas(self.analysis_name, self.histogram_name)
+                stored_bins[lhco_file] = {
+                    "lhco_signature": signatures[lhco_file],
+                    "number_evts": result.number_evts,
+                    "efficiencies": (_histogram_values(histogram) / result.number_evts).tolist(),
+                    "efficiency_errors": _efficiency_errors(histogram, replicas, result).tolist(),
+                }
+
+        # The cross-sections are only read again if the .lhe file changed
+        for entry in manifest:
+            stored_bin = stored_bins[entry.lhco_file]
+            lhe_signature = _file_signature(entry.lhe_file)
+            if stored_bin.get("lhe_file") != entry.lhe_file or stored_bin.get("lhe_signature") != lhe_signature:
+                xsection = read_xsection(entry.lhe_file)
+                if xsection is None:
+                    raise ValueError(f"The cross-section of {entry.form_factor} (bin {entry.bin_index}) was not "
+                                     f"found in {entry.lhe_file}.")
+                stored_bin.update(lhe_file=entry.lhe_file, lhe_signature=lhe_signature, xsection=xsection)
+
+        self._store_state()
+        return self._assemble(manifest)
+
+    def write_files(self, matrices: Dict[str, Tuple[np.ndarray, np.ndarray]], file_builder: EfficiencyFileBuilder,
+                    output_folder: str, form_factors_info: Dict[str, Dict[str, str]] = None,
+                    xsection_factor: float = 1., kernel_errors: Dict[str, np.ndarray] = None) -> List[str]:
+        """
+        Writes the efficiency file of each form factor (named {form_factor}.dat) and returns their paths.
+        If the kernel errors are given, the errors of each form factor are written into {form_factor}_errors.dat.
+
+        :param matrices: cross-sections and kernels of the form factors (see run).
+        :param file_builder: EfficiencyFileBuilder with the information shared by all the files (e.g. Experiment,
+                             Search, bin_edges).
+        :param output_folder: folder where the files are written.
+        :param form_factors_info: attributes of the builder specific to each form factor, e.g. {"XY": "LL RR"}.
+        :param xsection_factor: factor multiplying the cross-sections (e.g. to change the units).
+        :param kernel_errors: (optional) statistical errors of the kernels (see kernel_errors).
+        """
+        os.makedirs(output_folder, exist_ok=True)
+        filenames = []
+        for form_factor, (xsections, kernel) in matrices.items():
+            # Each row of the kernel corresponds to one parton-level bin of the file
+            if len(kernel) != len(file_builder.bin_edges) - 1:
+                raise ValueError(f"The kernel of {form_factor} has {len(kernel)} rows, but the file has "
+                                 f"{len(file_builder.bin_edges) - 1} bins.")
+            builder = copy.copy(file_builder)
+            for info, value in (form_factors_info or {}).get(form_factor, {}).items():
+                setattr(builder, info, value)
+            builder.kernel = kernel
+            builder.xsections = xsection_factor * xsections
+
+            filenames.append(os.path.join(output_folder, f"{form_factor}.dat"))
+            with open(filenames[-1], "w") as file_:
+                file_.write(builder.build_file())
+
+            if kernel_errors is not None:
+                builder.kernel_errors = kernel_errors[form_factor]
+                filenames.append(os.path.join(output_folder, f"{form_factor}_errors.dat"))
+                with open(filenames[-1], "w") as file_:
+                    file_.write(builder.build_errors_file())
+        return filenames
+
+    def _assemble(self, manifest: List[ManifestEntry]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Builds the cross-sections and the kernel of each form factor from the results of the bins."""
+        entries = {}
+        for entry in manifest:
+            entries.setdefault(entry.form_factor, {})[entry.bin_index] = self.state["bins"][entry.lhco_file]
+
+        matrices, self.kernel_errors = {}, {}
+        for form_factor, bins in entries.items():
+            number_bins = len(bins)
+            xsections = np.array([bins[bin_index]["xsection"] for bin_index in range(1, number_bins + 1)],
+                                 dtype=np.float64)
+            kernel = np.array([bins[bin_index]["efficiencies"] for bin_index in range(1, number_bins + 1)])
+            matrices[form_factor] = (xsections, kernel)
+            self.kernel_errors[form_factor] = np.array(
+                [bins[bin_index]["efficiency_errors"] for bin_index in range(1, number_bins + 1)]
+            )
+        return matrices
+
+    def _configuration(self) -> Dict:
+        """Settings that change the results of the bins."""
+        event_analysis = self.event_analyses[self.analysis_name]
+        return {
+            "analysis": self.analysis_name,
+            "histogram": self.histogram_name,
+            # Selections and cuts (code and parameters), histogram templates, weights and bootstrap settings
+            "fingerprint": self.event_loop.analysis_fingerprint(self.analysis_name, event_analysis),
+        }
+
+    def _load_state(self) -> Dict:
+        """Reads the results stored by the previous runs."""
+        if self.state_file is None or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file) as state:
+                return json.load(state)
+        except ValueError:
+            return {}
+
+    def _store_state(self):
+        """Writes the results of the bins into the state file (atomically)."""
+        if self.state_file is None:
+            return
+        temporary_file = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(temporary_file, "w") as state:
+            json.dump(self.state, state, indent=2)
+        os.replace(temporary_file, self.state_file)
+
+
+def _check_bins(manifest: List[ManifestEntry]):
+    """Checks that the manifest holds the bins 1, 2, ..., N of each form factor (once each)."""
+    bin_indices = {}
+    for entry in manifest:
+        bin_indices.setdefault(entry.form_factor, []).append(entry.bin_index)
+    for form_factor, indices in bin_indices.items():
+        if sorted(indices) != list(range(1, len(indices) + 1)):
+            raise ValueError(f"The manifest of {form_factor} must hold the bins 1 to {len(indices)} once each.")
+
+
+def _histogram_values(histogram) -> np.ndarray:
+    """Contents of the histogram (the sum of weights for a WeightedHistogram)."""
+    return np.asarray(getattr(histogram, "sumw", histogram), dtype=np.float64)
+
+
+def _efficiency_errors(histogram, replicas, result) -> np.ndarray:
+    """
+    Statistical error of the efficiency of each bin: the standard deviation over the bootstrap replicas, if any,
+    or the binomial error (the error of the sum of weights for a WeightedHistogram).
+    """
+    if replicas is not None:
+        number_evts = result.total_replicas.reshape((-1,) + (1,) * (replicas.ndim - 1))
+        return bootstrap_error(replicas / number_evts)
+    if hasattr(histogram, "sumw2"):
+        return np.sqrt(histogram.sumw2) / result.number_evts
+    return binomial_error(_histogram_values(histogram), result.number_evts)
+
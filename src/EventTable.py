@@ -0,0 +1,254 @@
+"""
+    Columnar (struct-of-arrays) representation of the events of a .lhco file:
+    - EventTable:
+        Holds the information of all the particles in flat numpy arrays (one per particle info)
+        together with an offset array that marks where each event starts.
+        Indexing the table returns an Event object made of ParticleView objects.
+    - ParticleView:
+        Lightweight, read-only view of a single row of the table.
+        Information can be extracted as simple attrs, as for the Particle class.
+"""
+
+from LHCOReader_HighPT.src.EventInfo import Event
+from typing import List
+import numpy as np
+
+
+def _column(row: int):
+    """Read-only attribute that returns the value of the particle info stored in the given row of the table."""
+    return property(lambda self: self._data.item(row, self._index))
+
+
+class ParticleView:
+    """
+    View of a single particle stored in an EventTable.
+    The particle's information can be accessed as attributes, in the same way as for the Particle class.
+
+    Example: particle.pt, particle.phi, etc.
+    """
+    __slots__ = ("_data", "_index")
+
+    typ = _column(0)
+    eta = _column(1)
+    phi = _column(2)
+    pt = _column(3)
+    jmas = _column(4)
+    ntrk = _column(5)
+    btag = _column(6)
+    had_em = _column(7)
+    dum1 = _column(8)
+    dum2 = _column(9)
+
+    def __init__(self, data: np.ndarray, index: int):
+        """
+        :param data: array with shape (number of particle infos, number of particles) from the EventTable.
+        :param index: position of the particle in the table.
+        """
+        self._data = data
+        self._index = index
+
+    @property
+    def index(self) -> int:
+        """Position of the particle in the EventTable."""
+        return self._index
+
+    def __getattr__(self, info):
+        """
+        Handles the access of the had/em ratio with the same name as in the .lhco file.
+        """
+        if info == "had/em":
+            return self.had_em
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{info}'")
+
+    def __repr__(self):
+        """For nice printing"""
+        display_info = [f"{info}:{getattr(self, info)}" for info in "typ eta phi pt jmas ntrk btag".split()]
+        return "ParticleView(" + ", ".join(display_info) + ")"
+
+    def __copy__(self):
+        """Views are read-only, hence they can be shared instead of copied."""
+        return self
+
+
+class EventTable:
+    """
+    Stores all the events of a .lhco file in a columnar way.
+
+    The information of the particles is stored in a single array with shape (10, number of particles), where
+    each row holds one of the particle infos (see 'columns'). The particles of the event i are stored in the
+    positions offsets[i]:offsets[i + 1], sorted by pT as in the Event class.
+
+    The table behaves like a read-only sequence of Event objects, e.g. table[0] or 'for event in table'.
+    """
+    # Information available about the particles (the had/em ratio is accessed as had_em)
+    columns = "typ eta phi pt jmas ntrk btag had_em dum1 dum2".split()
+    column_rows = {info: row for row, info in enumerate(columns)}
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, positions: np.ndarray = None):
+        """
+        :param data: array with shape (len(columns), number of particles) holding the particles info.
+        :param offsets: array with shape (number of events + 1,) with the position of the first particle of
+                        each event. The last entry must be the total number of particles.
+        :param positions: (optional) byte position in the .lhco file where each event starts.
+        """
+        self.data = data
+        self.offsets = offsets
+        self.positions = positions
+        self._event_index = None
+
+    @classmethod
+    def from_particle_rows(cls, particle_rows: np.ndarray, event_sizes: np.ndarray, positions: np.ndarray = None):
+        """
+        Builds the table from an array with shape (number of particles, len(columns)), where each row holds
+        the information of one particle in the same order as in the .lhco file, and from the number of
+        particles in each event. The particles are sorted by pT inside each event.
+        """
+        event_sizes = np.asarray(event_sizes, dtype=np.int64)
+        offsets = np.zeros(len(event_sizes) + 1, dtype=np.int64)
+        np.cumsum(event_sizes, out=offsets[1:])
+        # Sorts by pT inside each event (lexsort is stable, as the sorting in the Event class)
+        event_index = np.repeat(np.arange(len(event_sizes)), event_sizes)
+        order = np.lexsort((-particle_rows[:, cls.column_rows["pt"]], event_index))
+        return cls(np.ascontiguousarray(particle_rows[order].T), offsets, positions)
+
+    @classmethod
+    def concatenate(cls, tables: List["EventTable"]):
+        """Joins several tables into a single one, keeping the order of the events."""
+        if not tables:
+            return cls(np.empty((len(cls.columns), 0)), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        data = np.concatenate([table.data[:, table.offsets[0]:table.offsets[-1]] for table in tables], axis=1)
+        offsets = [np.zeros(1, dtype=np.int64)]
+        for table in tables:
+            offsets.append(table.offsets[1:] - table.offsets[0] + offsets[-1][-1])
+        positions = None
+        if all(table.positions is not None for table in tables):
+            positions = np.concatenate([table.positions for table in tables])
+        return cls(data, np.concatenate(offsets), positions)
+
+    def __len__(self):
+        """Number of events in the table."""
+        return len(self.offsets) - 1
+
+    @property
+    def n_particles(self) -> int:
+        """Total number of particles in the table."""
+        return int(self.offsets[-1] - self.offsets[0])
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Number of particles in each event."""
+        return np.diff(self.offsets)
+
+    @property
+    def event_index(self) -> np.ndarray:
+        """Index of the event each particle belongs to (relative to the start of the table)."""
+        if self._event_index is None:
+            self._event_index = np.repeat(np.arange(len(self)), self.counts)
+        return self._event_index
+
+    def column(self, info: str) -> np.ndarray:
+        """Returns the array with the information 'info' for all the particles in the table."""
+        if info == "had/em":
+            info = "had_em"
+        return self.data[self.column_rows[info], self.offsets[0]:self.offsets[-1]]
+
+    def __getattr__(self, info: str) -> np.ndarray:
+        """The particle infos can be accessed as attrs, e.g. table.pt"""
+        if info in self.column_rows:
+            return self.column(info)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{info}'")
+
+    def __getitem__(self, item):
+        """
+        Returns the Event with index 'item'.
+        If 'item' is a slice, returns a new table that shares the data with the current one.
+        """
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError("EventTable only supports contiguous slices.")
+            positions = None if self.positions is None else self.positions[start:max(start, stop)]
+            return self.__class__(self.data, self.offsets[start:max(start, stop) + 1], positions)
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("EventTable index out of range")
+        return self.event(item)
+
+    def take(self, items) -> "EventTable":
+        """Returns a new table with the events of the given indices (in the given order)."""
+        items = np.asarray(items, dtype=np.int64)
+        counts = self.counts[items]
+        offsets = np.zeros(len(items) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        # Position in the data of each particle of the selected events
+        particles = np.arange(offsets[-1]) + np.repeat(self.offsets[items] - offsets[:-1], counts)
+        positions = None if self.positions is None else self.positions[items]
+        return self.__class__(self.data[:, particles], offsets, positions)
+
+    def event(self, item: int, mask: np.ndarray = None) -> Event:
+        """
+        Returns the Event with index 'item'.
+        If a particle mask is given (see 'type_mask'), only the particles with a True entry are included.
+        """
+        start, stop = self.offsets[item], self.offsets[item + 1]
+        if mask is None:
+            return Event([ParticleView(self.data, index) for index in range(start, stop)])
+        first = self.offsets[0]
+        return Event([ParticleView(self.data, index) for index in range(start, stop) if mask[index - first]])
+
+    def __iter__(self):
+        """Yields a single event at time."""
+        for item in range(len(self)):
+            yield self[item]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the arrays of the table."""
+        return self.data.nbytes + self.offsets.nbytes
+
+    def type_mask(self, part_type: str) -> np.ndarray:
+        """
+        Particle mask selecting the particles of a given type, e.g. table.type_mask("tauhads").
+        Masks are boolean arrays with one entry per particle in the table.
+        """
+        if part_type not in Event.particles_type:
+            raise ValueError(f"Unknown particle type '{part_type}'")
+        return self.typ == Event.particles_type[part_type]
+
+    def count(self, mask: np.ndarray) -> np.ndarray:
+        """Number of particles selected by the mask in each event."""
+        return np.bincount(self.event_index[mask], minlength=len(self))
+
+    def sum(self, mask: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """
+        Sum of the values (one per particle in the table, e.g. table.pt) of the particles selected by the mask
+        in each event.
+        """
+        return np.bincount(self.event_index[mask], weights=values[mask], minlength=len(self))
+
+    def any(self, mask: np.ndarray) -> np.ndarray:
+        """Returns True for the events with at least one particle selected by the mask."""
+        return self.count(mask) > 0
+
+    def rank(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Position of each particle among the particles selected by the mask in the same event, i.e. 0 for the
+        leading selected particle, 1 for the subleading, and so on. Particles not selected have rank -1.
+        """
+        # Number of selected particles before each position of the table
+        selected_before = np.concatenate(([0], np.cumsum(mask)))
+        # Number of selected particles before the first particle of each event
+        event_start = selected_before[self.offsets[:-1] - self.offsets[0]]
+        rank = selected_before[:-1] - event_start[self.event_index]
+        return np.where(mask, rank, -1)
+
+    def nth(self, mask: np.ndarray, n: int, info: str, fill_value: float = np.nan) -> np.ndarray:
+        """
+        Returns, for each event, the information 'info' of the n-th particle (sorted by pT, starting at 0)
+        selected by the mask. Events with less than n + 1 selected particles get 'fill_value'.
+        """
+        values = np.full(len(self), fill_value, dtype=np.float64)
+        selected = self.rank(mask) == n
+        values[self.event_index[selected]] = self.column(info)[selected]
+        return values
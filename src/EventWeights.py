@@ -0,0 +1,168 @@
+"""
+    Weights of the events of a .lhco file for one or more weight points (e.g. the nominal weight and the weights
+    of the LHE reweighting for several values of the SMEFT coefficients).
+
+    The .lhco files don't hold the event weights, so they are read from the .lhe file of the same simulation or
+    from a sidecar file. The weights are matched to the events by their order in the files, i.e. the k-th event
+    of the .lhco file has the weights of the k-th event of the .lhe file. The events without particles, which are
+    skipped by the readers (see read_LHCO), are also counted, so there must be weights for them too
+    (see LHCOIndex.ordinals).
+"""
+
+from LHCOReader_HighPT.src.Compression import open_decompressed
+from typing import List, Optional
+import numpy as np
+import re
+import os
+
+# Reweighting entries of the events: <wgt id='name'> value </wgt>
+_WEIGHT_PATTERN = re.compile(r"<wgt\s+id\s*=\s*['\"]([^'\"]+)['\"][^>]*>\s*([^<\s]+)\s*</wgt>")
+
+
+class EventWeights:
+    """
+    Holds the weights of the events in an array with shape (number of events, number of weight points)
+    and the name of each weight point.
+    """
+    # Extension of the sidecar file where the weights read from the .lhe file are stored
+    extension = ".weights.npz"
+
+    def __init__(self, weights: np.ndarray, names: List[str] = None):
+        """
+        :param weights: array with shape (number of events, number of weight points), or with shape
+                        (number of events,) for a single weight point.
+        :param names: names of the weight points (by default "w0", "w1", ...).
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        self.weights = weights[:, np.newaxis] if weights.ndim == 1 else weights
+        self.names = list(names) if names is not None else [f"w{index}" for index in range(self.weights.shape[1])]
+        if len(self.names) != self.weights.shape[1]:
+            raise ValueError("There must be one name for each weight point.")
+
+    def __len__(self):
+        """Number of events."""
+        return len(self.weights)
+
+    @property
+    def number_points(self) -> int:
+        """Number of weight points."""
+        return self.weights.shape[1]
+
+    def rows(self, start: int, stop: int) -> np.ndarray:
+        """Weights of the events with indices in [start, stop)."""
+        if start < 0 or stop > len(self):
+            raise ValueError(f"There are weights for {len(self)} events, but the events [{start}, {stop}) "
+                             f"were requested.")
+        return self.weights[start:stop]
+
+    def take(self, event_indices: np.ndarray) -> "EventWeights":
+        """Returns the weights of the events with the given indices only."""
+        return EventWeights(self.weights[event_indices], self.names)
+
+    def select(self, names: List[str]) -> "EventWeights":
+        """Returns the weights of the given weight points only."""
+        columns = [self.names.index(name) for name in names]
+        return EventWeights(self.weights[:, columns], names)
+
+    @classmethod
+    def from_lhe(cls, lhe_file: str, names: List[str] = None) -> "EventWeights":
+        """
+        Reads the weights of the events of a .lhe file (which may be compressed): the nominal weight (XWGTUP),
+        under the name "nominal", and the weights of the reweighting (<wgt id="..."> entries), under their ids.
+
+        :param names: (optional) names of the weight points to keep.
+        """
+        all_weights, weight_names = [], None
+        with open_decompressed(lhe_file) as lhe:
+            in_event = event_header = False
+            for line in lhe:
+                line = line.decode(errors="replace").strip()
+                if line.startswith("<event"):
+                    in_event = event_header = True
+                    event_weights, event_names = [], ["nominal"]
+                elif not in_event or not line:
+                    continue
+                elif event_header:
+                    # First line of the event: NUP IDPRUP XWGTUP SCALUP AQEDUP AQCDUP
+                    event_weights.append(float(line.split()[2]))
+                    event_header = False
+                elif line.startswith("</event"):
+                    in_event = False
+                    if weight_names is None:
+                        weight_names = event_names
+                    elif event_names != weight_names:
+                        raise ValueError(f"The event {len(all_weights) + 1} of {lhe_file} has different weights.")
+                    all_weights.append(event_weights)
+                elif "<wgt" in line:
+                    for name, value in _WEIGHT_PATTERN.findall(line):
+                        event_names.append(name)
+                        event_weights.append(float(value))
+
+        event_weights = cls(np.array(all_weights, dtype=np.float64).reshape(len(all_weights), -1)
+                            if all_weights else np.zeros((0, 1)), weight_names or ["nominal"])
+        return event_weights.select(names) if names is not None else event_weights
+
+    @classmethod
+    def from_file(cls, filename: str) -> "EventWeights":
+        """
+        Reads the weights from a sidecar file:
+            - .npz: arrays "weights" (and optionally "names");
+            - .npy: the weights array;
+            - text: one line per event and one column per weight point (optionally with a first line
+              "# name1 name2 ..." with the names of the weight points).
+        """
+        if filename.endswith(".npz"):
+            with np.load(filename) as stored:
+                return cls(stored["weights"], stored["names"].tolist() if "names" in stored else None)
+        if filename.endswith(".npy"):
+            return cls(np.load(filename))
+
+        names = None
+        with open(filename) as weights_file:
+            first_line = weights_file.readline()
+        if first_line.startswith("#"):
+            names = first_line[1:].split()
+        return cls(np.loadtxt(filename, ndmin=2), names)
+
+    @classmethod
+    def for_lhco(cls, lhco_file: str) -> "EventWeights":
+        """
+        Returns the weights of the events of the .lhco file, read from (in order of preference):
+            - the sidecar file lhco_file + ".weights.npz", if it's newer than the .lhe file;
+            - the .lhe file of the simulation (same name as the .lhco file, with the extension .lhe or .lhe.gz),
+              in which case the weights are also stored in the sidecar file (if the folder is writable).
+        """
+        sidecar_file = lhco_file + cls.extension
+        lhe_file = _matching_lhe(lhco_file)
+        if os.path.exists(sidecar_file) and (
+                lhe_file is None or os.path.getmtime(sidecar_file) >= os.path.getmtime(lhe_file)):
+            return cls.from_file(sidecar_file)
+        if lhe_file is None:
+            raise FileNotFoundError(f"No weights were found for {lhco_file}.")
+
+        event_weights = cls.from_lhe(lhe_file)
+        event_weights.store(sidecar_file)
+        return event_weights
+
+    def store(self, filename: str):
+        """Writes the weights into a .npz file (the weights are kept only in memory if it can't be written)."""
+        temporary_file = f"{filename}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_file, "wb") as weights_file:
+                np.savez(weights_file, weights=self.weights, names=np.array(self.names))
+            os.replace(temporary_file, filename)
+        except OSError:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+
+
+def _matching_lhe(lhco_file: str) -> Optional[str]:
+    """The .lhe file with the same name as the .lhco file (None if there is none)."""
+    stem = lhco_file
+    for extension in (".gz", ".bz2", ".xz", ".lhco"):
+        if stem.endswith(extension):
+            stem = stem[:-len(extension)]
+    for extension in (".lhe", ".lhe.gz"):
+        if os.path.exists(stem + extension):
+            return stem + extension
+    return None
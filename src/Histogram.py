@@ -1,9 +1,16 @@
-"""Interface to construct a binning histogram."""
+"""
+    Interface to construct a binning histogram.
+    - ObservableHistogram:
+        One-dimensional histogram of event counts that behaves like a numpy array.
+    - WeightedHistogram:
+        N-dimensional histogram with event weights and the sum of the squared weights (statistical errors).
+"""
 
 from abc import ABC, abstractmethod
 import numpy as np
 from LHCOReader_HighPT.src.EventInfo import Event
-from typing import List, Callable
+from typing import Dict, List, Callable, Optional, Sequence, Tuple
+import bisect
 import copy
 
 
@@ -11,8 +18,12 @@ class Histogram(ABC):
     """Defines the interface for a histogram class."""
 
     @abstractmethod
-    def update_hist(self, event: Event):
-        """Updates the histogram with a given Event."""
+    def update_hist(self, event: Event, weight: float = 1.0):
+        """
+        Updates the histogram with a given Event (with the given weight).
+        Histograms that don't support weights may implement update_hist(event) only: they are then given the events
+        with the default weight without the weight argument (see _update_hist).
+        """
         raise RuntimeError("Trying to use a method from a abstract class.")
 
     @abstractmethod
@@ -20,31 +31,245 @@ class Histogram(ABC):
         """Clones an empty histogram"""
         pass
 
+    def update_hist_batch(self, table, mask: np.ndarray, passed_cuts: np.ndarray, weights: np.ndarray = None):
+        """
+        Updates the histogram with the events of an EventTable that passed the cuts (see EventLoop).
+        By default, the events are built one at a time with the particles selected by the mask.
+
+        :param weights: (optional) weight of each event of the table.
+        """
+        for event_index in np.flatnonzero(passed_cuts):
+            weight = 1.0 if weights is None else weights[event_index]
+            _update_hist(self, table.event(event_index, mask), weight)
+
+    def merge(self, other: "Histogram"):
+        """
+        Adds the content of another histogram with the same binning to the current one.
+        Only needed to combine the results of chunks of a file (see EventLoop.analyse_files).
+        """
+        raise NotImplementedError(f"'{type(self).__name__}' does not support merging.")
+
+
+def _update_hist(histogram: Histogram, event: Event, weight: float):
+    """
+    Updates the histogram with the event. The weight is only passed if it differs from the default weight (one),
+    so histograms implementing update_hist(event) keep working for unweighted events.
+    """
+    if weight == 1.0:
+        histogram.update_hist(event)
+    else:
+        histogram.update_hist(event, weight)
+
 
 class HistogramManager:
-    """Manages histograms for different analyses."""
+    """
+    Manages histograms for different analyses.
 
-    def __init__(self, hist_template: Histogram):
+    Several named histograms can be booked for each analysis (e.g. {"mTtot": ..., "tau_pt": ...}), so that all the
+    distributions are obtained in a single pass over the events. Histograms that have the same observable (the
+    same callable object) share its value, which is computed only once for each event.
+
+    With bootstrap replicas (see Statistics), the manager also holds the contents of each histogram in each replica,
+    filled with the events weighted by their bootstrap weights in the same pass. Only histograms that can find
+    the bin of an observable value (bin_index and bin_indices methods) have replicas.
+    """
+
+    def __init__(self, hist_template, weight_names: List[str] = None, bootstrap_replicas: int = 0):
         """
         :param hist_template: instance of a Histogram object that will be used as a template for all
-                              histograms.
+                              histograms, or a dictionary with the templates of the named histograms
+                              that must be booked for each analysis.
+        :param weight_names: (optional) names of the weight points (see EventWeights). If given, each histogram
+                             is booked once per weight point, and the events are filled with a vector of
+                             weights (one per weight point) instead of a single weight.
+        :param bootstrap_replicas: number of bootstrap replicas of each histogram.
         """
-        self._hist_template = hist_template
+        # A single template is stored under the name None
+        self._single_histogram = not isinstance(hist_template, dict)
+        self._hist_templates = {None: hist_template} if self._single_histogram else dict(hist_template)
+        self._weight_names = list(weight_names) if weight_names is not None else None
+        # Histograms of each analysis under the keys (histogram name, weight point index),
+        # where the weight point index is None without weight points
         self._histograms = None
+        self._bootstrap_replicas = bootstrap_replicas
+        # Contents of the histograms in each bootstrap replica, with shape (replicas, bins...), under the same keys
+        self._replicas = {}
+
+    @property
+    def histogram_names(self) -> List[str]:
+        """Names of the histograms booked for each analysis."""
+        return [] if self._single_histogram else list(self._hist_templates)
+
+    @property
+    def weight_names(self) -> Optional[List[str]]:
+        """Names of the weight points (None if the events have a single weight)."""
+        return self._weight_names
 
     def book_histograms(self, analysis_names: List[str]):
-        """Initializes the histogram for each analysis"""
-        self._histograms = {analysis_name: copy.copy(self._hist_template) for analysis_name in analysis_names}
+        """Initializes the histograms for each analysis"""
+        points = [None] if self._weight_names is None else range(len(self._weight_names))
+        self._histograms = {
+            analysis_name: {
+                (name, point): copy.copy(template)
+                for name, template in self._hist_templates.items() for point in points
+            }
+            for analysis_name in analysis_names
+        }
+        if self._bootstrap_replicas > 0:
+            self._replicas = {
+                analysis_name: {
+                    key: np.zeros((self._bootstrap_replicas,) + np.shape(getattr(histogram, "sumw", histogram)))
+                    for key, histogram in histograms.items() if hasattr(histogram, "bin_indices")
+                }
+                for analysis_name, histograms in self._histograms.items()
+            }
+
+    def update_analysis_hist(self, analysis_name: str, event: Event, weight=1.0, replica_weights: np.ndarray = None):
+        """
+        Updates the histograms under the name 'analysis_name'.
+        With weight points, weight is the vector with the weight of the event for each weight point.
 
-    def update_analysis_hist(self, analysis_name: str, event: Event):
-        """Updates the histogram under the name 'analysis_name'."""
+        :param replica_weights: (optional) bootstrap weight of the event in each replica.
+        """
         if analysis_name in self._histograms:
-            self._histograms[analysis_name].update_hist(event)
+            self._fill_event(self._histograms[analysis_name].items(), event, weight,
+                             self._replicas.get(analysis_name), replica_weights)
+
+    @staticmethod
+    def _fill_event(histograms, event: Event, weight, replicas: Dict = None, replica_weights: np.ndarray = None):
+        """
+        Updates the histograms, given as ((histogram name, weight point index), histogram) pairs, with the event,
+        computing each observable only once. The replicas of the histograms are updated with the replica weights.
+        """
+        observable_values = {}
+        for key, histogram in histograms:
+            point_weight = weight if key[1] is None else weight[key[1]]
+            observable = getattr(histogram, "observable", None)
+            if observable is None or not hasattr(histogram, "fill"):
+                _update_hist(histogram, event, point_weight)
+                continue
+            if id(observable) not in observable_values:
+                observable_values[id(observable)] = observable(event)
+            histogram.fill(observable_values[id(observable)], point_weight)
+
+            if replica_weights is not None and key in replicas:
+                bin_index = histogram.bin_index(observable_values[id(observable)])
+                if bin_index >= 0:
+                    histogram_replicas = replicas[key].reshape(len(replica_weights), -1)
+                    histogram_replicas[:, bin_index] += point_weight * replica_weights
+
+    def update_analysis_hist_batch(self, analysis_name: str, table, mask: np.ndarray, passed_cuts: np.ndarray,
+                                   weights: np.ndarray = None, replica_weights: np.ndarray = None):
+        """
+        Updates the histograms under the name 'analysis_name' with the events of the table that passed the cuts.
+        With weight points, weights has shape (number of events, number of weight points).
+
+        :param replica_weights: (optional) bootstrap weights of the events, with shape (number of events, replicas).
+        """
+        if analysis_name not in self._histograms:
+            return
+        replicas = self._replicas.get(analysis_name)
+        # Values of the batch observables for the events that passed the cuts
+        observable_values = {}
+        event_histograms = []
+        for key, histogram in self._histograms[analysis_name].items():
+            batch_observable = getattr(getattr(histogram, "observable", None), "batch", None)
+            if batch_observable is None or not hasattr(histogram, "fill_batch"):
+                event_histograms.append((key, histogram))
+                continue
+            if id(batch_observable) not in observable_values:
+                observable_values[id(batch_observable)] = batch_observable(table, mask)
+            point_weights = weights if weights is None or key[1] is None else weights[:, key[1]]
+            histogram.fill_batch(observable_values[id(batch_observable)], passed_cuts, point_weights)
+
+            if replica_weights is not None and key in replicas:
+                bin_indices = histogram.bin_indices(observable_values[id(batch_observable)])
+                self._fill_replicas_batch(replicas[key], bin_indices, passed_cuts, point_weights, replica_weights)
+
+        # The remaining histograms are filled event by event (each event is built only once)
+        if event_histograms:
+            for event_index in np.flatnonzero(passed_cuts):
+                weight = 1.0 if weights is None else weights[event_index]
+                self._fill_event(event_histograms, table.event(event_index, mask), weight, replicas,
+                                 None if replica_weights is None else replica_weights[event_index])
+
+    @staticmethod
+    def _fill_replicas_batch(replicas: np.ndarray, bin_indices: np.ndarray, passed_cuts: np.ndarray,
+                             weights: Optional[np.ndarray], replica_weights: np.ndarray):
+        """Adds the events that passed the cuts, in the bins given by bin_indices, to all the replicas at once."""
+        bin_indices = bin_indices[passed_cuts]
+        event_weights = replica_weights[passed_cuts]
+        if weights is not None:
+            event_weights = event_weights * weights[passed_cuts, np.newaxis]
+        inside = bin_indices >= 0
+        number_replicas = len(replicas)
+        number_bins = replicas[0].size
+        # Index of each (event, replica) pair in the flattened replicas
+        flat_indices = bin_indices[inside, np.newaxis] + number_bins * np.arange(number_replicas)
+        replicas += np.bincount(flat_indices.ravel(), weights=event_weights[inside].ravel(),
+                                minlength=replicas.size).reshape(replicas.shape)
 
-    def retrive_hist(self, analysis_name: str) -> Histogram:
-        """Returns the histogram that belongs to the analysis under 'analysis_name'."""
+    def retrive_hist(self, analysis_name: str, histogram_name: str = None, weight_name: str = None):
+        """
+        Returns the histogram that belongs to the analysis under 'analysis_name'.
+        If several histograms were booked, returns the one under 'histogram_name' (or a dictionary with all of them
+        if histogram_name is None).
+        With weight points, returns the histogram of the weight point under 'weight_name' (or a dictionary with the
+        histograms of all the weight points if weight_name is None).
+        """
         if analysis_name in self._histograms:
-            return self._histograms[analysis_name]
+            return self._select(self._histograms[analysis_name], histogram_name, weight_name)
+
+    def retrive_replicas(self, analysis_name: str, histogram_name: str = None, weight_name: str = None):
+        """
+        Returns the contents of the histogram in each bootstrap replica, an array with shape (replicas, bins...),
+        selected as in retrive_hist.
+        """
+        if analysis_name in self._replicas:
+            return self._select(self._replicas[analysis_name], histogram_name, weight_name)
+
+    def _select(self, histograms: Dict, histogram_name: Optional[str], weight_name: Optional[str]):
+        """Selects the histograms (or replicas) of an analysis by histogram name and weight name."""
+        def weight_point_histograms(name):
+            if self._weight_names is None:
+                return histograms.get((name, None))
+            if weight_name is None:
+                return {point_name: histograms.get((name, point))
+                        for point, point_name in enumerate(self._weight_names)}
+            return histograms.get((name, self._weight_names.index(weight_name)))
+
+        if self._single_histogram:
+            return weight_point_histograms(None)
+        if histogram_name is None:
+            return {name: weight_point_histograms(name) for name in self._hist_templates}
+        return weight_point_histograms(histogram_name)
+
+    def subset(self, analysis_names: List[str]) -> "HistogramManager":
+        """Returns a manager holding only the histograms of the given analyses (shared with the current manager)."""
+        manager = copy.copy(self)
+        manager._histograms = {analysis_name: self._histograms[analysis_name] for analysis_name in analysis_names}
+        manager._replicas = {analysis_name: self._replicas[analysis_name]
+                             for analysis_name in analysis_names if analysis_name in self._replicas}
+        return manager
+
+    def join(self, other: "HistogramManager"):
+        """Adds the histograms of the other analyses booked by another manager (with the same templates)."""
+        self._histograms.update(other._histograms)
+        self._replicas.update(other._replicas)
+
+    def merge(self, other: "HistogramManager"):
+        """
+        Adds the histograms booked by another manager (for the same analyses) to the current histograms.
+        Used to combine the histograms obtained from different sets of events.
+        """
+        if self._weight_names != other._weight_names:
+            raise ValueError("Only histograms booked for the same weight points can be merged.")
+        for analysis_name, histograms in other._histograms.items():
+            for key, histogram in histograms.items():
+                self._histograms[analysis_name][key].merge(histogram)
+        for analysis_name, replicas in other._replicas.items():
+            for key, histogram_replicas in replicas.items():
+                self._replicas[analysis_name][key] += histogram_replicas
 
 
 class ObservableHistogram(Histogram, np.ndarray):
@@ -81,24 +306,264 @@ class ObservableHistogram(Histogram, np.ndarray):
         self.observable = getattr(hist, "observable", None)
         self.bin_edges = getattr(hist, 'bin_edges', None)
 
-    def update_hist(self, event: Event):
+    def update_hist(self, event: Event, weight: float = 1.0):
         """Updates the histogram using the Event object."""
         # Calculates the observable
-        obs_value = self.observable(event)
+        self.fill(self.observable(event), weight)
+
+    def fill(self, obs_value: float, weight: float = 1.0):
+        """Updates the histogram with the value of the observable."""
         # Finds the bin index
         bin_index = self._find_bin_index(observable_value=obs_value)
         # Updates the histogram if the observable is inside the histogram limits
         if 0 <= bin_index < len(self):
-            self[bin_index] += 1
+            self[bin_index] += weight
+
+    def fill_many(self, values, weights=None):
+        """
+        Updates the histogram with several values of the observable at once.
+        Values outside the histogram limits (or nan) are ignored.
+
+        :param values: values of the observable.
+        :param weights: (optional) weight of each value. By default, each value counts as one.
+        """
+        bin_indices = self.bin_indices(values)
+        inside = bin_indices >= 0
+        if weights is not None:
+            weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), bin_indices.shape)[inside]
+        self += np.bincount(bin_indices[inside], weights=weights, minlength=len(self))
+
+    def bin_index(self, obs_value: float) -> int:
+        """Bin of the value of the observable (-1 if it's outside the histogram limits)."""
+        return self._find_bin_index(observable_value=obs_value)
+
+    def bin_indices(self, values) -> np.ndarray:
+        """Bin of each value of the observable (-1 for values outside the histogram limits or nan)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        bin_edges = np.asarray(self.bin_edges, dtype=np.float64)
+        # Bins are closed on the left and open on the right, as in _find_bin_index
+        inside = (values >= bin_edges[0]) & (values < bin_edges[-1])
+        return np.where(inside, np.searchsorted(bin_edges, values, side="right") - 1, -1)
+
+    def update_hist_batch(self, table, mask: np.ndarray, passed_cuts: np.ndarray, weights: np.ndarray = None):
+        """
+        Updates the histogram with the events of the table that passed the cuts.
+        If the observable has a batch implementation (see Analysis.batch_implementation), it's computed for all
+        the events at once and the histogram is filled with fill_many.
+        """
+        batch_observable = getattr(self.observable, "batch", None)
+        if batch_observable is None:
+            super().update_hist_batch(table, mask, passed_cuts, weights)
+            return
+        self.fill_batch(batch_observable(table, mask), passed_cuts, weights)
+
+    def fill_batch(self, values, passed_cuts: np.ndarray, weights: np.ndarray = None):
+        """Updates the histogram with the values of the observable for the events that passed the cuts."""
+        self.fill_many(np.asarray(values)[passed_cuts], None if weights is None else weights[passed_cuts])
 
     def __copy__(self):
         """Shallow coppy of the current histogram."""
         return self.__new__(self.__class__, bin_edges=self.bin_edges, observable=self.observable)
 
+    def merge(self, other: "ObservableHistogram"):
+        """Adds the counts of another histogram with the same bin edges."""
+        if list(self.bin_edges) != list(other.bin_edges):
+            raise ValueError("Only histograms with the same bin edges can be merged.")
+        self += other
+
+    def __reduce__(self):
+        """Adds the bin edges and the observable to the numpy state, so the histogram can be pickled."""
+        reconstruct, arguments, state = super().__reduce__()
+        return reconstruct, arguments, (state, self.bin_edges, self.observable)
+
+    def __setstate__(self, state):
+        """Restores the histogram from the state created by __reduce__."""
+        array_state, self.bin_edges, self.observable = state
+        super().__setstate__(array_state)
+
     def _find_bin_index(self, observable_value: float) -> int:
         """Finds the respective bin index for the given value of the observable."""
-        # Looks for the right bin number
-        for bin_index in range(len(self.data)):
-            if self.bin_edges[bin_index] <= observable_value < self.bin_edges[bin_index + 1]:
-                return bin_index
-        return -1
+        # Values outside the histogram limits (the comparisons also reject nan)
+        if not self.bin_edges[0] <= observable_value < self.bin_edges[-1]:
+            return -1
+        # Binary search of the right bin number (the bin edges are sorted)
+        return bisect.bisect_right(self.bin_edges, observable_value) - 1
+
+
+class WeightedHistogram(Histogram):
+    """
+    N-dimensional histogram of weighted events.
+
+    For each bin, it holds the sum of the weights (sumw) and the sum of the squared weights (sumw2), so that
+    the statistical error of the bin is sqrt(sumw2). Histograms of different sets of events can be merged
+    by adding both sums, and scaled (e.g. by cross section x luminosity / number of events) keeping the errors.
+
+    The observable returns the value of the event for each axis of the histogram (a single number for
+    one-dimensional histograms). As for the ObservableHistogram, the bins are closed on the left and open on
+    the right, and events outside the histogram limits are not counted.
+    """
+
+    def __init__(self, bin_edges: Sequence, observable: Callable = None):
+        """
+        :param bin_edges: bin edges of the histogram, or a list with the bin edges of each axis for
+                          N-dimensional histograms, e.g. [mt_edges, pt_edges].
+        :param observable: function or Callable object that computes the observable for a single Event object.
+                           For N-dimensional histograms, it must return a tuple with one value per axis.
+        """
+        # One-dimensional histograms can be created with a simple list of bin edges
+        self._one_dimensional = np.ndim(bin_edges[0]) == 0
+        if self._one_dimensional:
+            bin_edges = [bin_edges]
+        self.bin_edges = [[float(edge) for edge in axis_edges] for axis_edges in bin_edges]
+        self.observable = observable
+        # Sum of the weights and of the squared weights in each bin
+        self.sumw = np.zeros(self.shape)
+        self.sumw2 = np.zeros(self.shape)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """Number of bins in each axis."""
+        return tuple(len(axis_edges) - 1 for axis_edges in self.bin_edges)
+
+    @property
+    def ndim(self) -> int:
+        """Number of axes."""
+        return len(self.bin_edges)
+
+    @property
+    def errors(self) -> np.ndarray:
+        """Statistical error of each bin."""
+        return np.sqrt(self.sumw2)
+
+    def update_hist(self, event: Event, weight: float = 1.0):
+        """Updates the histogram using the Event object."""
+        self.fill(self.observable(event), weight)
+
+    def fill(self, values, weight: float = 1.0):
+        """Updates the histogram with the value of the observable (a tuple with the value of each axis)."""
+        bin_index = self.bin_index(values)
+        if bin_index < 0:
+            return
+        self.sumw.flat[bin_index] += weight
+        self.sumw2.flat[bin_index] += weight ** 2
+
+    def bin_index(self, values) -> int:
+        """
+        Index of the bin of the value of the observable in the flattened histogram (-1 if it's outside the
+        histogram limits).
+        """
+        if self._one_dimensional:
+            values = (values,)
+
+        # Finds the bin of each axis
+        bin_indices = []
+        for value, axis_edges in zip(values, self.bin_edges):
+            if not axis_edges[0] <= value < axis_edges[-1]:
+                return -1
+            bin_indices.append(bisect.bisect_right(axis_edges, value) - 1)
+        return int(np.ravel_multi_index(bin_indices, self.shape))
+
+    def bin_indices(self, values) -> np.ndarray:
+        """
+        Index of the bin of each event in the flattened histogram (-1 for events outside the histogram limits).
+        The values are given as in fill_many.
+        """
+        if self._one_dimensional:
+            values = [np.asarray(values, dtype=np.float64).ravel()]
+        elif isinstance(values, np.ndarray) and values.ndim == 2 and values.shape[1] == self.ndim:
+            values = list(values.T.astype(np.float64))
+        else:
+            values = [np.asarray(axis_values, dtype=np.float64).ravel() for axis_values in values]
+
+        # Finds the bin of each axis (-1 if outside the limits)
+        inside = np.ones(len(values[0]), dtype=bool)
+        axis_indices = []
+        for axis_values, axis_edges in zip(values, self.bin_edges):
+            axis_edges = np.asarray(axis_edges)
+            inside &= (axis_values >= axis_edges[0]) & (axis_values < axis_edges[-1])
+            axis_indices.append(np.searchsorted(axis_edges, axis_values, side="right") - 1)
+
+        flat_indices = np.full(len(inside), -1, dtype=np.int64)
+        flat_indices[inside] = np.ravel_multi_index([indices[inside] for indices in axis_indices], self.shape)
+        return flat_indices
+
+    def fill_many(self, values, weights=None):
+        """
+        Updates the histogram with the observable values of several events at once.
+
+        :param values: values of the observable. For N-dimensional histograms, a sequence with the values of each
+                       axis or an array with shape (number of events, number of axes).
+        :param weights: (optional) weight of each event. By default, each event counts as one.
+        """
+        bin_indices = self.bin_indices(values)
+        inside = bin_indices >= 0
+        number_events = len(bin_indices)
+        weights = np.ones(number_events) if weights is None else np.broadcast_to(
+            np.asarray(weights, dtype=np.float64), (number_events,)
+        )
+
+        flat_indices = bin_indices[inside]
+        weights = weights[inside]
+        number_bins = self.sumw.size
+        self.sumw += np.bincount(flat_indices, weights=weights, minlength=number_bins).reshape(self.shape)
+        self.sumw2 += np.bincount(flat_indices, weights=weights ** 2, minlength=number_bins).reshape(self.shape)
+
+    def update_hist_batch(self, table, mask: np.ndarray, passed_cuts: np.ndarray, weights: np.ndarray = None):
+        """
+        Updates the histogram with the events of the table that passed the cuts.
+        If the observable has a batch implementation (see Analysis.batch_implementation), it's computed for all
+        the events at once. For N-dimensional histograms, it must return a tuple with the values of each axis.
+        """
+        batch_observable = getattr(self.observable, "batch", None)
+        if batch_observable is None:
+            super().update_hist_batch(table, mask, passed_cuts, weights)
+            return
+
+        self.fill_batch(batch_observable(table, mask), passed_cuts, weights)
+
+    def fill_batch(self, values, passed_cuts: np.ndarray, weights: np.ndarray = None):
+        """
+        Updates the histogram with the values of the observable for the events that passed the cuts.
+        For N-dimensional histograms, values is a tuple with the values of each axis.
+        """
+        if self._one_dimensional:
+            values = np.asarray(values)[passed_cuts]
+        else:
+            values = [np.asarray(axis_values)[passed_cuts] for axis_values in values]
+        self.fill_many(values, None if weights is None else weights[passed_cuts])
+
+    def __copy__(self):
+        """Empty histogram with the same binning and observable."""
+        return self.__class__(self.bin_edges[0] if self._one_dimensional else self.bin_edges, self.observable)
+
+    def merge(self, other: "WeightedHistogram"):
+        """Adds the weights of another histogram with the same bin edges."""
+        if self.bin_edges != other.bin_edges:
+            raise ValueError("Only histograms with the same bin edges can be merged.")
+        self.sumw += other.sumw
+        self.sumw2 += other.sumw2
+
+    def scale(self, factor: float):
+        """Multiplies the weights of all the events by factor."""
+        self.sumw *= factor
+        self.sumw2 *= factor ** 2
+
+    def project(self, axes) -> "WeightedHistogram":
+        """
+        Returns the histogram of the given axes (an axis index or a list of them), summing over the other axes.
+        The projection has no observable, since it only holds the sums of the weights.
+        """
+        axes = [axes] if np.ndim(axes) == 0 else list(axes)
+        projection = self.__class__([self.bin_edges[axis] for axis in axes] if len(axes) > 1 else
+                                    self.bin_edges[axes[0]])
+        summed_axes = tuple(axis for axis in range(self.ndim) if axis not in axes)
+        # Sums over the other axes and sorts the remaining ones in the requested order
+        kept_axes = [axis for axis in range(self.ndim) if axis in axes]
+        order = [kept_axes.index(axis) for axis in axes]
+        projection.sumw = np.transpose(self.sumw.sum(axis=summed_axes), order)
+        projection.sumw2 = np.transpose(self.sumw2.sum(axis=summed_axes), order)
+        return projection
+
+    def __repr__(self):
+        """For nice printing"""
+        return f"WeightedHistogram(shape={self.shape}, sumw={self.sumw.sum()})"
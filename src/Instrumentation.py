@@ -0,0 +1,298 @@
+"""
+    Instrumentation of the EventLoop: time spent in each stage of the analysis, throughput, memory usage and
+    optional profiling of a window of events.
+
+    The measurements are emitted as records (dictionaries that can be stored as json), so that the records of
+    many files and processes can be aggregated (see aggregate_records):
+    - "progress": every report_interval events, with the number of events, the throughput and the memory usage;
+    - "profile": the functions with the largest cumulative time within the profiled window of events;
+    - "summary": at the end of each file (or chunk of a file), with the time spent in each stage and in each
+      particle selection and cut of each analysis (see Cutflow), and, in the event engine, the accesses to the
+      particles of each type that reused (hits) or built (misses) the partitions of the events (see Event).
+
+    Stages of the EventLoop:
+    - "read": waiting for the events of the lhco_reader, i.e. reading and parsing the file (with prefetch_chunks,
+      only the time the analyses waited for the background thread);
+    - "weight": computing the event weights;
+    - "copy": copying the events for each analysis (in the event engine without share_steps);
+    - "analysis": particle selections and cuts (detailed in the cutflows);
+    - "histogram": filling the histograms.
+"""
+
+from LHCOReader_HighPT.src.EventInfo import Event
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import cProfile
+import pstats
+import json
+import time
+import sys
+import os
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def current_rss() -> Optional[int]:
+    """Resident memory of the process in bytes (None if it's not available in the platform)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    """Maximum resident memory of the process in bytes (None if it's not available in the platform)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class JSONLinesSink:
+    """Appends each record as a line of json to a file (e.g. to aggregate the records of several runs)."""
+
+    def __init__(self, filename: str):
+        """
+        :param filename: path to the file where the records are appended.
+        """
+        self.filename = filename
+
+    def __call__(self, record: Dict):
+        with open(self.filename, "a") as records_file:
+            records_file.write(json.dumps(record) + "\n")
+
+
+class Instrumentation:
+    """
+    Configuration of the measurements and destination of the records (see EventLoop).
+    The records are kept in the records list and sent to each of the sinks, functions that receive each record.
+
+    The analysis of each file (or chunk of a file) is measured by a Probe. When the chunks are analysed by other
+    processes, the records are sent back with the AnalysisResult and emitted when the file is done.
+    """
+
+    def __init__(self, sinks: List[Callable[[Dict], None]] = None, report_interval: int = 10000,
+                 profile_window: Tuple[int, int] = None, profile_dir: str = None, profile_top: int = 20):
+        """
+        :param sinks: functions that receive each record (e.g. JSONLinesSink).
+        :param report_interval: number of events between "progress" records.
+        :param profile_window: (start, stop) events of each file (or chunk) profiled with cProfile. In the batch
+                               engine, the profile starts at the first table after the start event and ends
+                               at the first table boundary after the stop event.
+        :param profile_dir: (optional) folder where the profile statistics are stored (as .prof files).
+        :param profile_top: number of functions included in the "profile" records.
+        """
+        self.sinks = list(sinks) if sinks is not None else []
+        self.report_interval = report_interval
+        self.profile_window = profile_window
+        self.profile_dir = profile_dir
+        self.profile_top = profile_top
+        # Holds all the emitted records
+        self.records = []
+
+    def probe(self, lhco_file: str, byte_range: Tuple[int, int] = None) -> "Probe":
+        """Starts the measurements of the analysis of the file (or of the chunk within byte_range)."""
+        return Probe(self, lhco_file, byte_range)
+
+    def emit(self, record: Dict):
+        """Keeps the record and sends it to the sinks."""
+        self.records.append(record)
+        for sink in self.sinks:
+            sink(record)
+
+
+class Probe:
+    """Measures the analysis of one file (or chunk of a file) and collects its records."""
+
+    def __init__(self, instrumentation: Instrumentation, lhco_file: str, byte_range: Tuple[int, int] = None):
+        self.instrumentation = instrumentation
+        self.lhco_file = lhco_file
+        self.byte_range = list(byte_range) if byte_range is not None else None
+        # Cumulative time (in seconds) spent in each stage
+        self.stage_times = {}
+        # Holds the number of accesses to the particle types that reused (hits) or built (misses) the partitions
+        self.partition_cache = {"hits": 0, "misses": 0}
+        # Holds the records of the analysis
+        self.records = []
+        self._start_time = time.perf_counter()
+        self._next_report = instrumentation.report_interval
+        # The profile window is profiled only once
+        self._profiler = None
+        self._profile_start = None
+        if instrumentation.profile_window is not None:
+            self._update_profiler(0)
+
+    @staticmethod
+    def start() -> float:
+        """Returns the current time (the start of the first stage)."""
+        return time.perf_counter()
+
+    def lap(self, stage: str, start: float) -> float:
+        """Adds the time since 'start' to the stage and returns the current time (the start of the next stage)."""
+        now = time.perf_counter()
+        self.stage_times[stage] = self.stage_times.get(stage, 0.) + now - start
+        return now
+
+    def timed(self, iterable: Iterable, stage: str) -> Iterator:
+        """Yields the items of the iterable, adding the time spent producing them to the stage."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.lap(stage, start)
+            yield item
+
+    def partitions_used(self, event: Event, outcomes: Dict[str, Tuple[bool, Event]]):
+        """
+        Adds the partition cache counters (see Event.partition_cache_info) of the event and of the events of the
+        outcomes of the analyses (copies or views of the event), counting each event only once.
+        """
+        events = {id(event): event}
+        for _, analysis_event in outcomes.values():
+            events[id(analysis_event)] = analysis_event
+        for current_event in events.values():
+            for counter, value in current_event.partition_cache_info.items():
+                self.partition_cache[counter] += value
+
+    def events_done(self, number_evts: int):
+        """Called after each event (or table) with the total number of analysed events."""
+        if self.instrumentation.profile_window is not None:
+            self._update_profiler(number_evts)
+        if number_evts >= self._next_report:
+            self.records.append(self._record("progress", number_evts))
+            self._next_report = (number_evts // self.instrumentation.report_interval + 1) * \
+                self.instrumentation.report_interval
+
+    def finish(self, number_evts: int, passed: Dict[str, int], cutflows: Dict = None) -> List[Dict]:
+        """Adds the "summary" record and returns all the records of the analysis."""
+        if self._profiler is not None:
+            self._stop_profiler(number_evts)
+        summary = self._record("summary", number_evts)
+        summary["passed"] = dict(passed)
+        summary["peak_rss"] = peak_rss()
+        summary["partition_cache"] = dict(self.partition_cache)
+        summary["analyses"] = {
+            analysis_name: {
+                "selections": dict(zip(cutflow.selection_names, cutflow.selection_time)),
+                "cuts": dict(zip(cutflow.cut_names, cutflow.cut_time)),
+            }
+            for analysis_name, cutflow in (cutflows or {}).items()
+        }
+        self.records.append(summary)
+        return self.records
+
+    def _record(self, record_type: str, number_evts: int) -> Dict:
+        """Record with the current measurements."""
+        elapsed = time.perf_counter() - self._start_time
+        return {
+            "type": record_type,
+            "file": self.lhco_file,
+            "byte_range": self.byte_range,
+            "pid": os.getpid(),
+            "time": time.time(),
+            "events": number_evts,
+            "elapsed": elapsed,
+            "events_per_second": number_evts / elapsed if elapsed > 0 else None,
+            "rss": current_rss(),
+            "stage_times": dict(self.stage_times),
+        }
+
+    def _update_profiler(self, number_evts: int):
+        """Starts or stops the profiler at the limits of the profile window."""
+        start, stop = self.instrumentation.profile_window
+        if self._profile_start is None and start <= number_evts:
+            self._profile_start = number_evts
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self._profiler is not None and number_evts >= stop:
+            self._stop_profiler(number_evts)
+
+    def _stop_profiler(self, number_evts: int):
+        """Stops the profiler and adds the "profile" record."""
+        self._profiler.disable()
+        statistics = pstats.Stats(self._profiler)
+        self._profiler = None
+
+        if self.instrumentation.profile_dir is not None:
+            os.makedirs(self.instrumentation.profile_dir, exist_ok=True)
+            statistics.dump_stats(os.path.join(
+                self.instrumentation.profile_dir,
+                f"{os.path.basename(self.lhco_file)}.{self._profile_start}-{number_evts}.{os.getpid()}.prof"
+            ))
+
+        functions = sorted(statistics.stats.items(), key=lambda item: item[1][3], reverse=True)
+        record = self._record("profile", number_evts)
+        record["window"] = [self._profile_start, number_evts]
+        record["functions"] = [
+            {"function": f"{filename}:{line}({name})", "calls": calls, "total_time": total_time,
+             "cumulative_time": cumulative_time}
+            for (filename, line, name), (_, calls, total_time, cumulative_time, _) in
+            functions[:self.instrumentation.profile_top]
+        ]
+        self.records.append(record)
+
+
+class NullProbe:
+    """Probe that doesn't measure anything (used when the EventLoop has no instrumentation)."""
+
+    @staticmethod
+    def start() -> float:
+        return 0.
+
+    @staticmethod
+    def lap(stage: str, start: float) -> float:
+        return 0.
+
+    @staticmethod
+    def timed(iterable: Iterable, stage: str) -> Iterable:
+        return iterable
+
+    @staticmethod
+    def partitions_used(event: Event, outcomes: Dict[str, Tuple[bool, Event]]):
+        pass
+
+    @staticmethod
+    def events_done(number_evts: int):
+        pass
+
+    @staticmethod
+    def finish(number_evts: int, passed: Dict[str, int], cutflows: Dict = None) -> List[Dict]:
+        return []
+
+
+def aggregate_records(records: Iterable[Dict]) -> Dict:
+    """
+    Aggregates the "summary" records of several files (or chunks): total number of events, time spent in each
+    stage, and in each particle selection and cut of each analysis, partition cache counters, and the overall
+    throughput.
+    """
+    total = {"files": set(), "events": 0, "elapsed": 0., "stage_times": {}, "analyses": {}, "peak_rss": None,
+             "partition_cache": {"hits": 0, "misses": 0}}
+    for record in records:
+        if record.get("type") != "summary":
+            continue
+        total["files"].add(record["file"])
+        total["events"] += record["events"]
+        total["elapsed"] += record["elapsed"]
+        for stage, stage_time in record["stage_times"].items():
+            total["stage_times"][stage] = total["stage_times"].get(stage, 0.) + stage_time
+        for analysis_name, times in record.get("analyses", {}).items():
+            analysis_times = total["analyses"].setdefault(analysis_name, {"selections": {}, "cuts": {}})
+            for kind in ("selections", "cuts"):
+                for name, step_time in times[kind].items():
+                    analysis_times[kind][name] = analysis_times[kind].get(name, 0.) + step_time
+        for counter, value in record.get("partition_cache", {}).items():
+            total["partition_cache"][counter] += value
+        if record.get("peak_rss") is not None:
+            total["peak_rss"] = max(total["peak_rss"] or 0, record["peak_rss"])
+    total["files"] = sorted(total["files"])
+    total["events_per_second"] = total["events"] / total["elapsed"] if total["elapsed"] > 0 else None
+    return total
@@ -0,0 +1,155 @@
+"""
+    Kinematic quantities used to build observables and cuts.
+
+    The basic functions (momentum components, delta phi, delta R, masses, ...) accept either numbers, for the
+    analysis of a single event, or numpy arrays, for the columnar analysis of all the events of an EventTable.
+    In the first case they are computed with the math module, which is much faster than numpy for scalars.
+
+    The functions that combine several particles come in pairs:
+    - function(particles): takes a list of particles of a single event (e.g. event.tauhads[:2] + event.met);
+    - function_batch(table, mask): takes an EventTable and a particle mask with the particles to combine
+      in each event, and returns an array with one value per event.
+"""
+
+from LHCOReader_HighPT.src.EventTable import EventTable
+from typing import List, Tuple
+import numpy as np
+import math
+
+
+def _backend(value):
+    """Returns the module used to compute the functions of the given value (numpy for arrays, math otherwise)."""
+    return np if isinstance(value, np.ndarray) else math
+
+
+def px(pt, phi):
+    """Momentum in the x-direction."""
+    return pt * _backend(phi).cos(phi)
+
+
+def py(pt, phi):
+    """Momentum in the y-direction."""
+    return pt * _backend(phi).sin(phi)
+
+
+def pz(pt, eta):
+    """Momentum in the z-direction."""
+    return pt * _backend(eta).sinh(eta)
+
+
+def energy(pt, eta, mass):
+    """Energy of the particle (the mass is the jmas column of the .lhco file)."""
+    backend = _backend(eta)
+    return backend.sqrt((pt * backend.cosh(eta)) ** 2 + mass ** 2)
+
+
+def delta_phi(phi1, phi2):
+    """Difference phi1 - phi2 wrapped into the interval [-pi, pi] (for phi1 and phi2 in [-pi, pi])."""
+    dphi = phi1 - phi2
+    return dphi - 2 * math.pi * (dphi > math.pi) + 2 * math.pi * (dphi < -math.pi)
+
+
+def delta_r(eta1, phi1, eta2, phi2):
+    """Distance between two particles in the (eta, phi) plane."""
+    return _backend(eta1).sqrt((eta1 - eta2) ** 2 + delta_phi(phi1, phi2) ** 2)
+
+
+def mass_from_components(total_energy, total_px, total_py, total_pz):
+    """Invariant mass of a four-momentum (negative squared masses from rounding errors are set to zero)."""
+    squared_mass = total_energy ** 2 - total_px ** 2 - total_py ** 2 - total_pz ** 2
+    if isinstance(squared_mass, np.ndarray):
+        return np.sqrt(np.maximum(squared_mass, 0))
+    return math.sqrt(max(squared_mass, 0))
+
+
+def transverse_mass(pt1, phi1, pt2, phi2):
+    """Transverse mass of two massless objects, e.g. a lepton and the missing energy."""
+    return _backend(phi1).sqrt(2 * pt1 * pt2 * (1 - _backend(phi1).cos(delta_phi(phi1, phi2))))
+
+
+def total_transverse_mass_from_sums(sum_pt, sum_px, sum_py):
+    """
+    Total transverse mass sqrt((sum pT)^2 - (sum px)^2 - (sum py)^2) from the scalar sum of the transverse momenta
+    and the vector sum of the momenta of the objects.
+    """
+    squared_mass = sum_pt ** 2 - sum_px ** 2 - sum_py ** 2
+    if isinstance(squared_mass, np.ndarray):
+        return np.sqrt(np.maximum(squared_mass, 0))
+    return math.sqrt(max(squared_mass, 0))
+
+
+def scalar_sum_pt(particles: List) -> float:
+    """Scalar sum of the transverse momenta of the particles (HT if the particles are the jets)."""
+    return math.fsum(particle.pt for particle in particles)
+
+
+def scalar_sum_pt_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of scalar_sum_pt."""
+    return table.sum(mask, table.pt)
+
+
+# Usual name of the scalar sum of the transverse momenta of the jets
+ht = scalar_sum_pt
+ht_batch = scalar_sum_pt_batch
+
+
+def vector_sum(particles: List) -> Tuple[float, float, float, float]:
+    """Sum of the four-momenta (E, px, py, pz) of the particles."""
+    total_energy = total_px = total_py = total_pz = 0.
+    for particle in particles:
+        total_energy += energy(particle.pt, particle.eta, particle.jmas)
+        total_px += px(particle.pt, particle.phi)
+        total_py += py(particle.pt, particle.phi)
+        total_pz += pz(particle.pt, particle.eta)
+    return total_energy, total_px, total_py, total_pz
+
+
+def vector_sum_batch(table: EventTable, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Columnar version of vector_sum."""
+    pt, phi, eta = table.pt, table.phi, table.eta
+    return (
+        table.sum(mask, energy(pt, eta, table.jmas)), table.sum(mask, px(pt, phi)),
+        table.sum(mask, py(pt, phi)), table.sum(mask, pz(pt, eta))
+    )
+
+
+def invariant_mass(particles: List) -> float:
+    """Invariant mass of the system of particles."""
+    return mass_from_components(*vector_sum(particles))
+
+
+def invariant_mass_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of invariant_mass."""
+    return mass_from_components(*vector_sum_batch(table, mask))
+
+
+def missing_momentum(particles: List) -> Tuple[float, float]:
+    """Missing transverse momentum (px, py), i.e. minus the vector sum of the momenta of the visible particles."""
+    return (-math.fsum(px(particle.pt, particle.phi) for particle in particles),
+            -math.fsum(py(particle.pt, particle.phi) for particle in particles))
+
+
+def missing_momentum_batch(table: EventTable, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Columnar version of missing_momentum."""
+    return -table.sum(mask, px(table.pt, table.phi)), -table.sum(mask, py(table.pt, table.phi))
+
+
+def total_transverse_mass(particles: List) -> float:
+    """
+    Total transverse mass of the particles, sqrt((sum pT)^2 - (sum px)^2 - (sum py)^2),
+    e.g. mTtot = total_transverse_mass(taus + event.met).
+    """
+    sum_pt = sum_px = sum_py = 0.
+    for particle in particles:
+        sum_pt += particle.pt
+        sum_px += px(particle.pt, particle.phi)
+        sum_py += py(particle.pt, particle.phi)
+    return total_transverse_mass_from_sums(sum_pt, sum_px, sum_py)
+
+
+def total_transverse_mass_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of total_transverse_mass."""
+    pt, phi = table.pt, table.phi
+    return total_transverse_mass_from_sums(
+        table.sum(mask, pt), table.sum(mask, px(pt, phi)), table.sum(mask, py(pt, phi))
+    )
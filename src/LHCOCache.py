@@ -0,0 +1,124 @@
+"""On-disk cache of parsed .lhco files."""
+
+from LHCOReader_HighPT.src.EventTable import EventTable
+from LHCOReader_HighPT.src.LHCOReader import read_LHCO_columnar
+from LHCOReader_HighPT.src.Utilities import file_digest
+import numpy as np
+import hashlib
+import json
+import os
+
+
+class LHCOCache:
+    """
+    Stores the EventTable of each .lhco file as binary .npy arrays.
+    On subsequent reads the arrays are memory-mapped instead of parsing the text file again.
+
+    Each entry is keyed by the absolute path of the .lhco file and is validated against the size, the
+    modification time and the content hash of the file. If the size or the modification time changed, the
+    hash is recomputed and the entry is only reused if the content is the same.
+    """
+    # Must be increased whenever the layout of the stored arrays changes
+    version = 2
+
+    def __init__(self, cache_dir: str = None):
+        """
+        :param cache_dir: folder where the parsed files are stored. By default, the folder in the
+                          LHCO_CACHE_DIR environment variable or ~/.cache/LHCOReader_HighPT.
+        """
+        if cache_dir is None:
+            cache_dir = os.environ.get(
+                "LHCO_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "LHCOReader_HighPT")
+            )
+        self.cache_dir = cache_dir
+
+    def load(self, filename: str) -> EventTable:
+        """Returns the EventTable of the file, parsing the file only if there is no valid entry in the cache."""
+        entry_dir = self._entry_dir(filename)
+        metadata = self._read_metadata(entry_dir)
+        file_stat = os.stat(filename)
+
+        if metadata is not None and metadata["version"] == self.version:
+            if metadata["size"] == file_stat.st_size and metadata["mtime_ns"] == file_stat.st_mtime_ns:
+                return self._load_table(entry_dir)
+            # The file was touched or copied: reuses the entry if the content is the same
+            if metadata["size"] == file_stat.st_size and metadata["digest"] == file_digest(filename):
+                metadata["mtime_ns"] = file_stat.st_mtime_ns
+                self._write_metadata(entry_dir, metadata)
+                return self._load_table(entry_dir)
+
+        table = read_LHCO_columnar(filename)
+        self.store(filename, table, file_stat)
+        return table
+
+    def store(self, filename: str, table: EventTable, file_stat: os.stat_result = None):
+        """Stores the EventTable of the file in the cache."""
+        file_stat = os.stat(filename) if file_stat is None else file_stat
+        entry_dir = self._entry_dir(filename)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        # The metadata is written last, so an interrupted write never leaves a valid entry behind
+        try:
+            os.remove(os.path.join(entry_dir, "metadata.json"))
+        except FileNotFoundError:
+            pass
+        # Each array is written to a temporary file of this process and then renamed, so processes storing the
+        # same entry at the same time never read (or memory-map) a partially written array
+        for name, array in (("data", table.data[:, table.offsets[0]:table.offsets[-1]]),
+                            ("offsets", table.offsets - table.offsets[0]),
+                            ("positions", table.positions)):
+            if array is not None:
+                array_file = os.path.join(entry_dir, f"{name}.npy")
+                temporary_file = f"{array_file}.{os.getpid()}.tmp"
+                with open(temporary_file, "wb") as file_:
+                    np.save(file_, np.ascontiguousarray(array))
+                os.replace(temporary_file, array_file)
+
+        self._write_metadata(entry_dir, {
+            "version": self.version,
+            "path": os.path.abspath(filename),
+            "size": file_stat.st_size,
+            "mtime_ns": file_stat.st_mtime_ns,
+            "digest": file_digest(filename),
+        })
+
+    def invalidate(self, filename: str):
+        """Removes the entry of the file from the cache."""
+        entry_dir = self._entry_dir(filename)
+        if os.path.isdir(entry_dir):
+            for name in os.listdir(entry_dir):
+                os.remove(os.path.join(entry_dir, name))
+            os.rmdir(entry_dir)
+
+    def _entry_dir(self, filename: str) -> str:
+        """Folder holding the entry of the file."""
+        key = hashlib.blake2b(os.path.abspath(filename).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    @staticmethod
+    def _load_table(entry_dir: str) -> EventTable:
+        """Memory-maps the arrays of the entry."""
+        positions_file = os.path.join(entry_dir, "positions.npy")
+        return EventTable(
+            np.load(os.path.join(entry_dir, "data.npy"), mmap_mode="r"),
+            np.load(os.path.join(entry_dir, "offsets.npy"), mmap_mode="r"),
+            np.load(positions_file, mmap_mode="r") if os.path.exists(positions_file) else None
+        )
+
+    @staticmethod
+    def _read_metadata(entry_dir: str):
+        """Returns the metadata of the entry or None if there is no valid entry."""
+        try:
+            with open(os.path.join(entry_dir, "metadata.json")) as metadata_file:
+                return json.load(metadata_file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_metadata(entry_dir: str, metadata: dict):
+        """Writes the metadata of the entry atomically."""
+        metadata_file = os.path.join(entry_dir, "metadata.json")
+        temporary_file = f"{metadata_file}.{os.getpid()}.tmp"
+        with open(temporary_file, "w") as file_:
+            json.dump(metadata, file_, indent=4)
+        os.replace(temporary_file, metadata_file)
@@ -0,0 +1,99 @@
+"""Index with the byte position of each event of a .lhco file, used for random access and chunked reads."""
+
+from LHCOReader_HighPT.src.LHCOScanner import LHCOScanner
+from typing import List, Tuple
+import numpy as np
+import os
+
+
+class LHCOIndex:
+    """
+    Holds the byte position where each event of a .lhco file starts and the number of particles in each event.
+    Events are counted in the same way as in read_LHCO, i.e. events without particles are skipped. The index also
+    holds the position of each event among all the events of the file, including the skipped ones, which is used
+    to match the events with the ones of the .lhe file (see EventWeights).
+
+    The index is stored next to the .lhco file (in a sidecar file with the extension .idx.npz) the first time it
+    is built, and it is reused as long as the size and the modification time of the .lhco file don't change.
+    For compressed files, the positions refer to the decompressed content.
+    """
+    # Must be increased whenever the layout of the sidecar file changes
+    version = 3
+    extension = ".idx.npz"
+
+    def __init__(self, positions: np.ndarray, counts: np.ndarray, file_size: int, ordinals: np.ndarray = None,
+                 number_all_events: int = None):
+        """
+        :param positions: byte position where each event starts.
+        :param counts: number of particles in each event.
+        :param file_size: size of the .lhco file in bytes (of the decompressed content for compressed files).
+        :param ordinals: position of each event among all the events of the file, including the ones without
+                         particles (by default, the file has no events without particles).
+        :param number_all_events: number of events in the file, including the ones without particles.
+        """
+        self.positions = positions
+        self.counts = counts
+        self.file_size = file_size
+        self.ordinals = np.arange(len(positions), dtype=np.int64) if ordinals is None else ordinals
+        self.number_all_events = len(positions) if number_all_events is None else number_all_events
+
+    @classmethod
+    def build(cls, filename: str):
+        """Scans the file and returns its index (without storing it)."""
+        positions, counts, event_starts, data_size = LHCOScanner().index(filename)
+        return cls(positions, counts, data_size, np.searchsorted(event_starts, positions), len(event_starts))
+
+    @classmethod
+    def for_file(cls, filename: str):
+        """
+        Returns the index of the file, loading it from the sidecar file when it is up-to-date.
+        Otherwise, the index is built and stored in the sidecar file (if the folder is writable).
+        """
+        file_stat = os.stat(filename)
+        index_file = filename + cls.extension
+        try:
+            with np.load(index_file) as stored:
+                if (int(stored["version"]) == cls.version and int(stored["size"]) == file_stat.st_size and
+                        int(stored["mtime_ns"]) == file_stat.st_mtime_ns):
+                    return cls(stored["positions"], stored["counts"], int(stored["data_size"]), stored["ordinals"],
+                               int(stored["number_all_events"]))
+        except (OSError, KeyError, ValueError):
+            pass
+
+        index = cls.build(filename)
+        index._store(index_file, file_stat)
+        return index
+
+    def _store(self, index_file: str, file_stat: os.stat_result):
+        """Writes the index into the sidecar file. The index is kept only in memory if the file can't be written."""
+        temporary_file = f"{index_file}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_file, "wb") as sidecar:
+                np.savez(sidecar, positions=self.positions, counts=self.counts, version=self.version,
+                         size=file_stat.st_size, mtime_ns=file_stat.st_mtime_ns, data_size=self.file_size,
+                         ordinals=self.ordinals, number_all_events=self.number_all_events)
+            os.replace(temporary_file, index_file)
+        except OSError:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+
+    def __len__(self):
+        """Number of events in the file."""
+        return len(self.positions)
+
+    def select(self, start: int = None, stop: int = None, step: int = None) -> range:
+        """Indices of the events selected by the slice [start:stop:step]."""
+        return range(len(self))[slice(start, stop, step)]
+
+    def byte_range(self, start: int, stop: int) -> Tuple[int, int]:
+        """Byte range holding the events with indices in [start, stop) (see read_LHCO)."""
+        start, stop = max(start, 0), min(stop, len(self))
+        if start >= stop:
+            return 0, 0
+        return int(self.positions[start]), int(self.positions[stop]) if stop < len(self) else self.file_size
+
+    def chunks(self, chunk_size: int) -> List[Tuple[int, int]]:
+        """Splits the file into byte ranges holding chunk_size events each (the last one may hold less)."""
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive.")
+        return [self.byte_range(start, start + chunk_size) for start in range(0, len(self), chunk_size)]
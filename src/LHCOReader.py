@@ -1,38 +1,255 @@
-"""Functions to read the content of .lhco files"""
+"""
+    Functions to read the content of .lhco files.
+    The files may be compressed with gzip, bzip2 or xz (see Compression): they are decompressed while they are read.
+"""
 
-from typing import List
+from typing import List, Tuple, Iterator
 from LHCOReader_HighPT.src.EventInfo import Event
+from LHCOReader_HighPT.src.EventTable import EventTable
+from LHCOReader_HighPT.src.LHCOScanner import LHCOScanner
+from LHCOReader_HighPT.src.LHCOIndex import LHCOIndex
+from LHCOReader_HighPT.src.Compression import is_compressed, iter_decompressed_lines
+import numpy as np
+import itertools
+import os
 
 
-def read_LHCO(filename: str) -> List:
-    """Yields a single event at time."""
-    # Holds all the events
-    with open(filename) as lhco_file:
-        event_particles = []
+def _read_lines(filename: str, byte_range: Tuple[int, int] = None) -> Iterator[str]:
+    """
+    Yields the lines of the file.
+    If byte_range = (start, stop) is given, only the lines starting at the positions [start, stop) are yielded.
+    'start' must be the position of the beginning of a line.
+    """
+    if byte_range is None:
+        if is_compressed(filename):
+            for line in iter_decompressed_lines(filename):
+                yield line.decode()
+            return
+        with open(filename) as lhco_file:
+            yield from lhco_file
+        return
 
-        # Searches the event information
-        for line in lhco_file:
-            # Strip whitespace and skip comments
-            current_line = line.strip()
-            if current_line.startswith("#"):
-                continue
+    start, stop = byte_range
+    position = start
+    for line in _binary_lines(filename, start):
+        if position >= stop:
+            break
+        position += len(line)
+        yield line.decode()
 
-            # Signal a new event
-            if current_line.startswith("0"):
-                if event_particles:
-                    yield Event.from_str_particles_info(event_particles)
-                # Reset event for the next particles
-                event_particles = []
 
-            else:
-                # Remove the first char - info not needed
-                event_particles.append(current_line[1:])
+def _binary_lines(filename: str, start: int) -> Iterator[bytes]:
+    """
+    Yields the lines of the file starting at the byte position 'start'.
+    Compressed files are decompressed from the beginning, and the position refers to the decompressed content.
+    """
+    if is_compressed(filename):
+        position = 0
+        for line in iter_decompressed_lines(filename):
+            if position >= start:
+                yield line
+            position += len(line)
+        return
 
-        # Add last event if it exists
-        if event_particles:
-            yield Event.from_str_particles_info(event_particles)
+    with open(filename, "rb") as lhco_file:
+        lhco_file.seek(start)
+        yield from lhco_file
+
+
+def split_LHCO(filename: str, number_chunks: int) -> List[Tuple[int, int]]:
+    """
+    Splits the file into (at most) number_chunks byte ranges of similar size.
+    Each range starts at the header line of an event (or at the beginning of the file), so the ranges can be read
+    independently with read_LHCO(filename, byte_range=...) and together they hold all the events of the file.
+    Compressed files can only be read sequentially, so they can't be split.
+    """
+    if is_compressed(filename):
+        raise ValueError(f"The compressed file {filename} can't be split into chunks.")
+    file_size = os.path.getsize(filename)
+    boundaries = [0]
+
+    with open(filename, "rb") as lhco_file:
+        for chunk_index in range(1, number_chunks):
+            # Moves to the approximate position and looks for the next event header
+            lhco_file.seek(max(chunk_index * file_size // number_chunks, boundaries[-1]))
+            lhco_file.readline()
+            position = lhco_file.tell()
+            for line in lhco_file:
+                if line.lstrip().startswith(b"0"):
+                    break
+                position += len(line)
+            if boundaries[-1] < position < file_size:
+                boundaries.append(position)
+
+    boundaries.append(file_size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _event_ranges(filename: str, start: int, stop: int, step: int) -> List[Tuple[int, int]]:
+    """
+    Byte ranges holding the events selected by [start:stop:step] (see LHCOIndex).
+    Contiguous selections are read as a single range, otherwise each event is read on its own.
+    """
+    index = LHCOIndex.for_file(filename)
+    selected = index.select(start, stop, step)
+    if selected.step == 1:
+        return [index.byte_range(selected.start, selected.stop)]
+    return [index.byte_range(item, item + 1) for item in selected]
+
+
+def _select_from_table(table: EventTable, byte_range: Tuple[int, int], start: int, stop: int,
+                       step: int) -> EventTable:
+    """Selects the events of the table within the byte_range or with indices in [start:stop:step]."""
+    if byte_range is not None:
+        if table.positions is None:
+            raise ValueError("The positions of the events are needed to select them by byte_range.")
+        first, last = np.searchsorted(table.positions, byte_range)
+        return table[first:last]
+    selected = range(len(table))[slice(start, stop, step)]
+    return table[selected.start:selected.stop] if selected.step == 1 else table.take(selected)
+
+
+def _check_selection(byte_range: Tuple[int, int], start: int, stop: int, step: int) -> bool:
+    """Returns True if the events are selected by their indices."""
+    by_index = start is not None or stop is not None or step is not None
+    if by_index and byte_range is not None:
+        raise ValueError("Events can be selected either by byte_range or by start/stop/step, not both.")
+    return by_index
+
+
+def read_LHCO(filename: str, byte_range: Tuple[int, int] = None, cache=None,
+              start: int = None, stop: int = None, step: int = None) -> List:
+    """
+    Yields a single event at time.
+    If byte_range is given, only the events in that part of the file are read (see split_LHCO).
+    If start, stop or step are given, only the events with indices in [start:stop:step] are read. The byte position
+    of the events is taken from the index of the file (see LHCOIndex), which is built on the first use.
+    Compressed files are always decompressed from the beginning, and byte_range refers to the decompressed content.
+    If an LHCOCache is given, the events are read from the cached binary copy of the whole file.
+    """
+    by_index = _check_selection(byte_range, start, stop, step)
+    if cache is not None:
+        table = cache.load(filename)
+        if by_index or byte_range is not None:
+            table = _select_from_table(table, byte_range, start, stop, step)
+        yield from table
+        return
+
+    if by_index and is_compressed(filename):
+        # Compressed files are read sequentially, skipping the events that are not selected
+        selected = LHCOIndex.for_file(filename).select(start, stop, step)
+        forward = selected if selected.step > 0 else selected[::-1]
+        events = itertools.islice(read_LHCO(filename), forward.start, forward.stop, forward.step)
+        yield from events if selected.step > 0 else reversed(list(events))
+        return
+
+    if by_index:
+        for event_range in _event_ranges(filename, start, stop, step):
+            yield from read_LHCO(filename, byte_range=event_range)
+        return
+
+    # Holds the particles of the current event
+    event_particles = []
+
+    # Searches the event information
+    for line in _read_lines(filename, byte_range):
+        # Strip whitespace and skip comments
+        current_line = line.strip()
+        if not current_line or current_line.startswith("#"):
+            continue
+
+        # Signal a new event
+        if current_line.startswith("0"):
+            if event_particles:
+                yield Event.from_str_particles_info(event_particles)
+            # Reset event for the next particles
+            event_particles = []
+
+        else:
+            # Remove the first column - info not needed
+            event_particles.append(current_line.split(maxsplit=1)[1])
+
+    # Add last event if it exists
+    if event_particles:
+        yield Event.from_str_particles_info(event_particles)
 
 
 def read_LHCO_all_events(filaname: str):
-    """Returns a list with all the events."""
+    """
+    Returns a list with all the events.
+    For large files, read_LHCO_columnar holds the same events using a fraction of the memory.
+    """
     return [event for event in read_LHCO(filaname)]
+
+
+def read_LHCO_columnar(filename: str, byte_range: Tuple[int, int] = None, cache=None,
+                       start: int = None, stop: int = None, step: int = None) -> EventTable:
+    """
+    Reads all the events of the .lhco file into an EventTable (see LHCOScanner).
+    The events are the same (and in the same order) as the ones yielded by read_LHCO.
+    If byte_range is given, only the events in that part of the file are read (see split_LHCO).
+    If start, stop or step are given, only the events with indices in [start:stop:step] are read (see read_LHCO).
+    If an LHCOCache is given, the table is memory-mapped from the cached binary copy of the whole file.
+    """
+    by_index = _check_selection(byte_range, start, stop, step)
+    if cache is not None:
+        table = cache.load(filename)
+        if by_index or byte_range is not None:
+            table = _select_from_table(table, byte_range, start, stop, step)
+        return table
+
+    scanner = LHCOScanner()
+    if by_index and is_compressed(filename):
+        # Compressed files can only be read sequentially
+        return _select_from_table(scanner.read(filename), None, start, stop, step)
+    if by_index:
+        return EventTable.concatenate([
+            scanner.read(filename, byte_range=event_range) for event_range in _event_ranges(filename, start, stop, step)
+        ])
+    return scanner.read(filename, byte_range=byte_range)
+
+
+def iter_LHCO_chunks(filename: str, chunk_size: int, cache=None,
+                     byte_range: Tuple[int, int] = None) -> Iterator[EventTable]:
+    """
+    Yields EventTables with chunk_size consecutive events of the file (the last one may hold less).
+    The chunks are located with the index of the file (see LHCOIndex), so that each of them is read independently.
+    Compressed files are decompressed only once, and the chunks are taken from the stream of events.
+    If byte_range is given, only the events in that part of the file are read (see split_LHCO).
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive.")
+    if cache is not None:
+        table = cache.load(filename)
+        if byte_range is not None:
+            table = _select_from_table(table, byte_range, None, None, None)
+        for start in range(0, len(table), chunk_size):
+            yield table[start:start + chunk_size]
+        return
+
+    scanner = LHCOScanner()
+    if byte_range is not None or is_compressed(filename):
+        yield from _rechunk(scanner.iter_tables(filename, byte_range), chunk_size)
+        return
+
+    for event_range in LHCOIndex.for_file(filename).chunks(chunk_size):
+        yield scanner.read(filename, byte_range=event_range)
+
+
+def _rechunk(tables: Iterator[EventTable], chunk_size: int) -> Iterator[EventTable]:
+    """Yields EventTables with chunk_size consecutive events of the given tables (the last one may hold less)."""
+    pending, number_pending = [], 0
+    for table in tables:
+        pending.append(table)
+        number_pending += len(table)
+        if number_pending < chunk_size:
+            continue
+        joined = EventTable.concatenate(pending)
+        start = 0
+        while len(joined) - start >= chunk_size:
+            yield joined[start:start + chunk_size]
+            start += chunk_size
+        number_pending = len(joined) - start
+        pending = [joined[start:]] if number_pending else []
+    if number_pending:
+        yield EventTable.concatenate(pending)
@@ -0,0 +1,330 @@
+"""
+    Memory-mapped scanner for .lhco files.
+
+    The file is mapped into memory and processed in blocks of bytes with numpy: event boundaries,
+    comment lines and the numeric columns are found and converted directly from the mapped buffer,
+    without creating Python strings for the lines or the values.
+    Compressed files (see Compression) are decompressed in a background thread and parsed as a stream of blocks.
+"""
+
+from LHCOReader_HighPT.src.EventTable import EventTable
+from LHCOReader_HighPT.src.Compression import is_compressed, iter_decompressed_blocks
+from typing import Iterable, Iterator, Tuple
+import numpy as np
+import mmap
+import os
+
+# Characters that separate the columns (same as str.split)
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[[9, 10, 11, 12, 13, 32]] = True
+
+# Kinds of characters in the numbers (tokens are padded with spaces up to the same width)
+_OTHER, _DIGIT, _DOT, _SIGN, _PADDING = range(5)
+_CHAR_KIND = np.full(256, _OTHER, dtype=np.uint8)
+_CHAR_KIND[48:58] = _DIGIT
+_CHAR_KIND[[46, 43, 45, 32]] = [_DOT, _SIGN, _SIGN, _PADDING]
+
+# Powers of ten that are represented exactly as floats
+_FLOAT_POWERS_OF_TEN = 10.0 ** np.arange(16)
+
+# Longer numbers (or with more digits) are converted by float() to guarantee the same result
+_MAX_TOKEN_WIDTH = 24
+_MAX_MANTISSA_DIGITS = 15
+
+# Number of columns in the lines with the particles information
+_NUMBER_COLUMNS = len(EventTable.columns) + 1
+
+
+def _parse_numbers(buffer: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Converts the tokens buffer[starts[i]:ends[i]] into floats.
+
+    Numbers in fixed-point notation (as written by Delphes) are converted by accumulating the digits of all
+    the tokens column by column into an integer mantissa with at most 15 digits, which is then divided by a
+    power of ten. Both numbers are represented exactly, so the result is correctly rounded, i.e. identical
+    to float(token). Other tokens (exponents, nan, inf, too many digits, ...) are converted with float().
+    """
+    number_tokens = len(starts)
+    if number_tokens == 0:
+        return np.empty(0, dtype=np.float64)
+
+    # Characters of the tokens in a (width, number_tokens) array, padded with spaces
+    lengths = ends - starts
+    width = int(min(lengths.max(), _MAX_TOKEN_WIDTH))
+    columns = np.arange(width)[:, np.newaxis]
+    chars = np.where(columns < lengths, buffer[np.minimum(starts + columns, len(buffer) - 1)], 32)
+    kinds = _CHAR_KIND[chars]
+    is_digit = kinds == _DIGIT
+    is_dot = kinds == _DOT
+
+    # Only digits, at most one dot and a sign in the first character
+    number_digits = is_digit.sum(axis=0)
+    number_dots = is_dot.sum(axis=0)
+    exact = (
+        (lengths <= width) &
+        ~np.any(kinds == _OTHER, axis=0) &
+        ~np.any(kinds[1:] == _SIGN, axis=0) &
+        (number_dots <= 1) &
+        (number_digits > 0) & (number_digits <= _MAX_MANTISSA_DIGITS)
+    )
+    # In these tokens all the characters after the dot are digits
+    fraction_digits = np.where(exact & (number_dots == 1), lengths - 1 - np.argmax(is_dot, axis=0), 0)
+
+    # Integer made of all the digits of the token
+    mantissa = np.zeros(number_tokens, dtype=np.int64)
+    digits = chars - 48
+    for column in range(width):
+        mantissa = np.where(is_digit[column], mantissa * 10 + digits[column], mantissa)
+
+    values = mantissa / _FLOAT_POWERS_OF_TEN[fraction_digits]
+    values = np.where(chars[0] == 45, -values, values)
+
+    # Remaining tokens are converted one by one
+    for token in np.flatnonzero(~exact):
+        values[token] = float(buffer[starts[token]:ends[token]].tobytes())
+
+    return values
+
+
+class LHCOScanner:
+    """
+    Reads .lhco files by memory-mapping them and parsing blocks of bytes with numpy.
+
+    Each block holds only complete events, so the file is processed with a memory overhead that depends
+    on the block size and not on the size of the file. The events are the same (and in the same order) as the
+    ones yielded by read_LHCO, and each EventTable produced by the scanner stores the byte position where
+    each event starts (see EventTable.positions), which allows random access to the events.
+    """
+
+    def __init__(self, block_size: int = 1 << 18):
+        """
+        :param block_size: approximate number of bytes parsed at once.
+        """
+        self.block_size = block_size
+
+    def read(self, filename: str, byte_range: Tuple[int, int] = None) -> EventTable:
+        """Returns an EventTable with all the events of the file (or with the events within byte_range)."""
+        return EventTable.concatenate(list(self.iter_tables(filename, byte_range)))
+
+    def iter_tables(self, filename: str, byte_range: Tuple[int, int] = None) -> Iterator[EventTable]:
+        """
+        Yields EventTables with the events of consecutive blocks of the file.
+        If byte_range = (start, stop) is given, only the lines starting at the positions [start, stop) are read.
+        For compressed files, the positions refer to the decompressed content and the file is always decompressed
+        from the beginning.
+        """
+        if is_compressed(filename):
+            yield from self._iter_compressed_tables(filename, byte_range)
+            return
+
+        file_size = os.path.getsize(filename)
+        start, stop = (0, file_size) if byte_range is None else byte_range
+        if file_size == 0 or start >= stop:
+            return
+
+        with open(filename, "rb") as lhco_file:
+            memory_map = mmap.mmap(lhco_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                # The last line must be complete
+                if stop < file_size and memory_map[stop - 1] != ord("\n"):
+                    newline = memory_map.find(b"\n", stop)
+                    stop = file_size if newline < 0 else newline + 1
+                buffer = np.frombuffer(memory_map, dtype=np.uint8)
+                try:
+                    for values, event_sizes, event_positions, _ in self._iter_blocks(buffer, start, stop, True):
+                        if len(event_sizes):
+                            yield EventTable.from_particle_rows(values, event_sizes, positions=event_positions)
+                finally:
+                    del buffer
+            finally:
+                memory_map.close()
+
+    def index(self, filename: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        Returns the byte position where each event of the file starts, the number of particles in each event,
+        the byte position where each event starts including the events without particles (which are skipped by
+        the readers) and the size of the file (of the decompressed content for compressed files), without
+        converting the particles information.
+        """
+        all_positions, all_sizes, all_starts = ([np.zeros(0, dtype=np.int64)] for _ in range(3))
+        if is_compressed(filename):
+            data_size = 0
+            for _, event_sizes, event_positions, event_starts, data_size in self._iter_stream_blocks(
+                    iter_decompressed_blocks(filename), False):
+                all_positions.append(event_positions)
+                all_sizes.append(event_sizes)
+                all_starts.append(event_starts)
+            return (np.concatenate(all_positions).astype(np.int64), np.concatenate(all_sizes).astype(np.int64),
+                    np.concatenate(all_starts).astype(np.int64), data_size)
+
+        file_size = os.path.getsize(filename)
+        if file_size == 0:
+            return all_positions[0], all_sizes[0], all_starts[0], 0
+
+        with open(filename, "rb") as lhco_file:
+            memory_map = mmap.mmap(lhco_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                buffer = np.frombuffer(memory_map, dtype=np.uint8)
+                try:
+                    for _, event_sizes, event_positions, event_starts in self._iter_blocks(buffer, 0, file_size,
+                                                                                           False):
+                        all_positions.append(event_positions)
+                        all_sizes.append(event_sizes)
+                        all_starts.append(event_starts)
+                finally:
+                    del buffer
+            finally:
+                memory_map.close()
+
+        return (np.concatenate(all_positions).astype(np.int64), np.concatenate(all_sizes).astype(np.int64),
+                np.concatenate(all_starts).astype(np.int64), file_size)
+
+    def _iter_compressed_tables(self, filename: str, byte_range: Tuple[int, int] = None) -> Iterator[EventTable]:
+        """Yields EventTables with the events of the decompressed content of the file (see iter_tables)."""
+        for values, event_sizes, event_positions, _, _ in self._iter_stream_blocks(
+                iter_decompressed_blocks(filename), True):
+            if len(event_sizes) == 0:
+                continue
+            table = EventTable.from_particle_rows(values, event_sizes, positions=event_positions)
+            if byte_range is not None:
+                if event_positions[0] >= byte_range[1]:
+                    break
+                first, last = np.searchsorted(event_positions, byte_range)
+                table = table[first:last]
+            if len(table):
+                yield table
+
+    def _iter_blocks(self, buffer: np.ndarray, start: int, stop: int, parse_values: bool):
+        """
+        Splits buffer[start:stop] into blocks that end right before an event header and parses them.
+        Yields the particles information (see _parse_block), the number of particles and the position of each event,
+        and the position of all the events (including the ones without particles).
+        """
+        block_size = self.block_size
+        while start < stop:
+            end = min(start + block_size, stop)
+            block = buffer[start:end]
+            # Ends the block at the beginning of a line
+            if end < stop:
+                newlines = np.flatnonzero(block == 10)
+                block = block[:newlines[-1] + 1] if len(newlines) else block[:0]
+
+            consumed = 0
+            if len(block):
+                values, event_sizes, event_positions, event_starts, consumed = self._parse_block(
+                    block, start, is_last=end == stop, parse_values=parse_values
+                )
+            if consumed == 0:
+                # The block does not hold a complete event, so it must be larger
+                block_size *= 2
+                continue
+
+            block_size = self.block_size
+            start += consumed
+            if len(event_starts):
+                yield values, event_sizes, event_positions, event_starts
+
+    def _iter_stream_blocks(self, blocks: Iterable[bytes], parse_values: bool):
+        """
+        Parses a stream of bytes given in blocks of arbitrary size (e.g. the content of a compressed file).
+        The bytes are accumulated until there are at least block_size bytes with complete events.
+        Yields the same as _iter_blocks and the number of bytes of the stream read so far.
+        """
+        pending, position, data_size = b"", 0, 0
+        for block in blocks:
+            data_size += len(block)
+            pending += block
+            # Only complete lines are parsed, and the last event may continue in the next blocks
+            end = pending.rfind(b"\n") + 1
+            if end < self.block_size:
+                continue
+            values, event_sizes, event_positions, event_starts, consumed = self._parse_block(
+                np.frombuffer(pending, dtype=np.uint8, count=end), position, is_last=False, parse_values=parse_values
+            )
+            if consumed:
+                position += consumed
+                pending = pending[consumed:]
+            if len(event_starts):
+                yield values, event_sizes, event_positions, event_starts, data_size
+
+        if pending:
+            values, event_sizes, event_positions, event_starts, _ = self._parse_block(
+                np.frombuffer(pending, dtype=np.uint8), position, is_last=True, parse_values=parse_values
+            )
+            if len(event_starts):
+                yield values, event_sizes, event_positions, event_starts, data_size
+
+    @staticmethod
+    def _parse_block(block: np.ndarray, position: int, is_last: bool, parse_values: bool):
+        """
+        Parses the events of the block, which starts at the byte 'position' of the file.
+        If is_last is False, the block is only parsed up to the last event header, since the event that starts
+        there may continue after the end of the block.
+
+        Returns a tuple with:
+            - the particles information, an array with shape (number of particles, len(EventTable.columns))
+              in the order of the file (None if parse_values is False);
+            - the number of particles in each event;
+            - the byte position where each event starts;
+            - the byte position where each event starts, including the events without particles;
+            - the number of bytes that were parsed.
+        """
+        # Tokens (sequences of non-whitespace characters)
+        whitespace = _WHITESPACE[block]
+        separated_before = np.ones_like(whitespace)
+        separated_before[1:] = whitespace[:-1]
+        separated_after = np.ones_like(whitespace)
+        separated_after[:-1] = whitespace[1:]
+        token_starts = np.flatnonzero(~whitespace & separated_before)
+        token_ends = np.flatnonzero(~whitespace & separated_after) + 1
+
+        # Lines and the tokens that belong to each of them
+        newlines = np.flatnonzero(block == 10)
+        line_starts = np.concatenate(([0], newlines + 1))
+        number_lines = len(line_starts) if len(newlines) == 0 or newlines[-1] + 1 < len(block) else len(newlines)
+        line_starts = line_starts[:number_lines]
+        token_line = np.searchsorted(newlines, token_starts)
+        tokens_per_line = np.bincount(token_line, minlength=number_lines)
+        first_token = np.zeros(number_lines, dtype=np.int64)
+        np.cumsum(tokens_per_line[:-1], out=first_token[1:])
+
+        # Classification of the lines by their first character
+        first_char = np.zeros(number_lines, dtype=np.uint8)
+        has_tokens = tokens_per_line > 0
+        first_char[has_tokens] = block[token_starts[first_token[has_tokens]]]
+        is_header = first_char == ord("0")
+        is_particle = has_tokens & ~is_header & (first_char != ord("#"))
+
+        # Only complete events are parsed: stops before the last header (unless it's the end of the data)
+        number_parsed_lines = number_lines
+        if not is_last:
+            header_lines = np.flatnonzero(is_header)
+            number_parsed_lines = header_lines[-1] if len(header_lines) else 0
+            if number_parsed_lines == 0:
+                return None, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0
+        consumed = int(line_starts[number_parsed_lines]) if number_parsed_lines < number_lines else len(block)
+        is_header, is_particle = is_header[:number_parsed_lines], is_particle[:number_parsed_lines]
+
+        particle_lines = np.flatnonzero(is_particle)
+        if np.any(tokens_per_line[particle_lines] != _NUMBER_COLUMNS):
+            raise ValueError(f"Particle lines must have exactly {_NUMBER_COLUMNS} columns.")
+
+        # Events are the groups of particle lines after each header (groups without particles are skipped)
+        headers_before = np.cumsum(is_header)[particle_lines]
+        event_sizes = np.bincount(headers_before)
+        has_particles = event_sizes > 0
+        # Particles before the first header belong to an event that starts at the first particle line
+        first_position = line_starts[particle_lines[0]] if len(particle_lines) else 0
+        event_starts = np.concatenate(([first_position], line_starts[np.flatnonzero(is_header)])) + position
+        event_positions = event_starts[:len(event_sizes)][has_particles]
+        if len(event_sizes) == 0 or not has_particles[0]:
+            event_starts = event_starts[1:]
+
+        # Numeric values of the columns (the first column only holds the position of the particle in the event)
+        values = None
+        if parse_values:
+            token_indices = (first_token[particle_lines][:, np.newaxis] + np.arange(1, _NUMBER_COLUMNS)).ravel()
+            values = _parse_numbers(block, token_starts[token_indices], token_ends[token_indices])
+            values = values.reshape(-1, _NUMBER_COLUMNS - 1)
+
+        return values, event_sizes[has_particles], event_positions, event_starts, consumed
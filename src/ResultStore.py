@@ -0,0 +1,149 @@
+"""On-disk store of the results of the analyses of each .lhco file, used to skip the analyses that already ran."""
+
+from LHCOReader_HighPT.src.Utilities import file_digest
+from typing import Callable, Optional
+import numpy as np
+import hashlib
+import inspect
+import pickle
+import json
+import os
+
+
+class ResultStore:
+    """
+    Stores the AnalysisResult (number of events, events that passed, histograms, cutflow and bootstrap replicas)
+    of each pair (.lhco file, analysis), so that the EventLoop only runs the pairs that are not in the store yet
+    (see EventLoop.analyse_files).
+
+    Each result is keyed by:
+        - the content hash of the .lhco file, so renamed or copied files are still found and modified files are
+          analysed again. The hash is only recomputed when the size or the modification time of the file changes;
+        - the fingerprint of the analysis (see fingerprint): the name of the analysis, the source code and the
+          parameters of its particle selections and cuts, the histogram templates (type, binning and observable)
+          and the settings of the EventLoop that change the results.
+    Functions called by the particle selections and cuts are not part of the fingerprint: when they change, the tag
+    must be changed (or the store cleared).
+    """
+    # Must be increased whenever the layout of the stored results changes
+    version = 1
+
+    def __init__(self, store_dir: str = None, tag: str = ""):
+        """
+        :param store_dir: folder where the results are stored. By default, the folder in the LHCO_RESULTS_DIR
+                          environment variable or ~/.cache/LHCOReader_HighPT/results.
+        :param tag: (optional) label added to all the keys, e.g. to invalidate the stored results by hand.
+        """
+        if store_dir is None:
+            store_dir = os.environ.get(
+                "LHCO_RESULTS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "LHCOReader_HighPT", "results")
+            )
+        self.store_dir = store_dir
+        self.tag = tag
+
+    def load(self, lhco_file: str, analysis_fingerprint: str):
+        """Returns the stored AnalysisResult of the analysis on the file (None if it's not in the store)."""
+        try:
+            with open(self._result_file(lhco_file, analysis_fingerprint), "rb") as result_file:
+                return pickle.load(result_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def store(self, lhco_file: str, analysis_fingerprint: str, result):
+        """Stores the AnalysisResult of the analysis on the file (atomically)."""
+        result_file = self._result_file(lhco_file, analysis_fingerprint)
+        os.makedirs(os.path.dirname(result_file), exist_ok=True)
+        temporary_file = f"{result_file}.{os.getpid()}.tmp"
+        with open(temporary_file, "wb") as stored:
+            pickle.dump(result, stored, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_file, result_file)
+
+    def digest(self, lhco_file: str) -> str:
+        """
+        Content hash of the file. The hash is stored with the size and the modification time of the file, and it's
+        only recomputed when they change.
+        """
+        file_stat = os.stat(lhco_file)
+        path_key = hashlib.blake2b(os.path.abspath(lhco_file).encode(), digest_size=16).hexdigest()
+        digest_file = os.path.join(self.store_dir, "digests", f"{path_key}.json")
+        try:
+            with open(digest_file) as stored:
+                stored_digest = json.load(stored)
+            if stored_digest["size"] == file_stat.st_size and stored_digest["mtime_ns"] == file_stat.st_mtime_ns:
+                return stored_digest["digest"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        digest = file_digest(lhco_file)
+        os.makedirs(os.path.dirname(digest_file), exist_ok=True)
+        with open(digest_file + ".tmp", "w") as stored:
+            json.dump({"path": os.path.abspath(lhco_file), "size": file_stat.st_size,
+                       "mtime_ns": file_stat.st_mtime_ns, "digest": digest}, stored)
+        os.replace(digest_file + ".tmp", digest_file)
+        return digest
+
+    def _result_file(self, lhco_file: str, analysis_fingerprint: str) -> str:
+        """File holding the result of the analysis on the file."""
+        key = hashlib.blake2b(f"{self.version}:{self.tag}:{analysis_fingerprint}".encode(), digest_size=16)
+        return os.path.join(self.store_dir, self.digest(lhco_file), f"{key.hexdigest()}.pkl")
+
+
+def fingerprint(*parts) -> str:
+    """
+    Hash of the given parts. Functions and callable objects are described by their qualified name, their source code
+    (if available), their default arguments and closure values, and their attributes (e.g. the batch implementation
+    set by batch_implementation), so that changing the code or the parameters of a cut changes the fingerprint.
+    Lists, tuples, sets and dictionaries are described item by item, and the remaining parts by their repr.
+    """
+    return hashlib.blake2b(_describe(parts).encode(), digest_size=20).hexdigest()
+
+
+def _describe(part) -> str:
+    """Text that identifies the part (see fingerprint)."""
+    if isinstance(part, (list, tuple)):
+        return "[" + ", ".join(_describe(item) for item in part) + "]"
+    if isinstance(part, dict):
+        return "{" + ", ".join(f"{_describe(key)}: {_describe(value)}" for key, value in part.items()) + "}"
+    if isinstance(part, (set, frozenset)):
+        # Sorted, since the order of the items changes between processes
+        return "{" + ", ".join(sorted(_describe(item) for item in part)) + "}"
+    if isinstance(part, (str, int, float, bool, type(None))):
+        return repr(part)
+    if isinstance(part, np.ndarray):
+        return _describe(part.tolist())
+    if callable(part):
+        return _describe_callable(part)
+    return repr(part)
+
+
+def _describe_callable(function: Callable) -> str:
+    """Qualified name, source code, defaults, closure values and attributes of the function (or callable object)."""
+    is_function = inspect.isfunction(function) or inspect.ismethod(function)
+    code_owner = function if is_function or inspect.isclass(function) else type(function)
+    name = f"{getattr(code_owner, '__module__', '')}.{getattr(code_owner, '__qualname__', repr(code_owner))}"
+    description = [name, str(_source(code_owner))]
+    if is_function:
+        description.append(_describe(list(function.__defaults__ or ())))
+        closure = getattr(function, "__closure__", None) or ()
+        description.append(_describe([_cell_contents(cell) for cell in closure]))
+    # Attributes of callable objects, and of functions the ones set by the decorators (e.g. the batch implementation
+    # and the particle types)
+    if not inspect.isclass(function) and hasattr(function, "__dict__"):
+        description.append(_describe(dict(sorted(vars(function).items()))))
+    return "<" + " | ".join(description) + ">"
+
+
+def _source(code_owner) -> Optional[str]:
+    """Source code of the function or class (None if it's not available, e.g. for builtins)."""
+    try:
+        return inspect.getsource(code_owner)
+    except (OSError, TypeError):
+        return None
+
+
+def _cell_contents(cell):
+    """Value of a closure cell (None if it's empty)."""
+    try:
+        return cell.cell_contents
+    except ValueError:
+        return None
@@ -0,0 +1,80 @@
+"""
+    Statistical uncertainties of the efficiencies and histograms.
+    - Binomial errors and Wilson score intervals of the efficiencies (from the event counts);
+    - Poisson bootstrap: each event enters each replica of the analysis with a weight drawn from a Poisson
+      distribution with mean one. The spread of the efficiencies (or histograms) over the replicas estimates their
+      statistical error, also for weighted events and for quantities correlated between bins.
+
+    The bootstrap weights are accumulated during the single pass of the EventLoop over the events. The weight of
+    an event in a replica is a hash of the seed, the index of the event in the file and the replica index, so the
+    replicas are the same for both engines and for any split of the file into chunks.
+"""
+
+from statistics import NormalDist
+from typing import Tuple
+import numpy as np
+
+# Confidence level of one standard deviation
+ONE_SIGMA = 0.6826894921370859
+
+# Constants of the splitmix64 generator
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+# Cumulative distribution of a Poisson distribution with mean one (the largest count is len(_POISSON_CDF))
+_POISSON_CDF = np.cumsum([np.exp(-1.) / np.prod(np.arange(1., count + 1.)) for count in range(20)])
+
+
+def splitmix64(values: np.ndarray) -> np.ndarray:
+    """Hashes each unsigned 64-bit integer with the splitmix64 finalizer (the operations wrap around)."""
+    values = np.asarray(values, dtype=np.uint64) + _GOLDEN_GAMMA
+    values = (values ^ (values >> np.uint64(30))) * _MIX_1
+    values = (values ^ (values >> np.uint64(27))) * _MIX_2
+    return values ^ (values >> np.uint64(31))
+
+
+def poisson_replica_weights(event_indices: np.ndarray, number_replicas: int, seed: int = 0) -> np.ndarray:
+    """
+    Bootstrap weights of the events, with shape (number of events, number_replicas): independent counts
+    drawn from a Poisson distribution with mean one, determined by the seed, the event indices and the replica.
+
+    :param event_indices: indices of the events in the file.
+    :param number_replicas: number of bootstrap replicas.
+    :param seed: seed of the replicas (different seeds give independent replicas).
+    """
+    event_indices = np.asarray(event_indices, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        event_keys = splitmix64(event_indices ^ splitmix64(np.uint64(seed)))
+        keys = splitmix64(event_keys[:, np.newaxis] + np.arange(number_replicas, dtype=np.uint64))
+    # Uniform numbers in [0, 1) from the 53 highest bits
+    uniform = (keys >> np.uint64(11)).astype(np.float64) * 2. ** -53
+    return np.searchsorted(_POISSON_CDF, uniform, side="right").astype(np.float64)
+
+
+def binomial_error(passed, total) -> np.ndarray:
+    """Standard deviation of the efficiency passed / total from the binomial distribution."""
+    passed, total = np.asarray(passed, dtype=np.float64), np.asarray(total, dtype=np.float64)
+    efficiency = passed / total
+    return np.sqrt(efficiency * (1. - efficiency) / total)
+
+
+def wilson_interval(passed, total, confidence: float = ONE_SIGMA) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wilson score interval (lower and upper limits) of the efficiency passed / total.
+    Unlike the binomial error, it stays within [0, 1] and has a non-zero width when no event (or all the events)
+    passed the cuts.
+    """
+    passed, total = np.asarray(passed, dtype=np.float64), np.asarray(total, dtype=np.float64)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.)
+    efficiency = passed / total
+    center = (efficiency + z ** 2 / (2. * total)) / (1. + z ** 2 / total)
+    half_width = z / (1. + z ** 2 / total) * np.sqrt(efficiency * (1. - efficiency) / total +
+                                                     z ** 2 / (4. * total ** 2))
+    return center - half_width, center + half_width
+
+
+def bootstrap_error(replicas: np.ndarray) -> np.ndarray:
+    """Standard deviation over the bootstrap replicas (the first axis)."""
+    replicas = np.asarray(replicas, dtype=np.float64)
+    return replicas.std(axis=0, ddof=1)
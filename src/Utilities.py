@@ -1,10 +1,172 @@
+from typing import Dict, Iterable, Iterator, List
+import threading
+import hashlib
+import queue
+import functools
+import math
+import os
+import re
 
 
 def read_xsection(path_to_file: str):
-    """Reads the cross-section from a .lhe or banner file"""
-    with open(path_to_file) as info_file:
-        for line in info_file:
-            if line.startswith("#  Integrated weight (pb)  :"):
-                _, xsection = line.split(":")
-                return float(xsection)
-    return None
+    """Reads the cross-section from a .lhe or banner file (see read_lhe_metadata)"""
+    return read_lhe_metadata(path_to_file)["xsection"]
+
+
+# Lines of the MadGraph banner with the total cross-section and the number of events
+_BANNER_XSECTION = re.compile(r"#\s*Integrated weight \(pb\)\s*:\s*(\S+)")
+_BANNER_EVENTS = re.compile(r"#\s*Number of Events\s*:\s*(\S+)")
+# Tags of the <init> block, which must not match the ones of other blocks (e.g. <initrwgt> of the reweighting)
+_INIT_START = re.compile(r"<init(\s|>|$)")
+_INIT_END = re.compile(r"</init\s*>")
+
+
+def read_lhe_metadata(path_to_file: str) -> Dict:
+    """
+    Reads the information about the generated events from the header and the <init> block of a .lhe file
+    (or from a banner file). The file is read only up to the first <event>, and it may be compressed
+    (see Compression). The metadata of the last files read is cached, so a file is only read again if it
+    changes. The returned dictionary is shared by all the calls on the same file, so it must not be modified.
+
+    Returns a dictionary with:
+        - xsection: total cross-section in pb (from the "Integrated weight (pb)" line of the banner or,
+          if it's missing, the sum of the cross-sections of the processes);
+        - xsection_error: error of the total cross-section (from the processes in the <init> block);
+        - number_events: number of events (from the banner or the run card);
+        - processes: list with the id, xsection, error and max_weight of each process of the <init> block;
+        - beams: list with the (PDG id, energy) of the two beams;
+        - weighting_strategy: the IDWTUP value of the <init> block.
+    Missing information is None (or an empty list).
+    """
+    file_stat = os.stat(path_to_file)
+    return _parse_lhe_header(os.path.abspath(path_to_file), file_stat.st_size, file_stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_lhe_header(path_to_file: str, size: int, mtime_ns: int) -> Dict:
+    """
+    Parses the header and the <init> block of the .lhe file (see read_lhe_metadata). The size and the modification
+    time of the file are only part of the key of the cache.
+    """
+    # Imported here since the Compression module uses the prefetch function of this module
+    from LHCOReader_HighPT.src.Compression import open_decompressed
+
+    banner_xsection = number_events = run_card_events = None
+    beams, weighting_strategy, processes = [], None, []
+    init_lines = None
+    with open_decompressed(path_to_file) as lhe_file:
+        for line in lhe_file:
+            line = line.decode(errors="replace").strip()
+            if line.startswith("<event"):
+                break
+            if init_lines is not None:
+                if _INIT_END.match(line):
+                    break
+                # Skips comments and the optional tags inside the block (e.g. <generator>)
+                if line and not line.startswith(("#", "<")):
+                    init_lines.append(line.split())
+            elif _INIT_START.match(line):
+                init_lines = []
+            elif line.startswith("#"):
+                xsection_match, events_match = _BANNER_XSECTION.match(line), _BANNER_EVENTS.match(line)
+                if xsection_match is not None:
+                    banner_xsection = float(xsection_match.group(1))
+                elif events_match is not None:
+                    number_events = int(events_match.group(1))
+            elif "= nevents" in line:
+                try:
+                    run_card_events = int(float(line.split("=")[0]))
+                except ValueError:
+                    pass
+
+    if init_lines:
+        idbmup1, idbmup2, ebmup1, ebmup2, *_, weighting_strategy, _ = init_lines[0]
+        beams = [(int(idbmup1), float(ebmup1)), (int(idbmup2), float(ebmup2))]
+        weighting_strategy = int(weighting_strategy)
+        processes = [
+            {"id": int(lprup), "xsection": float(xsecup), "error": float(xerrup), "max_weight": float(xmaxup)}
+            for xsecup, xerrup, xmaxup, lprup, *_ in init_lines[1:]
+        ]
+
+    return {
+        "xsection": banner_xsection if banner_xsection is not None else
+        (math.fsum(process["xsection"] for process in processes) if processes else None),
+        "xsection_error": math.sqrt(math.fsum(process["error"] ** 2 for process in processes))
+        if processes else None,
+        "number_events": number_events if number_events is not None else run_card_events,
+        "processes": processes,
+        "beams": beams,
+        "weighting_strategy": weighting_strategy,
+    }
+
+
+def file_digest(path_to_file: str, block_size: int = 1 << 20) -> str:
+    """Returns the hash (blake2b) of the content of the file."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path_to_file, "rb") as file_:
+        for block in iter(lambda: file_.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def prefetch(iterable: Iterable, buffer_size: int = 2) -> Iterator:
+    """
+    Yields the items of the iterable, which are produced in a background thread up to buffer_size items ahead of
+    the consumer. Exceptions raised by the iterable are raised again in the consumer.
+    If the consumer stops early (e.g. the generator is closed), the background thread stops after the current item.
+    """
+    items = queue.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+
+    def put(entry) -> bool:
+        """Puts the entry in the queue, waiting for a free slot unless the consumer stopped."""
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((True, item)):
+                    return
+        except BaseException as error:
+            put((False, error))
+        else:
+            put((False, None))
+        finally:
+            # Releases the resources of generators (e.g. open files) in the thread that used them
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            is_item, value = items.get()
+            if not is_item:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stopped.set()
+        producer.join()
+
+
+def chunked(iterable: Iterable, chunk_size: int) -> Iterator[List]:
+    """Yields lists with chunk_size consecutive items of the iterable (the last one may hold less)."""
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive.")
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,56 @@
+"""
+    Fixtures shared by the tests: synthetic .lhco files (see benchmarks/synthetic_lhco.py).
+
+    The tests are run from the repository with: python -m pytest tests
+    The modules are imported as LHCOReader_HighPT.src..., so the folder that holds the repository is added to the
+    path. If the repository is in a folder with another name, a link named LHCOReader_HighPT to the repository is
+    created in a temporary folder, which is added to the path instead.
+"""
+
+import tempfile
+import shutil
+import atexit
+import sys
+import os
+
+
+def _add_package_to_path():
+    """Makes the repository importable as the LHCOReader_HighPT package (also in the worker processes)."""
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if os.path.basename(repository) == "LHCOReader_HighPT":
+        sys.path.insert(0, os.path.dirname(repository))
+        return
+    link_folder = tempfile.mkdtemp(prefix="LHCOReader_HighPT-tests-")
+    atexit.register(shutil.rmtree, link_folder, ignore_errors=True)
+    os.symlink(repository, os.path.join(link_folder, "LHCOReader_HighPT"), target_is_directory=True)
+    sys.path.insert(0, link_folder)
+
+
+_add_package_to_path()
+
+from LHCOReader_HighPT.benchmarks.synthetic_lhco import write_synthetic_lhco  # noqa: E402
+import pytest  # noqa: E402
+import gzip  # noqa: E402
+
+# Number of events in the synthetic file (a few of them without particles)
+NUMBER_EVENTS = 1500
+
+
+@pytest.fixture(scope="session")
+def sample_dir(tmp_path_factory) -> str:
+    """Folder with the synthetic files of the session."""
+    return str(tmp_path_factory.mktemp("samples"))
+
+
+@pytest.fixture(scope="session")
+def lhco_file(sample_dir) -> str:
+    """Synthetic .lhco file with ditau-like events."""
+    return write_synthetic_lhco(os.path.join(sample_dir, "ditau.lhco"), NUMBER_EVENTS, seed=3)
+
+
+@pytest.fixture(scope="session")
+def gzip_file(lhco_file) -> str:
+    """The synthetic .lhco file compressed with gzip."""
+    with open(lhco_file, "rb") as original, gzip.open(lhco_file + ".gz", "wb") as compressed:
+        compressed.write(original.read())
+    return lhco_file + ".gz"
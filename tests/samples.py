@@ -0,0 +1,82 @@
+"""Analyses, histograms and reference reader used by the tests."""
+
+from LHCOReader_HighPT.src.Analysis import EventAnalysis, batch_implementation
+from LHCOReader_HighPT.src.Cutflow import uses_particles
+from LHCOReader_HighPT.src.EventInfo import Event
+from LHCOReader_HighPT.src.EventTable import EventTable
+from LHCOReader_HighPT.src.Histogram import ObservableHistogram, WeightedHistogram
+from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV.atlas_ditau_13TEV_analyses import (atlas_ditauhad_bveto,
+                                                                                        transverse_mass)
+from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV.ParticleSelections import (electron_candidates,
+                                                                                jet_candidates)
+from typing import Dict, List
+import numpy as np
+
+# Bin edges of the mTtot histograms
+BIN_EDGES = [0, 100, 200, 300, 400, 600, 800, 1000, 15000]
+
+
+def one_tau_batch(table: EventTable, mask: np.ndarray) -> np.ndarray:
+    """Columnar version of one_tau."""
+    return table.count(mask & table.type_mask("tauhads")) >= 1
+
+
+@uses_particles("tauhads")
+@batch_implementation(one_tau_batch)
+def one_tau(event: Event) -> bool:
+    """At least one hadronic tau."""
+    return len(event.tauhads) >= 1
+
+
+def hard_met(event: Event) -> bool:
+    """Missing energy above 40 GeV (without a batch implementation, so it's evaluated event by event)."""
+    return bool(event.met) and event.met[0].pt > 40
+
+
+def analyses() -> Dict[str, EventAnalysis]:
+    """The ditau analysis and two looser analyses that share their first steps."""
+    return {
+        "ditau": atlas_ditauhad_bveto(),
+        "tau": EventAnalysis([electron_candidates, jet_candidates], [one_tau]),
+        "tau-met": EventAnalysis([electron_candidates, jet_candidates], [one_tau, hard_met]),
+    }
+
+
+def histograms() -> Dict:
+    """Named histograms of the mTtot observable."""
+    return {"counts": ObservableHistogram(BIN_EDGES, transverse_mass),
+            "weighted": WeightedHistogram(BIN_EDGES, transverse_mass)}
+
+
+def reference_events(filename: str) -> List[List[List[float]]]:
+    """
+    Reads the particles of each event line by line, independently of the readers of the package: the events
+    without particles are skipped and the particles of each event are sorted by pT.
+    """
+    events, particles = [], []
+    with open(filename) as lhco_file:
+        for line in lhco_file:
+            columns = line.split()
+            if not columns or columns[0].startswith("#"):
+                continue
+            if columns[0] == "0":
+                if particles:
+                    events.append(particles)
+                particles = []
+            else:
+                particles.append([float(value) for value in columns[1:]])
+    if particles:
+        events.append(particles)
+    return [sorted(event, key=lambda particle: particle[3], reverse=True) for event in events]
+
+
+def event_values(event) -> List[List[float]]:
+    """Infos of the particles of an Event (or of an event of an EventTable)."""
+    return [[getattr(particle, info) for info in EventTable.columns] for particle in event]
+
+
+def histogram_contents(result, analysis_name: str) -> Dict[str, np.ndarray]:
+    """Contents of the histograms of the analysis in an AnalysisResult."""
+    counts = result.retrive_histogram(analysis_name, "counts")
+    weighted = result.retrive_histogram(analysis_name, "weighted")
+    return {"counts": np.asarray(counts), "sumw": weighted.sumw, "sumw2": weighted.sumw2}
@@ -0,0 +1,200 @@
+"""
+    Tests of the EventLoop: all the engines and modes (EventViews, shared steps, prefetch, chunks processed in
+    parallel, compressed files, cache) must give the same results as the event engine with copies of the events.
+"""
+
+from LHCOReader_HighPT.src.Analysis import EventLoop, EventAnalysis, AnalysisGraph
+from LHCOReader_HighPT.src.LHCOCache import LHCOCache
+from LHCOReader_HighPT.src.LHCOReader import read_LHCO, read_LHCO_columnar
+from LHCOReader_HighPT.src.Histogram import Histogram, ObservableHistogram
+from LHCOReader_HighPT.src.Instrumentation import Instrumentation, aggregate_records
+from samples import analyses, histograms, histogram_contents, one_tau, hard_met, BIN_EDGES
+from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV.atlas_ditau_13TEV_analyses import transverse_mass
+from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV.ParticleSelections import electron_candidates
+import numpy as np
+import pytest
+import os
+
+
+def run(lhco_file: str, chunks_per_file: int = 1, **options):
+    """Runs the analyses on the file and returns the AnalysisResult."""
+    event_loop = EventLoop(histogram=histograms(), **options)
+    if chunks_per_file > 1:
+        return event_loop.analyse_files([lhco_file], analyses(), n_workers=2, chunks_per_file=chunks_per_file)[
+            lhco_file]
+    event_loop.analyse_events(lhco_file, analyses())
+    return event_loop._result
+
+
+def assert_same_results(result, reference):
+    assert result.number_evts == reference.number_evts
+    assert result.passed == reference.passed
+    for analysis_name in reference.passed:
+        contents, reference_contents = histogram_contents(result, analysis_name), \
+            histogram_contents(reference, analysis_name)
+        for name, values in reference_contents.items():
+            assert np.allclose(contents[name], values), (analysis_name, name)
+
+
+@pytest.fixture(scope="module")
+def reference(lhco_file):
+    return run(lhco_file)
+
+
+def test_reference(reference, lhco_file):
+    assert reference.number_evts == len(list(read_LHCO(lhco_file)))
+    # The looser analyses select more events, and the histograms hold all the selected events within the limits
+    assert 0 < reference.passed["ditau"] < reference.passed["tau-met"] < reference.passed["tau"]
+    for analysis_name, passed in reference.passed.items():
+        assert histogram_contents(reference, analysis_name)["counts"].sum() <= passed
+        assert np.allclose(histogram_contents(reference, analysis_name)["sumw"],
+                           histogram_contents(reference, analysis_name)["counts"])
+
+
+@pytest.mark.parametrize("options", [
+    dict(engine="event", copy_events=False),
+    dict(engine="event", share_steps=True),
+    dict(engine="event", share_steps=True, copy_events=False),
+    dict(engine="event", prefetch_chunks=2, chunk_size=100),
+    dict(engine="batch"),
+    dict(engine="batch", share_steps=True),
+    dict(engine="batch", prefetch_chunks=2, chunk_size=100),
+])
+def test_engines_and_modes(lhco_file, reference, options):
+    assert_same_results(run(lhco_file, **options), reference)
+
+
+@pytest.mark.parametrize("engine", ["event", "batch"])
+def test_chunks_in_parallel(lhco_file, reference, engine):
+    assert_same_results(run(lhco_file, chunks_per_file=3, engine=engine), reference)
+
+
+@pytest.mark.parametrize("engine", ["event", "batch"])
+def test_compressed_file(gzip_file, reference, engine):
+    assert_same_results(run(gzip_file, engine=engine, prefetch_chunks=2, chunk_size=250), reference)
+
+
+@pytest.mark.parametrize("engine, chunks_per_file", [("event", 1), ("batch", 1), ("event", 3), ("batch", 3)])
+def test_cache(lhco_file, reference, tmp_path, engine, chunks_per_file):
+    cache = LHCOCache(str(tmp_path / "cache"))
+    for _ in range(2):
+        assert_same_results(run(lhco_file, chunks_per_file, engine=engine, cache=cache), reference)
+    # The arrays are written to temporary files that are renamed
+    entry_dir = cache._entry_dir(lhco_file)
+    assert sorted(os.listdir(entry_dir)) == ["data.npy", "metadata.json", "offsets.npy", "positions.npy"]
+
+
+def test_cutflows(lhco_file, reference):
+    for analysis_name, cutflow in reference.cutflows.items():
+        assert cutflow.number_evts == reference.number_evts
+        assert cutflow.total_passed == reference.passed[analysis_name]
+    cutflow = run(lhco_file, engine="batch").cutflows["tau-met"]
+    assert cutflow.passed == reference.cutflows["tau-met"].passed
+    assert cutflow.evaluated == reference.cutflows["tau-met"].evaluated
+
+
+@pytest.mark.parametrize("engine, share_steps", [("event", False), ("event", True), ("batch", False),
+                                                 ("batch", True)])
+def test_cutflow_timing(lhco_file, reference, engine, share_steps):
+    # The steps are only timed when the analysis is instrumented (or when the cuts are reordered)
+    for cutflow in reference.cutflows.values():
+        assert cutflow.timed == cutflow.reorder
+        assert cutflow.timed or sum(cutflow.cut_time) + sum(cutflow.selection_time) == 0.
+    result = run(lhco_file, engine=engine, share_steps=share_steps, instrumentation=Instrumentation())
+    assert_same_results(result, reference)
+    for analysis_name, cutflow in result.cutflows.items():
+        assert all(time > 0 for time in cutflow.cut_time[:1] + cutflow.selection_time), analysis_name
+
+
+def test_partition_cache_info(lhco_file):
+    # Accesses to the particle types of the events and of their views, counted independently of the EventLoop
+    # (without the ditau analysis, which reorders its cuts by their measured time)
+    event_analyses = {name: analysis for name, analysis in analyses().items() if name != "ditau"}
+    expected = {"hits": 0, "misses": 0}
+    for event in read_LHCO(lhco_file):
+        views = [event_analysis.launch_analysis(event.view())[1] for event_analysis in event_analyses.values()]
+        for current_event in [event] + views:
+            for counter, value in current_event.partition_cache_info.items():
+                expected[counter] += value
+    assert expected["hits"] > 0 and expected["misses"] > 0
+
+    instrumentation = Instrumentation()
+    EventLoop(copy_events=False, instrumentation=instrumentation).analyse_events(lhco_file, event_analyses)
+    summary, = [record for record in instrumentation.records if record["type"] == "summary"]
+    assert summary["partition_cache"] == expected
+    assert aggregate_records(instrumentation.records)["partition_cache"] == expected
+
+
+def test_analysis_graph(lhco_file):
+    event_analyses = analyses()
+    graph = AnalysisGraph(event_analyses)
+    # The electron selection is shared by all the analyses, and the jet selection and the first cut of "tau" and
+    # "tau-met" are shared by both
+    number_steps = sum(len(analysis.particle_selections) + len(analysis.cuts)
+                       for analysis in event_analyses.values())
+    assert graph.number_steps == number_steps - 4
+
+    table = read_LHCO_columnar(lhco_file)
+    outcomes = graph.launch_batch_analysis(table)
+    for analysis_name, event_analysis in event_analyses.items():
+        passed_cuts, mask = event_analysis.launch_batch_analysis(table)
+        assert np.array_equal(outcomes[analysis_name][0], passed_cuts)
+        assert np.array_equal(outcomes[analysis_name][1], mask)
+
+    for event in list(read_LHCO(lhco_file))[:200]:
+        outcomes = AnalysisGraph(event_analyses, copy_events=False).launch_analysis(event.view())
+        for analysis_name, event_analysis in event_analyses.items():
+            assert outcomes[analysis_name][0] == event_analysis.launch_analysis(event.view())[0]
+
+
+def test_lazy_selections_and_reordered_cuts(lhco_file):
+    events = list(read_LHCO(lhco_file))
+    eager = EventAnalysis([electron_candidates], [one_tau, hard_met])
+    lazy = EventAnalysis([electron_candidates], [one_tau, hard_met], lazy_selections=True, reorder_cuts=True)
+    cutflow = lazy.new_cutflow()
+    for event in events:
+        assert lazy.launch_analysis(event.view(), cutflow)[0] == eager.launch_analysis(event.view())[0]
+    assert cutflow.number_evts == len(events)
+
+
+def test_batch_histogram_fallback(lhco_file):
+    # Observables without a batch implementation are computed event by event
+    table = read_LHCO_columnar(lhco_file)
+    mask, passed = np.ones(table.n_particles, dtype=bool), np.ones(len(table), dtype=bool)
+    batch = ObservableHistogram(BIN_EDGES, transverse_mass)
+    batch.update_hist_batch(table, mask, passed)
+    per_event = ObservableHistogram(BIN_EDGES, lambda event: transverse_mass(event))
+    per_event.update_hist_batch(table, mask, passed)
+    assert np.array_equal(batch, per_event)
+
+
+class EventCounter(Histogram):
+    """Histogram that counts the events, written to the interface without weights and merge."""
+
+    def __init__(self):
+        self.count = 0
+
+    def update_hist(self, event):
+        self.count += 1
+
+    def __copy__(self):
+        return EventCounter()
+
+
+@pytest.mark.parametrize("engine", ["event", "batch"])
+def test_histogram_without_weights_and_merge(lhco_file, reference, engine):
+    event_loop = EventLoop(histogram=EventCounter(), engine=engine)
+    event_loop.analyse_events(lhco_file, analyses())
+    assert {name: event_loop.retrive_histogram(name).count for name in reference.passed} == reference.passed
+    # Merging is only needed for the chunks of a file
+    with pytest.raises(NotImplementedError):
+        event_loop.analyse_files([lhco_file], analyses(), n_workers=1, chunks_per_file=2)
+
+
+def test_custom_reader(lhco_file, reference):
+    def reader(filename: str, **options):
+        return read_LHCO(filename, **options)
+    assert_same_results(run(lhco_file, lhco_reader=reader), reference)
+    # The batch engine reads the files with read_LHCO_columnar
+    with pytest.raises(ValueError):
+        EventLoop(lhco_reader=reader, engine="batch")
@@ -0,0 +1,82 @@
+"""Tests of the EfficiencyMatrixJob."""
+
+from LHCOReader_HighPT.src.Analysis import EventLoop, EventAnalysis
+from LHCOReader_HighPT.src.EfficiencyMatrixBuilder import EfficiencyMatrixJob
+from LHCOReader_HighPT.src.Histogram import ObservableHistogram
+from LHCOReader_HighPT.benchmarks.synthetic_lhco import write_synthetic_lhco
+from samples import analyses, one_tau, BIN_EDGES
+from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV.atlas_ditau_13TEV_analyses import transverse_mass
+import numpy as np
+import pytest
+
+_LHE = """<LesHouchesEvents version="3.0">
+<header>
+<MGGenerationInfo>
+#  Number of Events        :       200
+#  Integrated weight (pb)  :  {xsection}
+</MGGenerationInfo>
+</header>
+<init>
+2212 2212 6.5e3 6.5e3 0 0 247000 247000 -4 1
+{xsection} 1.0e-03 {xsection} 1
+</init>
+</LesHouchesEvents>
+"""
+
+
+@pytest.fixture(scope="module")
+def manifest(tmp_path_factory):
+    """Two bins of one form factor, with 200 events each."""
+    folder = tmp_path_factory.mktemp("job")
+    entries = []
+    for bin_index, xsection in [(1, 0.5), (2, 0.25)]:
+        lhco_file, lhe_file = str(folder / f"ff-bin-{bin_index}.lhco"), str(folder / f"ff-bin-{bin_index}.lhe")
+        write_synthetic_lhco(lhco_file, 200, seed=bin_index)
+        with open(lhe_file, "w") as lhe:
+            lhe.write(_LHE.format(xsection=xsection))
+        entries.append(("ff", bin_index, lhco_file, lhe_file))
+    return entries
+
+
+def new_job(state_file: str, analysis: EventAnalysis = None, bin_edges=BIN_EDGES) -> EfficiencyMatrixJob:
+    event_analyses = analyses()
+    if analysis is not None:
+        event_analyses["tau"] = analysis
+    event_loop = EventLoop(histogram=ObservableHistogram(bin_edges, transverse_mass))
+    return EfficiencyMatrixJob(event_loop, event_analyses, analysis_name="tau", state_file=state_file)
+
+
+def test_run(manifest, tmp_path, capsys):
+    state_file = str(tmp_path / "state.json")
+    xsections, kernel = new_job(state_file).run(manifest, n_workers=1)["ff"]
+    assert np.allclose(xsections, [0.5, 0.25])
+    assert kernel.shape == (2, len(BIN_EDGES) - 1)
+    assert np.all((kernel >= 0) & (kernel <= 1))
+    capsys.readouterr()
+
+    # Nothing changed, so the files are not analysed again
+    xsections_again, kernel_again = new_job(state_file).run(manifest, n_workers=1)["ff"]
+    assert "Results for file" not in capsys.readouterr().out
+    assert np.array_equal(kernel_again, kernel) and np.array_equal(xsections_again, xsections)
+
+
+@pytest.mark.parametrize("options", [
+    dict(analysis=EventAnalysis([], [one_tau])),
+    dict(bin_edges=BIN_EDGES[:-1]),
+])
+def test_configuration_changes(manifest, tmp_path, capsys, options):
+    state_file = str(tmp_path / "state.json")
+    new_job(state_file).run(manifest, n_workers=1)
+    capsys.readouterr()
+    # The particle selections (or the histogram template) changed, so all the files are analysed again
+    new_job(state_file, **options).run(manifest, n_workers=1)
+    assert capsys.readouterr().out.count("Results for file") == len(manifest)
+
+
+def test_missing_xsection(manifest, tmp_path):
+    lhe_file = str(tmp_path / "no-xsection.lhe")
+    with open(lhe_file, "w") as lhe:
+        lhe.write("<LesHouchesEvents version=\"3.0\">\n</LesHouchesEvents>\n")
+    entries = [manifest[0], manifest[1][:3] + (lhe_file,)]
+    with pytest.raises(ValueError):
+        new_job(None).run(entries, n_workers=1)
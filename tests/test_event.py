@@ -0,0 +1,92 @@
+"""Tests of the Particle, Event and EventView classes."""
+
+from LHCOReader_HighPT.src.EventInfo import Particle, Event
+from LHCOReader_HighPT.src.LHCOReader import read_LHCO
+import copy
+
+_PARTICLE_LINES = [
+    "4 0.5 1.0 50.0 5.0 3.0 1.0 0.5 0.0 0.0",
+    "3 -1.0 -2.0 120.0 1.5 1.0 0.0 2.0 0.0 0.0",
+    "1 0.2 0.4 30.0 0.0 -1.0 0.0 0.0 0.0 0.0",
+    "6 0.0 3.0 80.0 0.0 0.0 0.0 0.0 0.0 0.0",
+    "4 2.0 -1.0 90.0 7.0 5.0 0.0 0.3 0.0 0.0",
+]
+
+
+def test_particle():
+    particle = Particle(_PARTICLE_LINES[0])
+    assert (particle.typ, particle.pt, particle.btag) == (4., 50., 1.)
+    assert getattr(particle, "had/em") == particle.had_em == 0.5
+    copied = copy.copy(particle)
+    assert copied is not particle
+    assert [getattr(copied, info) for info in Particle.__slots__] == \
+        [getattr(particle, info) for info in Particle.__slots__]
+
+
+def test_event_partitions():
+    event = Event.from_str_particles_info(_PARTICLE_LINES)
+    assert [particle.pt for particle in event] == [120., 90., 80., 50., 30.]
+    assert [jet.pt for jet in event.jets] == [90., 50.]
+    assert [tau.pt for tau in event.tauhads] == [120.]
+    assert event.muons == [] and len(event.met) == 1
+
+    # The partitions are built again when the particles change
+    event.remove_particles("jets")
+    assert event.jets == []
+    event.append(Particle(_PARTICLE_LINES[0]))
+    assert [jet.pt for jet in event.jets] == [50.]
+
+
+def test_copy_of_particles_with_less_infos():
+    particle = Particle.from_values(4., 0.5, 1.0, 50.)
+    copied = copy.copy(particle)
+    assert (copied.typ, copied.eta, copied.phi, copied.pt) == (4., 0.5, 1.0, 50.)
+    assert not hasattr(copied, "jmas")
+
+
+def test_partition_cache_info():
+    event = Event.from_str_particles_info(_PARTICLE_LINES)
+    other = Event.from_str_particles_info(_PARTICLE_LINES)
+    assert [len(event.jets), len(event.tauhads), len(event.muons)] == [2, 1, 0]
+    assert event.partition_cache_info == {"hits": 2, "misses": 1}
+    # The counters belong to each event (and view)
+    assert other.partition_cache_info == {"hits": 0, "misses": 0}
+    view = event.view()
+    assert len(view.jets) == 2
+    assert view.partition_cache_info == {"hits": 1, "misses": 0}
+    event.remove_particles("jets")
+    assert event.jets == []
+    assert event.partition_cache_info == {"hits": 2, "misses": 2}
+    event.reset_partition_cache_info()
+    assert event.partition_cache_info == {"hits": 0, "misses": 0}
+
+
+def test_deepcopy():
+    event = Event.from_str_particles_info(_PARTICLE_LINES)
+    copied = copy.deepcopy(event)
+    copied.remove_particles("tauhads")
+    copied[0].pt = 1.
+    assert len(event.tauhads) == 1
+    assert event[0].pt == 120.
+
+
+def test_event_view():
+    event = Event.from_str_particles_info(_PARTICLE_LINES)
+    view = event.view()
+    view.remove_particles("jets")
+    assert view.jets == [] and len(event.jets) == 2
+    # The view shares the particles with the event
+    assert all(any(particle is original for original in event) for particle in view)
+    assert view.indices == [0, 2, 4]
+
+    second_view = event.view()
+    second_view.data = [particle for particle in second_view if particle.pt > 60]
+    assert second_view.indices == [0, 1, 2]
+    assert len(event) == 5
+
+
+def test_events_from_file(lhco_file):
+    for event in read_LHCO(lhco_file):
+        assert [particle.pt for particle in event] == sorted((particle.pt for particle in event), reverse=True)
+        view = event.view()
+        assert [particle.pt for particle in view.tauhads] == [particle.pt for particle in event.tauhads]
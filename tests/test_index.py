@@ -0,0 +1,119 @@
+"""Tests of the LHCOIndex and of the LHCOCache."""
+
+from LHCOReader_HighPT.src.LHCOIndex import LHCOIndex
+from LHCOReader_HighPT.src.LHCOCache import LHCOCache
+from LHCOReader_HighPT.src.LHCOReader import read_LHCO, read_LHCO_columnar
+from LHCOReader_HighPT.src.LHCOScanner import LHCOScanner
+from samples import reference_events, event_values
+from conftest import NUMBER_EVENTS
+import numpy as np
+import shutil
+import os
+
+
+def test_index_positions(lhco_file):
+    index = LHCOIndex.build(lhco_file)
+    table = read_LHCO_columnar(lhco_file)
+    assert len(index) == len(table)
+    assert np.array_equal(index.positions, table.positions)
+    assert np.array_equal(index.counts, table.counts)
+    assert index.file_size == os.path.getsize(lhco_file)
+
+
+def header_numbers(filename: str, positions: np.ndarray) -> list:
+    """Event numbers in the headers of the events that start at the positions."""
+    with open(filename, "rb") as lhco:
+        content = lhco.read()
+    return [int(content[position:content.index(b"\n", position)].split()[1]) for position in positions]
+
+
+def test_ordinals(lhco_file):
+    # The events of the synthetic file are numbered 1, 2, ..., including the ones without particles
+    index = LHCOIndex.build(lhco_file)
+    assert index.number_all_events == NUMBER_EVENTS > len(index)
+    assert np.array_equal(index.ordinals + 1, header_numbers(lhco_file, index.positions))
+    assert np.array_equal(LHCOIndex.for_file(lhco_file).ordinals, index.ordinals)
+
+
+def test_ordinals_with_empty_events(tmp_path):
+    # Events without particles at the beginning, in the middle and at the end of the file, and in several blocks
+    particle = "   1    4    0.000    0.000   30.00    0.00   0.0   0.0    0.00   0.0   0.0\n"
+    particles = [0, 0, 2, 0, 1, 0, 0, 3, 1, 0, 0]
+    filename = str(tmp_path / "empty.lhco")
+    with open(filename, "w") as lhco:
+        lhco.write("#  typ  eta  phi  pt  jmas  ntrk  btag  had/em  dum1  dum2\n")
+        for event_number, number_particles in enumerate(particles, start=1):
+            lhco.write(f"  0 {event_number:13d}      0\n" + particle * number_particles)
+    for block_size in (64, 1 << 18):
+        positions, counts, event_starts, _ = LHCOScanner(block_size).index(filename)
+        assert counts.tolist() == [2, 1, 3, 1] and len(event_starts) == len(particles)
+    index = LHCOIndex.build(filename)
+    assert index.ordinals.tolist() == [2, 4, 7, 8] and index.number_all_events == len(particles)
+
+
+def test_byte_range(lhco_file):
+    index = LHCOIndex.for_file(lhco_file)
+    reference = reference_events(lhco_file)
+    for start, stop in [(0, 1), (10, 20), (len(index) - 5, len(index)), (len(index) - 5, len(index) + 10)]:
+        events = [event_values(event) for event in read_LHCO(lhco_file, byte_range=index.byte_range(start, stop))]
+        assert events == reference[start:stop]
+    assert index.byte_range(len(index) - 1, len(index))[1] == index.file_size
+
+
+def test_chunks(lhco_file):
+    index = LHCOIndex.for_file(lhco_file)
+    chunks = index.chunks(128)
+    assert len(chunks) == -(-len(index) // 128)
+    assert chunks[0][0] == index.positions[0] and chunks[-1][1] == index.file_size
+    # Consecutive chunks are contiguous
+    assert all(previous[1] == current[0] for previous, current in zip(chunks[:-1], chunks[1:]))
+    assert [len(read_LHCO_columnar(lhco_file, byte_range=chunk)) for chunk in chunks[:-1]] == \
+        [128] * (len(chunks) - 1)
+
+
+def test_sidecar_file(lhco_file, tmp_path):
+    filename = str(tmp_path / "copy.lhco")
+    shutil.copy(lhco_file, filename)
+    index = LHCOIndex.for_file(filename)
+    assert os.path.exists(filename + LHCOIndex.extension)
+    stored = LHCOIndex.for_file(filename)
+    assert np.array_equal(stored.positions, index.positions) and stored.file_size == index.file_size
+
+    # The index is built again when the file changes
+    with open(filename, "a") as lhco:
+        lhco.write("  0 99999 0\n   1    4    0.000    0.000   30.00    0.00   0.0   0.0    0.00   0.0   0.0\n")
+    assert len(LHCOIndex.for_file(filename)) == len(index) + 1
+
+
+def test_compressed_index(gzip_file, lhco_file):
+    index = LHCOIndex.for_file(gzip_file)
+    reference = LHCOIndex.build(lhco_file)
+    assert np.array_equal(index.positions, reference.positions)
+    assert np.array_equal(index.ordinals, reference.ordinals)
+    # The size of the decompressed content, also when the index is loaded from the sidecar file
+    assert index.file_size == reference.file_size
+    assert LHCOIndex.for_file(gzip_file).file_size == reference.file_size
+
+
+def test_cache(lhco_file, tmp_path):
+    filename = str(tmp_path / "cached.lhco")
+    shutil.copy(lhco_file, filename)
+    cache = LHCOCache(str(tmp_path / "cache"))
+    reference = read_LHCO_columnar(filename)
+
+    table = cache.load(filename)
+    assert np.array_equal(table.data, reference.data)
+    cached = cache.load(filename)
+    assert isinstance(cached.data, np.memmap)
+    assert np.array_equal(cached.data, reference.data) and np.array_equal(cached.positions, reference.positions)
+    assert [event_values(event) for event in read_LHCO(filename, cache=cache)] == reference_events(filename)
+
+    # Touching the file keeps the entry, changing it parses the file again
+    os.utime(filename, ns=(0, 0))
+    assert isinstance(cache.load(filename).data, np.memmap)
+    with open(filename, "a") as lhco:
+        lhco.write("  0 99999 0\n   1    4    0.000    0.000   30.00    0.00   0.0   0.0    0.00   0.0   0.0\n")
+    assert len(cache.load(filename)) == len(reference) + 1
+
+    cache.invalidate(filename)
+    assert not os.path.exists(cache._entry_dir(filename))
@@ -0,0 +1,117 @@
+"""Tests of read_LHCO, read_LHCO_columnar, the LHCOScanner and the chunked and compressed reads."""
+
+from LHCOReader_HighPT.src.LHCOReader import read_LHCO, read_LHCO_columnar, iter_LHCO_chunks, split_LHCO
+from LHCOReader_HighPT.src.LHCOScanner import LHCOScanner
+from LHCOReader_HighPT.src.EventTable import EventTable
+from samples import reference_events, event_values
+import numpy as np
+import pytest
+import bz2
+import lzma
+
+# Event with more than 9 particles: the index column has two digits from the 10th particle on
+_LARGE_EVENT = """#  typ      eta      phi      pt    jmas   ntrk   btag  had/em   dummy   dummy
+  0             1      0
+""" + "".join(
+    f"{index:4d} {index % 5:4d} {0.1 * index:8.3f} {-0.2 * index:8.3f} {10. * index:7.2f} {0.:7.2f} {1.:6.1f} "
+    f"{0.:6.1f} {0.5:7.2f} {0.:6.1f} {0.:6.1f}\n" for index in range(1, 13)
+) + """  0             2      0
+  0             3      0
+   1    6    0.000    1.500   25.00    0.00   0.0   0.0    0.00   0.0   0.0
+"""
+
+
+@pytest.fixture
+def large_event_file(tmp_path) -> str:
+    filename = str(tmp_path / "large_event.lhco")
+    with open(filename, "w") as lhco_file:
+        lhco_file.write(_LARGE_EVENT)
+    return filename
+
+
+def test_read_LHCO_matches_reference(lhco_file):
+    events = [event_values(event) for event in read_LHCO(lhco_file)]
+    assert events == reference_events(lhco_file)
+
+
+def test_particle_index_with_two_digits(large_event_file):
+    events = list(read_LHCO(large_event_file))
+    # The event 2 has no particles and is skipped
+    assert [len(event) for event in events] == [12, 1]
+    assert [event_values(event) for event in events] == reference_events(large_event_file)
+    assert max(particle.pt for particle in events[0]) == 120.
+    assert getattr(events[0][0], "had/em") == 0.5
+
+
+def test_columnar_reader_matches_read_LHCO(lhco_file, large_event_file):
+    for filename in (lhco_file, large_event_file):
+        table = read_LHCO_columnar(filename)
+        assert isinstance(table, EventTable)
+        assert [event_values(event) for event in table] == reference_events(filename)
+
+
+def test_scanner_small_blocks(lhco_file):
+    # Blocks smaller than an event must be enlarged until they hold a complete event
+    table = LHCOScanner(block_size=64).read(lhco_file)
+    reference = read_LHCO_columnar(lhco_file)
+    assert np.array_equal(table.data, reference.data)
+    assert np.array_equal(table.offsets, reference.offsets)
+    assert np.array_equal(table.positions, reference.positions)
+
+
+def test_positions_are_event_headers(lhco_file):
+    table = read_LHCO_columnar(lhco_file)
+    with open(lhco_file, "rb") as lhco:
+        content = lhco.read()
+    assert all(content[position:].lstrip().startswith(b"0 ") for position in table.positions.tolist())
+
+
+def test_split_LHCO_covers_all_events(lhco_file):
+    chunks = split_LHCO(lhco_file, 4)
+    assert len(chunks) == 4
+    events = [event_values(event) for byte_range in chunks for event in read_LHCO(lhco_file, byte_range=byte_range)]
+    assert events == reference_events(lhco_file)
+    tables = [read_LHCO_columnar(lhco_file, byte_range=byte_range) for byte_range in chunks]
+    assert sum(len(table) for table in tables) == len(events)
+
+
+@pytest.mark.parametrize("start, stop, step", [(10, 50, None), (None, 30, 3), (-20, None, None), (100, 10, -7)])
+def test_index_selection(lhco_file, start, stop, step):
+    reference = reference_events(lhco_file)[start:stop:step]
+    assert [event_values(event) for event in read_LHCO(lhco_file, start=start, stop=stop, step=step)] == reference
+    table = read_LHCO_columnar(lhco_file, start=start, stop=stop, step=step)
+    assert [event_values(event) for event in table] == reference
+
+
+def test_selection_by_index_and_byte_range(lhco_file):
+    with pytest.raises(ValueError):
+        read_LHCO_columnar(lhco_file, byte_range=(0, 100), start=1)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 97, 10000])
+def test_iter_LHCO_chunks(lhco_file, chunk_size):
+    tables = list(iter_LHCO_chunks(lhco_file, chunk_size))
+    assert all(len(table) == chunk_size for table in tables[:-1])
+    assert [event_values(event) for table in tables for event in table] == reference_events(lhco_file)
+
+
+@pytest.mark.parametrize("compression", ["gz", "bz2", "xz"])
+def test_compressed_files(lhco_file, gzip_file, tmp_path, compression):
+    if compression == "gz":
+        filename = gzip_file
+    else:
+        filename = str(tmp_path / f"ditau.lhco.{compression}")
+        module = bz2 if compression == "bz2" else lzma
+        with open(lhco_file, "rb") as original, module.open(filename, "wb") as compressed:
+            compressed.write(original.read())
+
+    reference = read_LHCO_columnar(lhco_file)
+    assert [event_values(event) for event in read_LHCO(filename)] == reference_events(lhco_file)
+    table = read_LHCO_columnar(filename)
+    assert np.array_equal(table.data, reference.data)
+    # The positions refer to the decompressed content
+    assert np.array_equal(table.positions, reference.positions)
+    chunks = list(iter_LHCO_chunks(filename, 200))
+    assert sum(len(chunk) for chunk in chunks) == len(reference)
+    with pytest.raises(ValueError):
+        split_LHCO(filename, 2)
@@ -0,0 +1,178 @@
+"""Tests of the ResultStore, of the fingerprints of the analyses and of the checkpoints of the EventLoop."""
+
+from LHCOReader_HighPT.src.Analysis import EventLoop, EventAnalysis, batch_implementation
+from LHCOReader_HighPT.src.ResultStore import ResultStore, fingerprint
+from LHCOReader_HighPT.src.Checkpoint import Checkpoint
+from LHCOReader_HighPT.src.Cutflow import uses_particles
+from samples import analyses, histograms, histogram_contents, one_tau
+from LHCOReader_HighPT.examples.DY.atlas_ditau_13TEV.ParticleSelections import jet_candidates
+import LHCOReader_HighPT.src.Analysis as Analysis
+import numpy as np
+import pytest
+import shutil
+import os
+
+
+def pt_cut(threshold: float):
+    """Cut on the pT of the leading particle, with the threshold in a closure."""
+    def leading_pt(event) -> bool:
+        return event[0].pt > threshold
+    return leading_pt
+
+
+class LeadingPt:
+    """Cut on the pT of the leading particle, with the threshold as an attribute."""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+
+    def __call__(self, event) -> bool:
+        return event[0].pt > self.threshold
+
+
+def test_fingerprint():
+    assert fingerprint(pt_cut(50.)) == fingerprint(pt_cut(50.))
+    assert fingerprint(pt_cut(50.)) != fingerprint(pt_cut(60.))
+    assert fingerprint(LeadingPt(50.)) == fingerprint(LeadingPt(50.))
+    assert fingerprint(LeadingPt(50.)) != fingerprint(LeadingPt(60.))
+    assert fingerprint([1, 2.5, "a", None]) != fingerprint([1, 2.5, "a"])
+    assert fingerprint({"edges": np.array([1., 2.])}) == fingerprint({"edges": [1., 2.]})
+    assert fingerprint(one_tau) != fingerprint(jet_candidates)
+
+
+def test_fingerprint_of_decorated_functions():
+    def decorated(number: int, batch_number: int, particle_type: str):
+        def enough_particles_batch(table, mask):
+            return table.count(mask & table.type_mask(particle_type)) >= batch_number
+
+        @uses_particles(particle_type)
+        @batch_implementation(enough_particles_batch)
+        def enough_particles(event) -> bool:
+            return len(getattr(event, particle_type)) >= number
+        return enough_particles
+
+    assert fingerprint(decorated(1, 1, "jets")) == fingerprint(decorated(1, 1, "jets"))
+    # Editing the batch implementation (or the particle types) changes the fingerprint
+    assert fingerprint(decorated(1, 1, "jets")) != fingerprint(decorated(1, 2, "jets"))
+    assert fingerprint(decorated(1, 1, "jets")) != fingerprint(decorated(1, 1, "tauhads"))
+    cut = decorated(1, 1, "jets")
+    original = fingerprint(cut)
+    cut.batch = lambda table, mask: table.count(mask & table.type_mask("jets")) >= 2
+    assert fingerprint(cut) != original
+
+
+def test_result_fingerprints(lhco_file):
+    event_analyses = analyses()
+    fingerprints = EventLoop(histogram=histograms())._result_fingerprints(lhco_file, event_analyses)
+    assert len(set(fingerprints.values())) == len(event_analyses)
+    # The histograms and the settings that change the results are part of the fingerprints
+    for options in (dict(), dict(histogram=histograms(), bootstrap_replicas=10),
+                    dict(histogram=histograms(), bootstrap_replicas=10, bootstrap_seed=1)):
+        other = EventLoop(**options)._result_fingerprints(lhco_file, event_analyses)
+        assert all(other[name] != fingerprints[name] for name in event_analyses)
+    # The settings that don't change the results are not
+    same = EventLoop(histogram=histograms(), engine="batch", share_steps=True)._result_fingerprints(
+        lhco_file, event_analyses)
+    assert same == fingerprints
+
+
+def test_result_store(lhco_file, tmp_path, capsys):
+    filename = str(tmp_path / "stored.lhco")
+    shutil.copy(lhco_file, filename)
+    store = ResultStore(str(tmp_path / "results"))
+    event_loop = EventLoop(histogram=histograms(), result_store=store)
+    efficiencies, _ = event_loop.analyse_events(filename, analyses())
+    reference = event_loop._result
+    capsys.readouterr()
+
+    # All the results are loaded from the store, and only the new analysis is run
+    event_analyses = analyses()
+    event_analyses["leading-pt"] = EventAnalysis([], [pt_cut(100.)])
+    event_loop.analyse_events(filename, event_analyses)
+    assert "loaded from the result store" in capsys.readouterr().out
+    result = event_loop._result
+    assert list(result.passed) == list(event_analyses)
+    for analysis_name in reference.passed:
+        assert result.passed[analysis_name] == reference.passed[analysis_name]
+        assert np.array_equal(histogram_contents(result, analysis_name)["counts"],
+                              histogram_contents(reference, analysis_name)["counts"])
+    assert {name: result.efficiencies[name] for name in efficiencies} == efficiencies
+
+    # Touching the file keeps the results, changing its content doesn't
+    os.utime(filename, ns=(0, 0))
+    assert store.load(filename, event_loop._result_fingerprints(filename, event_analyses)["tau"]) is not None
+    with open(filename, "a") as lhco:
+        lhco.write("  0 99999 0\n   1    3    0.000    0.000   90.00    0.00   1.0   0.0    0.00   0.0   0.0\n")
+    assert store.load(filename, event_loop._result_fingerprints(filename, event_analyses)["tau"]) is None
+
+
+class _Interruption(Exception):
+    """Raised to interrupt the EventLoop after some events."""
+
+
+def interrupt_after(monkeypatch, number_evts: int):
+    """Makes the EventLoop stop (with _Interruption) after writing the checkpoint with number_evts events."""
+    events_done = Checkpoint.events_done
+
+    def interrupted_events_done(checkpoint, result):
+        events_done(checkpoint, result)
+        if result.number_evts >= number_evts:
+            raise _Interruption()
+    monkeypatch.setattr(Analysis.Checkpoint, "events_done", interrupted_events_done)
+
+
+@pytest.mark.parametrize("engine, chunks_per_file", [("event", 1), ("batch", 1), ("event", 2), ("batch", 2)])
+def test_checkpoint_resume(lhco_file, tmp_path, monkeypatch, capsys, engine, chunks_per_file):
+    def run():
+        event_loop = EventLoop(histogram=histograms(), engine=engine, chunk_size=100, bootstrap_replicas=5,
+                               checkpoint_dir=checkpoint_dir, checkpoint_interval=200)
+        if chunks_per_file > 1:
+            return event_loop.analyse_files([lhco_file], analyses(), n_workers=1,
+                                            chunks_per_file=chunks_per_file)[lhco_file]
+        event_loop.analyse_events(lhco_file, analyses())
+        return event_loop._result
+
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    reference = run()
+    assert not os.listdir(checkpoint_dir)
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 500)
+        with pytest.raises(_Interruption):
+            run()
+    # One checkpoint for each interrupted chunk
+    assert 1 <= len(os.listdir(checkpoint_dir)) <= chunks_per_file
+    capsys.readouterr()
+
+    result = run()
+    if chunks_per_file == 1:
+        # The chunks are analysed in other processes, so their output is not captured
+        assert "Resuming" in capsys.readouterr().out
+    assert not os.listdir(checkpoint_dir)
+    assert result.number_evts == reference.number_evts
+    assert result.passed == reference.passed
+    assert np.array_equal(result.total_replicas, reference.total_replicas)
+    for analysis_name in reference.passed:
+        assert result.cutflows[analysis_name].number_evts == reference.number_evts
+        assert np.array_equal(histogram_contents(result, analysis_name)["counts"],
+                              histogram_contents(reference, analysis_name)["counts"])
+        assert np.array_equal(result.passed_replicas[analysis_name], reference.passed_replicas[analysis_name])
+
+
+def test_checkpoint_invalidation(lhco_file, tmp_path, monkeypatch, capsys):
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 300)
+        with pytest.raises(_Interruption):
+            EventLoop(histogram=histograms(), checkpoint_dir=checkpoint_dir, checkpoint_interval=100).analyse_events(
+                lhco_file, analyses())
+    capsys.readouterr()
+
+    # Other analyses (or settings) don't use the checkpoint, and resume=False ignores it
+    event_analyses = analyses()
+    event_analyses["tau"] = EventAnalysis([], [one_tau])
+    EventLoop(histogram=histograms(), checkpoint_dir=checkpoint_dir).analyse_events(lhco_file, event_analyses)
+    EventLoop(histogram=histograms(), checkpoint_dir=checkpoint_dir, resume=False).analyse_events(lhco_file,
+                                                                                                 analyses())
+    assert "Resuming" not in capsys.readouterr().out
+    assert not os.listdir(checkpoint_dir)
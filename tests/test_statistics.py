@@ -0,0 +1,63 @@
+"""Tests of the Statistics module."""
+
+from LHCOReader_HighPT.src.Statistics import (splitmix64, poisson_replica_weights, binomial_error, wilson_interval,
+                                              bootstrap_error, ONE_SIGMA)
+import numpy as np
+import pytest
+
+
+def test_splitmix64():
+    # First output of the reference splitmix64 generator with the state 0
+    assert int(splitmix64(np.zeros(1, dtype=np.uint64))[0]) == 0xE220A8397B1DCDAF
+    values = splitmix64(np.arange(1000, dtype=np.uint64))
+    assert len(np.unique(values)) == 1000
+
+
+def test_poisson_replica_weights():
+    weights = poisson_replica_weights(np.arange(20000), 50, seed=1)
+    assert weights.shape == (20000, 50)
+    assert np.all(weights >= 0) and np.all(weights == np.round(weights))
+    assert weights.mean() == pytest.approx(1., abs=0.01)
+    assert weights.var() == pytest.approx(1., abs=0.02)
+    assert np.mean(weights == 0) == pytest.approx(np.exp(-1.), abs=0.01)
+
+
+def test_poisson_replica_weights_are_reproducible():
+    weights = poisson_replica_weights(np.arange(1000), 10, seed=3)
+    # The weights only depend on the index of the event, so any split of the events gives the same replicas
+    split = np.concatenate([poisson_replica_weights(np.arange(0, 400), 10, seed=3),
+                            poisson_replica_weights(np.arange(400, 1000), 10, seed=3)])
+    assert np.array_equal(weights, split)
+    assert not np.array_equal(weights, poisson_replica_weights(np.arange(1000), 10, seed=4))
+
+
+def test_binomial_error():
+    assert binomial_error(25, 100) == pytest.approx(np.sqrt(0.25 * 0.75 / 100))
+    assert binomial_error(0, 100) == 0.
+    assert np.allclose(binomial_error([10, 50], [100, 100]), [0.03, 0.05])
+
+
+def test_wilson_interval():
+    lower, upper = wilson_interval(25, 100)
+    assert lower < 0.25 < upper
+    # Close to the binomial error for large numbers of events
+    assert (upper - lower) / 2 == pytest.approx(binomial_error(25, 100), rel=0.05)
+    lower, upper = wilson_interval(0, 50)
+    assert lower == pytest.approx(0.) and upper > 0.
+    lower, upper = wilson_interval(50, 50)
+    assert lower < 1. and upper == pytest.approx(1.)
+    narrow, wide = wilson_interval(25, 100, ONE_SIGMA), wilson_interval(25, 100, 0.95)
+    assert wide[0] < narrow[0] and wide[1] > narrow[1]
+
+
+def test_bootstrap_error():
+    replicas = np.random.default_rng(1).normal(size=(100, 3, 2))
+    assert np.allclose(bootstrap_error(replicas), replicas.std(axis=0, ddof=1))
+
+
+def test_bootstrap_error_of_an_efficiency():
+    # The bootstrap error of an efficiency is close to the binomial error
+    passed = np.random.default_rng(2).random(5000) < 0.2
+    weights = poisson_replica_weights(np.arange(5000), 400, seed=5)
+    efficiencies = weights[passed].sum(axis=0) / weights.sum(axis=0)
+    assert bootstrap_error(efficiencies) == pytest.approx(binomial_error(passed.sum(), 5000), rel=0.15)
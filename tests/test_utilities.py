@@ -0,0 +1,79 @@
+"""Tests of the metadata of the .lhe files (read_lhe_metadata)."""
+
+from LHCOReader_HighPT.src.Utilities import read_lhe_metadata, read_xsection
+import gzip
+import os
+
+_LHE = """<LesHouchesEvents version="3.0">
+<header>
+<MGRunCard>
+  5000 = nevents ! Number of unweighted events requested
+</MGRunCard>
+<MGGenerationInfo>
+{banner}
+</MGGenerationInfo>
+{reweighting}</header>
+<init>
+2212 2212 6.5e3 6.5e3 0 0 247000 247000 -4 2
+1.0e-01 3.0e-03 1.0e-01 1
+2.0e-01 4.0e-03 2.0e-01 2
+</init>
+<event>
+</event>
+</LesHouchesEvents>
+"""
+
+
+# Reweighting block of MadGraph, which comes before the <init> block
+_REWEIGHTING = """<initrwgt>
+<weightgroup name='mg_reweighting' weight_name_strategy='includeIdInWeightName'>
+<weight id='cW_1'> set cW 1.0 </weight>
+</weightgroup>
+</initrwgt>
+"""
+
+
+def write_lhe(filename: str, banner: str = "", reweighting: str = "") -> str:
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "wt") as lhe:
+        lhe.write(_LHE.format(banner=banner, reweighting=reweighting))
+    return filename
+
+
+def test_metadata(tmp_path):
+    lhe_file = write_lhe(str(tmp_path / "run.lhe.gz"), "#  Number of Events        :       2000\n"
+                                                      "#  Integrated weight (pb)  :  0.31")
+    metadata = read_lhe_metadata(lhe_file)
+    assert metadata["xsection"] == 0.31 and metadata["number_events"] == 2000
+    assert metadata["beams"] == [(2212, 6500.), (2212, 6500.)] and metadata["weighting_strategy"] == -4
+    assert [process["id"] for process in metadata["processes"]] == [1, 2]
+    assert metadata["xsection_error"] == (3e-3 ** 2 + 4e-3 ** 2) ** 0.5
+
+
+def test_banner_spacing(tmp_path):
+    lhe_file = write_lhe(str(tmp_path / "run.lhe"), "# Number of Events: 2000\n#Integrated weight (pb) :0.31")
+    assert read_xsection(lhe_file) == 0.31
+    assert read_lhe_metadata(lhe_file)["number_events"] == 2000
+
+
+def test_missing_banner(tmp_path):
+    # The cross-section is the sum of the processes and the number of events is the one of the run card
+    metadata = read_lhe_metadata(write_lhe(str(tmp_path / "run.lhe")))
+    assert abs(metadata["xsection"] - 0.3) < 1e-12 and metadata["number_events"] == 5000
+
+
+def test_reweighting_block(tmp_path):
+    # The <initrwgt> block is not the <init> block
+    metadata = read_lhe_metadata(write_lhe(str(tmp_path / "run.lhe"), reweighting=_REWEIGHTING))
+    assert [process["id"] for process in metadata["processes"]] == [1, 2]
+    assert metadata["beams"] == [(2212, 6500.), (2212, 6500.)] and metadata["weighting_strategy"] == -4
+    assert abs(metadata["xsection"] - 0.3) < 1e-12 and metadata["xsection_error"] is not None
+
+
+def test_cache(tmp_path):
+    lhe_file = write_lhe(str(tmp_path / "run.lhe"), "#  Integrated weight (pb)  :  0.31")
+    assert read_lhe_metadata(lhe_file) is read_lhe_metadata(lhe_file)
+    # The file is read again when it changes
+    write_lhe(lhe_file, "#  Integrated weight (pb)  :  0.42")
+    os.utime(lhe_file, ns=(0, 0))
+    assert read_xsection(lhe_file) == 0.42
@@ -0,0 +1,149 @@
+"""Tests of the event weights (EventWeights) and of the bootstrap replicas accumulated by the EventLoop."""
+
+from LHCOReader_HighPT.src.Analysis import EventLoop
+from LHCOReader_HighPT.src.EventWeights import EventWeights
+from LHCOReader_HighPT.src.LHCOIndex import LHCOIndex
+from samples import analyses, histograms
+import numpy as np
+import pytest
+import shutil
+
+_LHE = """<LesHouchesEvents version="3.0">
+<header>
+</header>
+<init>
+2212 2212 6.5e3 6.5e3 0 0 247000 247000 -4 1
+1.5e-01 2.0e-03 1.5e-01 1
+</init>
+<event>
+ 5 1 +1.50e-01 9.1e+01 7.8e-03 1.2e-01
+<rwgt>
+<wgt id='cW_1'> 0.2 </wgt>
+<wgt id='cW_2'> 0.3 </wgt>
+</rwgt>
+</event>
+<event>
+ 5 1 -1.50e-01 9.1e+01 7.8e-03 1.2e-01
+<rwgt>
+<wgt id='cW_1'> -0.1 </wgt>
+<wgt id='cW_2'> 0.4 </wgt>
+</rwgt>
+</event>
+</LesHouchesEvents>
+"""
+
+
+def test_from_lhe(tmp_path):
+    lhe_file = str(tmp_path / "sample.lhe")
+    with open(lhe_file, "w") as lhe:
+        lhe.write(_LHE)
+    weights = EventWeights.from_lhe(lhe_file)
+    assert weights.names == ["nominal", "cW_1", "cW_2"]
+    assert np.allclose(weights.weights, [[0.15, 0.2, 0.3], [-0.15, -0.1, 0.4]])
+    assert weights.select(["cW_2"]).weights.ravel().tolist() == [0.3, 0.4]
+    with pytest.raises(ValueError):
+        weights.rows(1, 3)
+
+    # The weights of the .lhco file are read from the .lhe file and stored in the sidecar file
+    lhco_file = str(tmp_path / "sample.lhco")
+    open(lhco_file, "w").close()
+    assert np.array_equal(EventWeights.for_lhco(lhco_file).weights, weights.weights)
+    assert np.array_equal(EventWeights.from_file(lhco_file + EventWeights.extension).weights, weights.weights)
+
+
+@pytest.fixture(scope="module")
+def weighted_file(lhco_file, tmp_path_factory) -> str:
+    """
+    Copy of the synthetic file with the sidecar file of its weights (the nominal weight is one). The events without
+    particles have very large weights, so the results change if they are not skipped.
+    """
+    filename = str(tmp_path_factory.mktemp("weighted") / "weighted.lhco")
+    shutil.copy(lhco_file, filename)
+    index = LHCOIndex.for_file(filename)
+    weights = np.full((index.number_all_events, 2), 1e6)
+    weights[index.ordinals] = np.column_stack([np.ones(len(index)),
+                                               np.random.default_rng(7).uniform(0.5, 1.5, len(index))])
+    EventWeights(weights, ["nominal", "cW"]).store(filename + EventWeights.extension)
+    return filename
+
+
+def run(lhco_file: str, chunks_per_file: int = 1, **options):
+    """Runs the analyses with the weights and 20 bootstrap replicas and returns the AnalysisResult."""
+    event_loop = EventLoop(histogram=histograms(), event_weights=EventWeights.for_lhco, bootstrap_replicas=20,
+                           bootstrap_seed=11, **options)
+    return event_loop.analyse_files([lhco_file], analyses(), n_workers=2, chunks_per_file=chunks_per_file)[lhco_file]
+
+
+def assert_same_weighted_results(result, reference):
+    assert result.passed == reference.passed
+    assert np.allclose(result.sum_weights, reference.sum_weights)
+    assert np.allclose(result.total_replicas, reference.total_replicas)
+    assert np.allclose(result.sum_weight_replicas, reference.sum_weight_replicas)
+    for analysis_name in reference.passed:
+        assert np.allclose(result.passed_weights[analysis_name], reference.passed_weights[analysis_name])
+        assert np.allclose(result.passed_replicas[analysis_name], reference.passed_replicas[analysis_name])
+        assert np.allclose(result.passed_weight_replicas[analysis_name],
+                           reference.passed_weight_replicas[analysis_name])
+        for weight_name in reference.weight_names:
+            assert np.allclose(result.retrive_histogram(analysis_name, "counts", weight_name),
+                               reference.retrive_histogram(analysis_name, "counts", weight_name))
+            assert np.allclose(result.retrive_histogram_replicas(analysis_name, "counts", weight_name),
+                               reference.retrive_histogram_replicas(analysis_name, "counts", weight_name))
+
+
+@pytest.fixture(scope="module")
+def reference(weighted_file):
+    return run(weighted_file)
+
+
+def test_events_without_particles(reference, weighted_file):
+    # The weights of the events without particles are skipped, and the other events keep their weights
+    assert reference.sum_weights[0] == pytest.approx(reference.number_evts)
+    stored = EventWeights.from_file(weighted_file + EventWeights.extension).weights
+    assert reference.sum_weights[1] == pytest.approx(stored[stored[:, 0] == 1., 1].sum())
+
+
+def test_weighted_efficiencies(reference):
+    efficiencies = reference.weighted_efficiencies
+    for analysis_name, efficiency in reference.efficiencies.items():
+        assert efficiencies[analysis_name]["nominal"] == pytest.approx(efficiency)
+        assert efficiencies[analysis_name]["cW"] != pytest.approx(efficiency)
+    errors = reference.weighted_efficiency_errors
+    assert all(0 < errors[analysis_name]["cW"] < 0.1 for analysis_name in reference.passed)
+
+
+def test_bootstrap_errors(reference):
+    # Close to the binomial errors for unweighted events
+    for analysis_name, error in reference.efficiency_errors.items():
+        efficiency = reference.efficiencies[analysis_name]
+        binomial = np.sqrt(efficiency * (1 - efficiency) / reference.number_evts)
+        assert 0.5 * binomial < error < 1.5 * binomial
+    for analysis_name, (lower, upper) in reference.efficiency_intervals().items():
+        assert lower < reference.efficiencies[analysis_name] < upper
+
+
+@pytest.mark.parametrize("chunks_per_file, options", [
+    (1, dict(engine="batch")),
+    (1, dict(engine="event", prefetch_chunks=2, chunk_size=100)),
+    (1, dict(engine="batch", prefetch_chunks=2, chunk_size=100)),
+    (3, dict(engine="event")),
+    (3, dict(engine="batch")),
+])
+def test_engines_and_chunks(weighted_file, reference, chunks_per_file, options):
+    assert_same_weighted_results(run(weighted_file, chunks_per_file, **options), reference)
+
+
+def test_number_of_weights(weighted_file, tmp_path):
+    filename = str(tmp_path / "missing_weights.lhco")
+    shutil.copy(weighted_file, filename)
+    stored = EventWeights.from_file(weighted_file + EventWeights.extension)
+    EventWeights(stored.weights[:-1], stored.names).store(filename + EventWeights.extension)
+    # Also when the file is analysed in chunks
+    for chunks_per_file in (1, 3):
+        with pytest.raises(ValueError):
+            run(filename, chunks_per_file)
+
+
+def test_event_weight_and_event_weights():
+    with pytest.raises(ValueError):
+        EventLoop(event_weight=lambda event: 1., event_weights=EventWeights.for_lhco)